@@ -1,130 +1,454 @@
 """
 WebSocket handler for real-time simulation data streaming
+Clients pick the world state encoding when connecting (`/ws?format=binary`
+for wire frames, JSON otherwise); control messages are always JSON. Binary
+clients may subscribe to a viewport to receive only what they show.
+Incoming commands are validated and rate limited per client, then applied
+by the simulation thread at the next tick boundary.
 """
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Set
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple, Union
 import asyncio
+import itertools
 import json
+import time
+
+from ..config import settings
+from ..core import wire
+from ..core.viewport import Viewport
+
+
+FORMATS = ('json', 'binary')
+
+# Accepted commands and the parameters each may carry
+COMMANDS = {
+    'pause': (),
+    'resume': (),
+    'step': (),
+    'reset': (),
+    'set_speed': ('mode', 'multiplier'),
+    'keyframe': (),
+    'viewport': Viewport._fields,
+    'get_statistics': (),
+}
+
+# Control actions (world methods) and the status broadcast once one is applied
+CONTROLS = {
+    'pause': {'message': 'Simulation paused', 'paused': True},
+    'resume': {'message': 'Simulation resumed', 'paused': False},
+    'step': {'message': 'Executed one step'},
+    'reset': {'message': 'World reset', 'paused': False},
+}
+
+# Longest command message accepted (bytes)
+MAX_MESSAGE_SIZE = 4096
+
+# Viewport subscription keys
+_client_keys = itertools.count(1)
+
+
+def parse_command(text: Optional[str]) -> Tuple[str, dict]:
+    """Validate a client message; (command, params) or ValueError"""
+    if text is None or len(text) > MAX_MESSAGE_SIZE:
+        raise ValueError("Commands are JSON text messages")
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        raise ValueError("Malformed JSON")
+    if not isinstance(data, dict) or data.get('type') != 'command':
+        raise ValueError("Expected {'type': 'command', ...}")
+    command = data.get('command')
+    if command not in COMMANDS:
+        raise ValueError(f"Unknown command: {command}")
+    params = data.get('params') or {}
+    if not isinstance(params, dict):
+        raise ValueError("params must be an object")
+    unknown = set(params) - set(COMMANDS[command])
+    if unknown:
+        raise ValueError(f"Unknown params for {command}: {', '.join(sorted(unknown))}")
+    return command, params
+
+
+class RateLimiter:
+    """Token bucket: `rate` commands per second, bursts of up to `burst`"""
+    
+    def __init__(self, rate: float = 10.0, burst: int = 20):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+    
+    def allow(self) -> bool:
+        """Take a token if one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def _apply_control(world, action: str) -> bool:
+    """Run a control action on the simulation thread; False if it changed nothing"""
+    before = (world.paused, world.step_mode)
+    getattr(world, action)()
+    return action in ('step', 'reset') or (world.paused, world.step_mode) != before
+
+
+class Client:
+    """One viewer, fed by its own sender task
+    
+    Control messages queue up and are always delivered; world frames go
+    through a one-slot latest-frame-wins queue, so a slow viewer skips
+    frames instead of holding up the broadcast.
+    """
+    
+    def __init__(self, websocket: WebSocket, format: str = 'json', max_dropped: int = 90,
+                 command_rate: float = 10.0, command_burst: int = 20):
+        self.websocket = websocket
+        self.format = format
+        self.key = next(_client_keys)
+        # Subscribed viewport key (frames carry a view under it), None for the whole world
+        self.view: Optional[int] = None
+        # Consecutive dropped frames before the client counts as hopelessly behind
+        self.max_dropped = max_dropped
+        self.messages: Deque[Union[dict, bytes]] = deque()
+        # Latest unsent frame: (frame, serialized JSON, time offered)
+        self.pending: Optional[Tuple[object, Optional[str], float]] = None
+        # Keyframe this client's deltas are applied to
+        self.keyframe: Optional[bytes] = None
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.limiter = RateLimiter(command_rate, command_burst)
+        
+        # Metrics
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.lagging = 0  # Frames dropped since the last one was sent
+        self.latency = 0.0  # Moving average, offer to sent (seconds)
+        self.max_latency = 0.0
+        self.rejected = 0  # Commands refused (invalid or over the rate limit)
+    
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+    
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+    
+    def send(self, message: Union[dict, bytes]):
+        """Queue a control message (JSON) or raw bytes"""
+        self.messages.append(message)
+        self.wakeup.set()
+    
+    def frame_bytes(self, frame) -> Tuple[bytes, bytes]:
+        """(binary, keyframe) this client gets from a frame: its view's, else the world's"""
+        if self.view is not None and frame.views and self.view in frame.views:
+            return frame.views[self.view]
+        return frame.binary, frame.keyframe
+    
+    def send_keyframe(self, frame):
+        """Queue a frame's keyframe out of band (the client lost its deltas' base)"""
+        self.keyframe = self.frame_bytes(frame)[1]
+        self.send(self.keyframe)
+    
+    def offer(self, frame, text: Optional[str] = None) -> bool:
+        """Queue a frame, replacing any unsent one; False once persistently behind"""
+        if self.pending is not None:
+            self.dropped += 1
+            self.lagging += 1
+            if self.lagging > self.max_dropped:
+                return False
+        self.pending = (frame, text, time.perf_counter())
+        self.wakeup.set()
+        return True
+    
+    async def _send_frame(self, frame, text: Optional[str]):
+        websocket = self.websocket
+        if self.format != 'binary':
+            await websocket.send_text(text)
+            return
+        binary, keyframe = self.frame_bytes(frame)
+        if keyframe is not self.keyframe:
+            # Deltas need their keyframe; send it first if this frame is not it
+            self.keyframe = keyframe
+            if binary is not keyframe:
+                await websocket.send_bytes(keyframe)
+        await websocket.send_bytes(binary)
+    
+    async def _run(self):
+        websocket = self.websocket
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.messages:
+                    message = self.messages.popleft()
+                    if isinstance(message, bytes):
+                        await websocket.send_bytes(message)
+                    else:
+                        await websocket.send_json(message)
+                if self.pending is not None:
+                    (frame, text, offered), self.pending = self.pending, None
+                    await self._send_frame(frame, text)
+                    latency = time.perf_counter() - offered
+                    self.latency += (latency - self.latency) * 0.1
+                    self.max_latency = max(self.max_latency, latency)
+                    self.sent += 1
+                    self.lagging = 0
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Connection is gone; the receive loop cleans up
+            pass
+    
+    def stats(self) -> dict:
+        """Per-client delivery metrics"""
+        return {
+            'client': f"{self.websocket.client.host}:{self.websocket.client.port}" if self.websocket.client else None,
+            'format': self.format,
+            'viewport': self.view is not None,
+            'connected_seconds': time.time() - self.connected_at,
+            'frames_sent': self.sent,
+            'frames_dropped': self.dropped,
+            'lagging': self.lagging,
+            'avg_latency_ms': self.latency * 1000,
+            'max_latency_ms': self.max_latency * 1000,
+            'commands_rejected': self.rejected,
+        }
 
 
 class ConnectionManager:
     """Manages WebSocket connections"""
     
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
+    def __init__(self, max_dropped: int = 90, command_rate: float = 10.0, command_burst: int = 20):
+        self.clients: Dict[WebSocket, Client] = {}
+        self.max_dropped = max_dropped
+        self.command_rate = command_rate
+        self.command_burst = command_burst
+        # Clients disconnected for falling behind
+        self.evicted = 0
+        # Control actions waiting for the next tick boundary
+        self.pending: Dict[str, asyncio.Future] = {}
+    
+    @property
+    def active_connections(self) -> Set[WebSocket]:
+        return set(self.clients)
     
-    async def connect(self, websocket: WebSocket):
-        """Accept new WebSocket connection"""
+    async def connect(self, websocket: WebSocket, format: str = 'json') -> Client:
+        """Accept new WebSocket connection and start its sender"""
         await websocket.accept()
-        self.active_connections.add(websocket)
+        client = Client(websocket, format, self.max_dropped, self.command_rate, self.command_burst)
+        self.clients[websocket] = client
+        client.start()
+        return client
     
     def disconnect(self, websocket: WebSocket):
         """Remove WebSocket connection"""
-        self.active_connections.discard(websocket)
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.stop()
     
     async def broadcast(self, message: dict):
-        """Send message to all connected clients"""
-        disconnected = set()
-        
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                disconnected.add(connection)
+        """Queue a control message for all connected clients"""
+        for client in list(self.clients.values()):
+            client.send(message)
+    
+    def broadcast_frame(self, frame):
+        """Hand a published frame to every client's sender (serialized once per format)"""
+        text = None
+        # Frames built while no JSON client was counted carry no objects
+        objects = 'entities' in frame.state
+        behind: List[Client] = []
+        for client in list(self.clients.values()):
+            if client.format != 'binary':
+                if not objects:
+                    # Would draw an empty world; the client's next frame has them
+                    continue
+                if text is None:
+                    text = json.dumps({'type': 'world_state', **frame.state})
+            if not client.offer(frame, text):
+                behind.append(client)
         
-        # Clean up disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
+        # Persistently slow clients are dropped instead of buffered for
+        for client in behind:
+            self.evicted += 1
+            self.disconnect(client.websocket)
+            asyncio.create_task(self._close(client.websocket))
     
-    async def send_personal(self, message: dict, websocket: WebSocket):
-        """Send message to specific client"""
+    async def _close(self, websocket: WebSocket):
         try:
-            await websocket.send_json(message)
+            await websocket.close(code=1013, reason="Client too slow")
         except Exception:
-            self.disconnect(websocket)
+            pass
+    
+    async def control(self, runner, action: str) -> bool:
+        """Apply a control action and broadcast its status once
+        
+        Requests for an action that is already waiting for the tick boundary
+        join it instead of queueing again. False if it changed nothing (and
+        nothing was broadcast).
+        """
+        future = self.pending.get(action)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.wrap_future(runner.submit(_apply_control, runner.world, action))
+        self.pending[action] = future
+        try:
+            changed = await asyncio.shield(future)
+        finally:
+            self.pending.pop(action, None)
+        if changed:
+            await self.broadcast({'type': 'status', **CONTROLS[action]})
+        return changed
+    
+    async def send_personal(self, message: dict, websocket: WebSocket):
+        """Queue a message for a specific client"""
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.send(message)
+    
+    def stats(self) -> dict:
+        """Connection counts and per-client metrics"""
+        return {
+            'connections': len(self.clients),
+            'evicted': self.evicted,
+            'clients': [client.stats() for client in self.clients.values()],
+        }
 
 
 # Global connection manager instance
-manager = ConnectionManager()
+manager = ConnectionManager(
+    max_dropped=settings.ws_max_dropped_frames,
+    command_rate=settings.ws_command_rate,
+    command_burst=settings.ws_command_burst
+)
+
+
+async def run_command(runner, fn, *args):
+    """Apply a command on the simulation thread at the next tick boundary"""
+    return await asyncio.wrap_future(runner.submit(fn, *args))
 
 
-async def websocket_endpoint(websocket: WebSocket, world):
+async def websocket_endpoint(websocket: WebSocket, runner):
     """WebSocket endpoint for simulation data"""
-    await manager.connect(websocket)
+    format = websocket.query_params.get('format', 'json')
+    if format not in FORMATS:
+        format = 'json'
+    client = await manager.connect(websocket, format)
+    world = runner.world
+    if format == 'json':
+        runner.json_clients += 1
     
     try:
-        # Send initial world state
-        await websocket.send_json({
-            'type': 'world_state',
-            **world.get_state()
+        # Confirm the negotiated format, then send the initial world state
+        client.send({
+            'type': 'hello',
+            'format': format,
+            'version': wire.VERSION
         })
+        if format == 'binary':
+            # The sender puts the frame's keyframe ahead of it
+            client.offer(runner.frames.read())
+        else:
+            client.send({
+                'type': 'world_state',
+                **(await run_command(runner, world.get_state))
+            })
         
-        # Listen for client commands
+        # Listen for client commands (wakes only when a message arrives)
         while True:
+            message = await websocket.receive()
+            if message['type'] == 'websocket.disconnect':
+                raise WebSocketDisconnect(message.get('code', 1000))
+            if not client.limiter.allow():
+                client.rejected += 1
+                client.send({
+                    'type': 'status',
+                    'message': 'Too many commands, slow down'
+                })
+                continue
             try:
-                # Receive with timeout to allow periodic state updates
-                data = await asyncio.wait_for(
-                    websocket.receive_json(),
-                    timeout=0.1
-                )
-                
-                # Handle commands
-                if data.get('type') == 'command':
-                    command = data.get('command')
-                    
-                    if command == 'pause':
-                        world.pause()
-                        await manager.broadcast({
-                            'type': 'status',
-                            'message': 'Simulation paused',
-                            'paused': True
-                        })
-                    
-                    elif command == 'resume':
-                        world.resume()
-                        await manager.broadcast({
-                            'type': 'status',
-                            'message': 'Simulation resumed',
-                            'paused': False
-                        })
-                    
-                    elif command == 'step':
-                        world.step()
-                        await manager.broadcast({
-                            'type': 'status',
-                            'message': 'Executed one step'
-                        })
-                    
-                    elif command == 'reset':
-                        world.reset()
-                        await manager.broadcast({
-                            'type': 'status',
-                            'message': 'World reset',
-                            'paused': False
-                        })
-                    
-                    elif command == 'get_statistics':
-                        stats = world.get_statistics()
-                        await websocket.send_json({
-                            'type': 'statistics',
-                            'stats': stats
-                        })
-            
-            except asyncio.TimeoutError:
-                # No message received, continue
-                pass
+                command, params = parse_command(message.get('text'))
+            except ValueError as e:
+                client.rejected += 1
+                client.send({
+                    'type': 'status',
+                    'message': f'Invalid command: {e}'
+                })
+                continue
+            await handle_command(client, runner, command, params)
     
     except WebSocketDisconnect:
         manager.disconnect(websocket)
     except Exception as e:
         print(f"WebSocket error: {e}")
         manager.disconnect(websocket)
+    finally:
+        if format == 'json':
+            runner.json_clients -= 1
+        if client.view is not None:
+            runner.submit(runner.set_view, client.key, None)
+
+
+async def handle_command(client: Client, runner, command: str, params: dict):
+    """Carry out a validated command for a client"""
+    if command in CONTROLS:
+        # Coalesced across clients; a request that changed nothing still gets its status
+        if not await manager.control(runner, command):
+            client.send({'type': 'status', **CONTROLS[command]})
+    
+    elif command == 'set_speed':
+        try:
+            run = await run_command(
+                runner, runner.set_mode,
+                params.get('mode', 'realtime'), params.get('multiplier')
+            )
+        except (TypeError, ValueError) as e:
+            client.send({
+                'type': 'status',
+                'message': f'Invalid speed: {e}'
+            })
+        else:
+            await manager.broadcast({
+                'type': 'status',
+                'message': f"Speed: {run['mode']}",
+                'run': run
+            })
+    
+    elif command == 'keyframe':
+        # Client lost track of the deltas: resend their base
+        client.send_keyframe(runner.frames.read())
+    
+    elif command == 'viewport':
+        # Subscribe to a viewport (no params: the whole world again)
+        if client.format != 'binary':
+            client.send({
+                'type': 'status',
+                'message': 'Viewports need the binary format'
+            })
+            return
+        try:
+            viewport = Viewport.parse(params) if params else None
+        except ValueError as e:
+            client.send({
+                'type': 'status',
+                'message': f'Invalid viewport: {e}'
+            })
+            return
+        await run_command(runner, runner.set_view, client.key, viewport)
+        client.view = client.key if viewport else None
+    
+    elif command == 'get_statistics':
+        client.send({
+            'type': 'statistics',
+            'stats': runner.frames.read().statistics
+        })
 
 
-async def broadcast_world_state(world):
-    """Broadcast current world state to all clients"""
-    state = world.get_state()
-    await manager.broadcast({
-        'type': 'world_state',
-        **state
-    })
+async def broadcast_world_state(frame):
+    """Broadcast a published frame to all clients (never waits on a send)"""
+    manager.broadcast_frame(frame)
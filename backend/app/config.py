@@ -11,7 +11,7 @@ class Settings(BaseSettings):
     world_width: int = 800
     world_height: int = 600
     initial_population: int = 20
-    max_population: int = 500
+    max_population: int = 2000
     
     # Energy Economy
     photosynthesis_rate: float = 0.5
@@ -26,14 +26,38 @@ class Settings(BaseSettings):
     
     # Performance
     target_fps: int = 60
+    render_fps: int = 30  # Frames published to clients per second, independent of the tick rate
+    turbo_multiplier: float = 0.0  # Turbo speed as a multiple of real time (0 = as fast as possible)
+    keyframe_interval: int = 120  # Ticks between full binary frames (deltas in between)
+    ws_max_dropped_frames: int = 90  # Consecutive frames a viewer may miss before it is disconnected
+    ws_command_rate: float = 10.0  # Commands per second a client may send (sustained)
+    ws_command_burst: int = 20  # Commands a client may send at once before being rate limited
+    viewport_margin: float = 64.0  # World units sent around a subscribed viewport
+    viewport_tile_zoom: float = 0.25  # Zoom below which viewports get density tiles instead of objects
     max_gas_per_tick: int = 50
+    vm_compile: bool = True  # Run genomes through the compiler instead of the interpreter
+    vm_cache_size: int = 1024  # Compiled programs kept in the LRU cache
+    vm_batch: bool = True  # Run creatures sharing a genome in lockstep
+    vm_batch_min_group: int = 8  # Smaller genome groups run per creature
+    vm_tick_budget: int = 0  # VM instructions per tick across all creatures (0 = unlimited)
+    vm_profile_sample_rate: float = 0.0  # Fraction of genome runs profiled (0 = off)
+    incremental_spatial_grid: bool = True  # Relocate only objects whose grid cell changed
+    collision_iterations: int = 1  # Relaxation passes for dense clusters
 
     # Features
     enable_vm: bool = False
+    sensor_range: float = 200.0  # SEE_FOOD search radius (px)
     
     # Database
-    snapshot_interval: int = 300
+    snapshot_interval: int = 300  # Seconds between snapshots (0 = off)
+    snapshot_retention: int = 10  # Newest snapshots kept in the database
+    snapshot_restore: bool = True  # Resume from the latest snapshot at startup
     database_path: str = "./data/vivarium.db"
+    checkpoint_dir: str = "./data/checkpoints"  # Where named checkpoints are saved
+    checkpoint_path: str = ""  # Checkpoint loaded at startup instead of the latest snapshot
+    lineage_path: str = ""  # Append-only birth/death/eat log ("" = keep the index in memory only)
+    lineage_chunk_size: int = 65536  # Events buffered before a chunk is handed to the writer
+    lineage_flush_interval: float = 1.0  # Seconds before a partial chunk is flushed anyway
     
     # Server
     host: str = "0.0.0.0"
@@ -2,55 +2,221 @@
 Entity class - represents a living creature in the simulation
 Phase 1: Simple entity with hardcoded behavior (random walk)
 Phase 2: Will be extended with VM genome execution
+
+Hot per-creature state lives in an EntityStore column while the entity is
+attached to a store; a detached entity keeps the same fields locally.
 """
 import random
 import math
 from typing import List, Tuple, Optional
-from dataclasses import dataclass, field
 import uuid
 
+import numpy as np
+
+from .entity_store import PALETTE, color_index
+from .vm.compiler import genome_compiler
+from .vm.instructions import REGISTER_COUNT
 from .vm.interpreter import VMInterpreter
 from .vm.genome import seed_wanderer
+from .vm.pool import GenomePool, genome_pool
 from ..config import settings
+from ..evolution.mutation import mutate_batch
+
+
+class _Column:
+    """Attribute backed by an EntityStore column (or a local value when detached)"""
+
+    def __init__(self, cast):
+        self.cast = cast
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.local = '_' + name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        store = obj._store
+        if store is None:
+            return obj.__dict__[self.local]
+        return self.cast(getattr(store, self.name)[obj._row])
+
+    def __set__(self, obj, value):
+        store = obj._store
+        if store is None:
+            obj.__dict__[self.local] = value
+        else:
+            getattr(store, self.name)[obj._row] = value
+
 
-@dataclass
 class Entity:
     """A living creature in the VIVARIUM"""
-    
-    # Identity
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    generation: int = 0
-    parent_id: Optional[str] = None
-    
+
     # Physics
-    x: float = 0.0
-    y: float = 0.0
-    vx: float = 0.0
-    vy: float = 0.0
-    angle: float = 0.0  # in radians
-    radius: float = 8.0
-    
+    x = _Column(float)
+    y = _Column(float)
+    vx = _Column(float)
+    vy = _Column(float)
+    angle = _Column(float)  # in radians
+    radius = _Column(float)
+
     # Biology
-    energy: float = 50.0
-    max_energy: float = 100.0
-    age: int = 0  # in ticks
-    
-    # Phenotype (visual traits)
-    color: Tuple[int, int, int] = (200, 200, 200)
-    
-    # Trail for visualization
-    trail: List[Tuple[float, float]] = field(default_factory=list)
-    max_trail_length: int = 20
+    energy = _Column(float)
+    max_energy = _Column(float)
+    age = _Column(int)  # in ticks
+    generation = _Column(int)
+
+    # Genome (ID in the shared genome pool)
+    genome_id = _Column(int)
+
+    def __init__(
+        self,
+        id: Optional[str] = None,
+        generation: int = 0,
+        parent_id: Optional[str] = None,
+        x: float = 0.0,
+        y: float = 0.0,
+        vx: float = 0.0,
+        vy: float = 0.0,
+        angle: float = 0.0,
+        radius: float = 8.0,
+        energy: float = 50.0,
+        max_energy: float = 100.0,
+        age: int = 0,
+        color: Tuple[int, int, int] = (200, 200, 200),
+        trail: Optional[List[Tuple[float, float]]] = None,
+        max_trail_length: int = 20,
+        genome: Optional[List] = None,
+        genome_id: Optional[int] = None,
+    ):
+        # Backing store (None while detached)
+        self._store = None
+        self._row = -1
+        self.genome_id = GenomePool.EMPTY
+
+        # Identity
+        self.id = id if id is not None else str(uuid.uuid4())
+        self.generation = generation
+        self.parent_id = parent_id
+
+        # Physics
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.angle = angle
+        self.radius = radius
+
+        # Biology
+        self.energy = energy
+        self.max_energy = max_energy
+        self.age = age
+
+        # Phenotype (visual traits)
+        self.color = color
+
+        # Trail for visualization
+        self.trail = trail if trail is not None else []
+        self.max_trail_length = max_trail_length
+
+        # Genome (Phase 2): pass genome_id to share an already pooled genome
+        if genome_id is not None:
+            genome_pool.retain(genome_id)
+            self.genome_id = genome_id
+        else:
+            self.genome = genome if genome is not None else []
+        
+        # VM register file and scheduler idle ticks (store columns while attached)
+        self.__dict__['_registers'] = np.zeros(REGISTER_COUNT)
+        self.__dict__['_vm_idle'] = 0
+
+        self.__post_init__()
+
+    @classmethod
+    def bind(cls, store, row: int, id: str, parent_id: Optional[str] = None,
+             max_trail_length: int = 20) -> 'Entity':
+        """View of a store row that already holds its columns (e.g. a mapped checkpoint)
+        
+        Skips __init__: nothing is written to the store and no genome
+        reference is taken (the caller retains them for the whole store).
+        """
+        entity = cls.__new__(cls)
+        entity.__dict__.update(
+            _store=store,
+            _row=row,
+            id=id,
+            parent_id=parent_id,
+            max_trail_length=max_trail_length
+        )
+        return entity
 
-    # Genome (Phase 2)
-    genome: List = field(default_factory=list)
-    
     def __post_init__(self):
         """Initialize random starting angle"""
         if self.angle == 0.0:
             self.angle = random.uniform(0, 2 * math.pi)
         if settings.enable_vm and not self.genome:
             self.genome = seed_wanderer()
+
+    def __del__(self):
+        """Hand the genome reference back to the pool"""
+        if '_store' in self.__dict__:
+            genome_pool.release(self.genome_id)
+
+    def __repr__(self) -> str:
+        return (f"Entity(id={self.id!r}, generation={self.generation}, "
+                f"x={self.x}, y={self.y}, energy={self.energy})")
+
+    @property
+    def color(self) -> Tuple[int, int, int]:
+        """Phenotype color, stored as a palette index"""
+        if self._store is None:
+            return PALETTE[self.__dict__['_color']]
+        return PALETTE[self._store.color[self._row]]
+
+    @color.setter
+    def color(self, value: Tuple[int, int, int]):
+        index = color_index(value)
+        if self._store is None:
+            self.__dict__['_color'] = index
+        else:
+            self._store.color[self._row] = index
+
+    @property
+    def genome(self) -> List:
+        """Program executed by the VM (shared; assign a new list to change it)"""
+        return genome_pool.program(self.genome_id)
+
+    @genome.setter
+    def genome(self, program: List):
+        gid = genome_pool.acquire(program)
+        genome_pool.release(self.genome_id)
+        self.genome_id = gid
+
+    @property
+    def genome_key(self) -> bytes:
+        """Content key of the genome (its packed bytes)"""
+        return genome_pool.key(self.genome_id)
+
+    @property
+    def trail(self) -> List[Tuple[float, float]]:
+        """Recent positions for visualization, oldest first"""
+        if self._store is None:
+            return self.__dict__['_trail']
+        return self._store.get_trail(self._row)[-self.max_trail_length:]
+
+    @trail.setter
+    def trail(self, points: List[Tuple[float, float]]):
+        if self._store is None:
+            self.__dict__['_trail'] = points
+        else:
+            self._store.set_trail(self._row, points)
+
+    @property
+    def registers(self) -> np.ndarray:
+        """VM register file, written in place by STORE"""
+        if self._store is None:
+            return self.__dict__['_registers']
+        return self._store.registers[self._row]
     
     def update_physics(self, dt: float, world_width: int, world_height: int):
         """Update position and handle wall collisions"""
@@ -74,9 +240,12 @@ class Entity:
             self.vy *= -0.8
         
         # Update trail
-        self.trail.append((self.x, self.y))
-        if len(self.trail) > self.max_trail_length:
-            self.trail.pop(0)
+        if self._store is None:
+            self.trail.append((self.x, self.y))
+            if len(self.trail) > self.max_trail_length:
+                self.trail.pop(0)
+        else:
+            self._store.record_trail([self._row])
     
     def update_energy(self, dt: float, photosynthesis: float, existence_tax: float):
         """Update energy based on passive income and costs"""
@@ -104,11 +273,14 @@ class Entity:
         self.vx = math.cos(self.angle) * speed
         self.vy = math.sin(self.angle) * speed
 
-    def execute_genome(self):
+    def execute_genome(self, sensors=None):
         """Phase 2: Execute genome via VM (fallback to simple if empty)"""
         if not self.genome:
             return self.simple_behavior()
-        vm = VMInterpreter(max_gas=settings.max_gas_per_tick)
+        if settings.vm_compile:
+            program = genome_compiler.get(self.genome, self.genome_key)
+            return program.run(self, sensors, settings.max_gas_per_tick)
+        vm = VMInterpreter(max_gas=settings.max_gas_per_tick, sensors=sensors)
         vm.execute(self, self.genome)
     
     def eat_food(self, food_energy: float):
@@ -116,12 +288,22 @@ class Entity:
         self.energy += food_energy
         self.energy = min(self.energy, self.max_energy)
     
-    def reproduce(self) -> 'Entity':
-        """Create offspring with half of parent's energy"""
+    def reproduce(self, genome=None) -> 'Entity':
+        """Create offspring with half of parent's energy
+        
+        `genome` is the child's packed genome when the caller has already
+        mutated a batch of them; by default this creature's is mutated.
+        """
         # Split energy
         child_energy = self.energy / 2
         self.energy = child_energy
         
+        # Copy-on-write genome: shared with the parent unless mutation changed it
+        packed = genome_pool.get_packed(self.genome_id)
+        if genome is None:
+            genome = mutate_batch([packed], settings.mutation_rate)[0]
+        inherited = {'genome_id': self.genome_id} if genome is packed else {'genome': genome}
+        
         # Create child near parent
         offset = random.uniform(-20, 20)
         child = Entity(
@@ -130,7 +312,8 @@ class Entity:
             energy=child_energy,
             generation=self.generation + 1,
             parent_id=self.id,
-            color=self.color  # Phase 1: inherit color
+            color=self.color,  # Phase 1: inherit color
+            **inherited
         )
         
         return child
@@ -148,5 +331,5 @@ class Entity:
             'age': self.age,
             'generation': self.generation,
             'color': self.color,
-            'trail': self.trail[-5:] if self.trail else []  # Send only last 5 points
+            'trail': self.trail[-5:]  # Send only last 5 points
         }
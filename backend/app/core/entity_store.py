@@ -0,0 +1,383 @@
+"""
+Entity store - structure-of-arrays storage for all living creatures
+Keeps hot per-creature state in contiguous NumPy columns so the world,
+physics and food systems can operate on whole populations at once.
+"""
+import weakref
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from .vm.instructions import REGISTER_COUNT
+from .vm.pool import genome_pool
+
+if TYPE_CHECKING:
+    from .entity import Entity
+
+
+# Shared color palette - creatures store a uint8 index into this table
+PALETTE: List[Tuple[int, int, int]] = []
+_PALETTE_INDEX: Dict[Tuple[int, int, int], int] = {}
+
+
+def color_index(color: Tuple[int, int, int]) -> int:
+    """Intern a color and return its palette index"""
+    color = tuple(int(c) for c in color)
+    index = _PALETTE_INDEX.get(color)
+    if index is None:
+        if len(PALETTE) >= 256:
+            raise ValueError("Color palette is full (256 colors)")
+        index = len(PALETTE)
+        PALETTE.append(color)
+        _PALETTE_INDEX[color] = index
+    return index
+
+
+# Number of trail points kept per entity (ring buffer depth)
+TRAIL_LENGTH = 20
+
+
+class LazyViews:
+    """Row -> Entity views of rows restored from saved columns, bound on first access
+
+    Unbound rows are `None` placeholders whose identity stays in the saved
+    (byte string) id columns; each still owns the genome reference its view
+    will take over. Behaves like the plain list of views otherwise. Only a
+    weak reference to the store is kept, so a dropped store is freed (and
+    hands those references back) right away.
+    """
+
+    def __init__(self, store: 'EntityStore', ids: np.ndarray, parent_ids: np.ndarray,
+                 bind: Callable[['EntityStore', int, str, Optional[str]], 'Entity']):
+        self._store = weakref.ref(store)
+        self.ids = ids
+        self.parent_ids = parent_ids
+        self.bind = bind
+        self.items: List[Optional['Entity']] = [None] * store.size
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self.items)))]
+        entity = self.items[row]
+        if entity is None:
+            row = range(len(self.items))[row]
+            parent_id = self.parent_ids[row].decode()
+            entity = self.bind(self._store(), row, self.ids[row].decode(), parent_id or None)
+            self.items[row] = entity
+        return entity
+
+    def __setitem__(self, row: int, entity: 'Entity'):
+        self.items[row] = entity
+
+    def __delitem__(self, rows: slice):
+        del self.items[rows]
+
+    def __iter__(self) -> Iterator['Entity']:
+        for row in range(len(self.items)):
+            yield self[row]
+
+    def append(self, entity: 'Entity'):
+        self.items.append(entity)
+
+    def pop(self) -> Optional['Entity']:
+        return self.items.pop()
+
+    def peek(self, row: int) -> Optional['Entity']:
+        """The view of a row if it has been bound, else None"""
+        return self.items[row]
+
+    def identity(self, row: int) -> Tuple[str, Optional[str]]:
+        """(id, parent id) of a row, without binding its view"""
+        entity = self.items[row]
+        if entity is not None:
+            return entity.id, entity.parent_id
+        return self.ids[row].decode(), self.parent_ids[row].decode() or None
+
+    def bound(self) -> int:
+        """Number of rows that have a view"""
+        return len(self.items) - self.items.count(None)
+
+    def find(self, entity_id: str) -> int:
+        """Row of an entity id (-1 if absent), without binding any view"""
+        for row, entity in enumerate(self.items):
+            if entity is not None and entity.id == entity_id:
+                return row
+        key = entity_id.encode()
+        rows = np.flatnonzero(self.ids[:len(self.items)] == key)
+        for row in rows.tolist():
+            if self.items[row] is None:
+                return row
+        return -1
+
+    def move(self, holes: Sequence[int], movers: Sequence[int]):
+        """Move rows `movers` into `holes` (unbound rows carry their saved ids along)"""
+        items = self.items
+        for hole, mover in zip(holes, movers):
+            entity = items[mover]
+            if entity is None:
+                self.ids[hole] = self.ids[mover]
+                self.parent_ids[hole] = self.parent_ids[mover]
+            else:
+                entity._row = hole
+            items[hole] = entity
+
+    def drop(self, row: int, genome_id: np.ndarray):
+        """Forget an unbound row, handing back its genome reference"""
+        genome_pool.release(int(genome_id[row]))
+
+    def release(self, genome_id: np.ndarray):
+        """Hand back the genome references of every unbound row"""
+        for row, entity in enumerate(self.items):
+            if entity is None:
+                self.drop(row, genome_id)
+        self.items = []
+
+
+class EntityStore:
+    """Contiguous column storage for entities with swap-remove deletion"""
+
+    # Column name -> dtype
+    COLUMNS: Dict[str, type] = {
+        'uid': np.int64,
+        'x': np.float64,
+        'y': np.float64,
+        'vx': np.float64,
+        'vy': np.float64,
+        'angle': np.float64,
+        'radius': np.float64,
+        'energy': np.float64,
+        'max_energy': np.float64,
+        'age': np.int64,
+        'generation': np.int64,
+        'color': np.uint8,
+        'genome_id': np.int64,
+    }
+    
+    # Trail ring buffer columns (not mirrored as plain Entity fields)
+    TRAIL_COLUMNS: Dict[str, Tuple[type, tuple]] = {
+        'trail': (np.float64, (TRAIL_LENGTH, 2)),
+        'trail_head': (np.int64, ()),
+        'trail_len': (np.int64, ()),
+    }
+
+    # VM state: register file and ticks since the genome last ran
+    VM_COLUMNS: Dict[str, Tuple[type, tuple]] = {
+        'registers': (np.float64, (REGISTER_COUNT,)),
+        'vm_idle': (np.int64, ()),
+    }
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = max(1, capacity)
+        self.size = 0
+        self.next_uid = 0
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(self.capacity, dtype=dtype))
+        for name, (dtype, shape) in {**self.TRAIL_COLUMNS, **self.VM_COLUMNS}.items():
+            setattr(self, name, np.zeros((self.capacity,) + shape, dtype=dtype))
+        # Row -> Entity view (identity, genome and other per-object data)
+        self.views: List['Entity'] = []
+
+    @classmethod
+    def adopt(cls, entities: Iterable['Entity']) -> 'EntityStore':
+        """Return the store backing `entities`, attaching detached ones to it"""
+        if isinstance(entities, EntityStore):
+            return entities
+        entities = list(entities)
+        store = next((e._store for e in entities if e._store is not None), None)
+        if store is None:
+            store = cls(capacity=len(entities))
+        for entity in entities:
+            if entity._store is None:
+                store.append(entity)
+            elif entity._store is not store:
+                raise ValueError("Entities belong to different stores")
+        return store
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, np.ndarray], size: int, next_uid: int) -> 'EntityStore':
+        """Store using existing column arrays as they are (no copy); views are left to the caller"""
+        store = cls.__new__(cls)
+        store.capacity = len(columns['uid'])
+        store.size = size
+        store.next_uid = next_uid
+        for name in store._all_columns():
+            setattr(store, name, columns[name])
+        store.views = []
+        return store
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator['Entity']:
+        return iter(list(self.views))
+
+    def _grow(self, min_capacity: int):
+        """Reallocate all columns with (at least) doubled capacity"""
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        for name in self._all_columns():
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def _all_columns(self):
+        return list(self.COLUMNS) + list(self.TRAIL_COLUMNS) + list(self.VM_COLUMNS)
+
+    def append(self, entity: 'Entity') -> int:
+        """Attach a detached entity as a new row (amortized O(1))"""
+        if entity._store is not None:
+            raise ValueError("Entity is already attached to a store")
+        if self.size >= self.capacity:
+            self._grow(self.size + 1)
+
+        row = self.size
+        local = entity.__dict__
+        for name in self.COLUMNS:
+            if name == 'uid':
+                continue
+            getattr(self, name)[row] = local.pop('_' + name)
+        self.uid[row] = self.next_uid
+        self.next_uid += 1
+        self.set_trail(row, local.pop('_trail'))
+        for name in self.VM_COLUMNS:
+            getattr(self, name)[row] = local.pop('_' + name)
+
+        entity._store = self
+        entity._row = row
+        self.views.append(entity)
+        self.size += 1
+        return row
+
+    def _detach(self, row: int):
+        """Copy a row back into its view so it stays readable after removal"""
+        if isinstance(self.views, LazyViews) and self.views.peek(row) is None:
+            # Nobody holds a view of this row
+            self.views.drop(row, self.genome_id)
+            return
+        entity = self.views[row]
+        for name in self.COLUMNS:
+            if name != 'uid':
+                entity.__dict__['_' + name] = getattr(self, name)[row].item()
+        entity.__dict__['_trail'] = self.get_trail(row)
+        for name in self.VM_COLUMNS:
+            entity.__dict__['_' + name] = getattr(self, name)[row].copy()
+        entity._store = None
+        entity._row = -1
+
+    def remove(self, row: int):
+        """Swap-remove a single row (O(1), does not preserve order)"""
+        if not 0 <= row < self.size:
+            raise IndexError(row)
+        self._detach(row)
+        last = self.size - 1
+        if row != last:
+            for name in self._all_columns():
+                column = getattr(self, name)
+                column[row] = column[last]
+            self._move_views([row], [last])
+        self.views.pop()
+        self.size = last
+
+    def remove_many(self, rows):
+        """Swap-remove a batch of rows, filling holes from the tail in bulk"""
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        if rows.size == 0:
+            return
+        if rows[0] < 0 or rows[-1] >= self.size:
+            raise IndexError("Row out of range")
+
+        for row in rows:
+            self._detach(row)
+
+        new_size = self.size - rows.size
+        keep = np.ones(self.size, dtype=bool)
+        keep[rows] = False
+        holes = rows[rows < new_size]
+        movers = np.flatnonzero(keep[new_size:]) + new_size
+
+        if holes.size:
+            for name in self._all_columns():
+                column = getattr(self, name)
+                column[holes] = column[movers]
+            self._move_views(holes.tolist(), movers.tolist())
+
+        del self.views[new_size:]
+        self.size = new_size
+
+    def _move_views(self, holes: List[int], movers: List[int]):
+        """Point the views of `movers` at their new rows `holes`"""
+        if isinstance(self.views, LazyViews):
+            self.views.move(holes, movers)
+            return
+        for hole, mover in zip(holes, movers):
+            entity = self.views[mover]
+            entity._row = hole
+            self.views[hole] = entity
+
+    def release_views(self):
+        """Drop the store's own references to its views (e.g. when it is replaced)"""
+        if isinstance(self.views, LazyViews):
+            self.views.release(self.genome_id)
+        self.views = []
+
+    def __del__(self):
+        """Hand back the genome references of rows that never got a view"""
+        if isinstance(self.__dict__.get('views'), LazyViews):
+            self.views.release(self.genome_id)
+
+    def get_trail(self, row: int) -> List[Tuple[float, float]]:
+        """Trail points of a row, oldest first"""
+        length = int(self.trail_len[row])
+        start = int(self.trail_head[row]) - length
+        order = np.arange(start, start + length) % TRAIL_LENGTH
+        return [tuple(p) for p in self.trail[row, order].tolist()]
+
+    def set_trail(self, row: int, points: List[Tuple[float, float]]):
+        """Replace a row's trail (only the newest TRAIL_LENGTH points are kept)"""
+        points = list(points)[-TRAIL_LENGTH:]
+        length = len(points)
+        if length:
+            self.trail[row, :length] = points
+        self.trail_len[row] = length
+        self.trail_head[row] = length % TRAIL_LENGTH
+
+    def record_trail(self, rows=None):
+        """Append every row's current position to its trail"""
+        if rows is None:
+            rows = np.arange(self.size)
+        head = self.trail_head[rows]
+        self.trail[rows, head, 0] = self.x[rows]
+        self.trail[rows, head, 1] = self.y[rows]
+        self.trail_head[rows] = (head + 1) % TRAIL_LENGTH
+        self.trail_len[rows] = np.minimum(self.trail_len[rows] + 1, TRAIL_LENGTH)
+
+    def clear(self):
+        """Remove all rows"""
+        self.remove_many(np.arange(self.size))
+
+    def find(self, entity_id: str) -> int:
+        """Row of the entity with the given id (-1 if there is none)"""
+        if isinstance(self.views, LazyViews):
+            return self.views.find(entity_id)
+        for row, entity in enumerate(self.views):
+            if entity.id == entity_id:
+                return row
+        return -1
+
+    def identities(self) -> Tuple[List[str], List[Optional[str]]]:
+        """(ids, parent ids) in row order, without binding lazy views"""
+        if isinstance(self.views, LazyViews):
+            pairs = [self.views.identity(row) for row in range(self.size)]
+        else:
+            pairs = [(entity.id, entity.parent_id) for entity in self.views]
+        return [eid for eid, _ in pairs], [parent_id for _, parent_id in pairs]
+
+    def entities(self) -> List['Entity']:
+        """Snapshot list of views, in row order"""
+        return list(self.views)
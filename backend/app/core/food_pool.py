@@ -0,0 +1,158 @@
+"""
+Food pool - persistent array-backed storage for food pellets and corpses
+Slots are reused through a free list, so a pellet keeps its slot (and its
+spatial grid entry) from spawn until it is eaten.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from .entity_store import PALETTE, color_index
+from .food_spawner import Food
+
+
+class FoodPool:
+    """Column storage for foods with free-list slot allocation"""
+
+    # Column name -> dtype
+    COLUMNS: Dict[str, type] = {
+        'x': np.float64,
+        'y': np.float64,
+        'energy': np.float64,
+        'radius': np.float64,
+        'color': np.uint8,
+        'active': np.bool_,
+    }
+
+    def __init__(self, capacity: int = 64):
+        self.capacity = max(1, capacity)
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(self.capacity, dtype=dtype))
+        self.ids: List[Optional[str]] = []
+        self.free: List[int] = []
+        self.count = 0
+        # Slots added since the spatial grid last picked them up
+        self.pending: List[int] = []
+        # Bumped on every add/remove so indexes can skip unchanged pools
+        self.version = 0
+
+    @classmethod
+    def adopt(cls, foods) -> 'FoodPool':
+        """Return `foods` if it already is a pool, else a new pool holding them"""
+        if isinstance(foods, FoodPool):
+            return foods
+        foods = list(foods)
+        pool = cls(capacity=len(foods))
+        pool.extend(foods)
+        return pool
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Food]:
+        return iter(self.foods())
+
+    @property
+    def high_water(self) -> int:
+        """Number of slots ever handed out (active or free)"""
+        return len(self.ids)
+
+    def _grow(self, min_capacity: int):
+        """Reallocate all columns with (at least) doubled capacity"""
+        capacity = self.capacity
+        while capacity < min_capacity:
+            capacity *= 2
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:old.size] = old
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add(self, food: Food) -> int:
+        """Store a food and return its slot"""
+        if self.free:
+            slot = self.free.pop()
+            self.ids[slot] = food.id
+        else:
+            slot = len(self.ids)
+            if slot >= self.capacity:
+                self._grow(slot + 1)
+            self.ids.append(food.id)
+
+        self.x[slot] = food.x
+        self.y[slot] = food.y
+        self.energy[slot] = food.energy
+        self.radius[slot] = food.radius
+        self.color[slot] = color_index(food.color)
+        self.active[slot] = True
+        self.count += 1
+        self.pending.append(slot)
+        self.version += 1
+        return slot
+
+    def extend(self, foods: Iterable[Food]):
+        """Store several foods"""
+        for food in foods:
+            self.add(food)
+
+    def remove_many(self, slots):
+        """Free a batch of slots in place"""
+        slots = np.asarray(slots, dtype=np.int64)
+        slots = slots[self.active[slots]]
+        if slots.size == 0:
+            return
+        self.active[slots] = False
+        for slot in slots.tolist():
+            self.ids[slot] = None
+        self.free.extend(slots.tolist())
+        self.count -= slots.size
+        self.version += 1
+
+    def active_slots(self) -> np.ndarray:
+        """Slots currently holding food, ascending"""
+        return np.flatnonzero(self.active[:self.high_water])
+
+    def take_pending(self) -> np.ndarray:
+        """Drain slots added since the last call that are still active"""
+        slots = np.unique(np.asarray(self.pending, dtype=np.int64))
+        self.pending = []
+        return slots[self.active[slots]]
+
+    def clear(self):
+        """Remove all foods and forget every slot"""
+        self.active[:] = False
+        self.ids = []
+        self.free = []
+        self.count = 0
+        self.pending = []
+        self.version += 1
+
+    def get(self, slot: int) -> Food:
+        """Per-object copy of the food in a slot"""
+        return Food(
+            id=self.ids[slot],
+            x=float(self.x[slot]),
+            y=float(self.y[slot]),
+            energy=float(self.energy[slot]),
+            radius=float(self.radius[slot]),
+            color=PALETTE[self.color[slot]],
+        )
+
+    def foods(self) -> List[Food]:
+        """Per-object copies of all active foods"""
+        return [self.get(slot) for slot in self.active_slots().tolist()]
+
+    def to_dicts(self) -> List[dict]:
+        """Serialize all active foods (same shape as Food.to_dict)"""
+        slots = self.active_slots()
+        return [
+            {'id': self.ids[slot], 'x': x, 'y': y, 'radius': r, 'color': PALETTE[c]}
+            for slot, x, y, r, c in zip(
+                slots.tolist(),
+                self.x[slots].tolist(),
+                self.y[slots].tolist(),
+                self.radius[slots].tolist(),
+                self.color[slots].tolist(),
+            )
+        ]
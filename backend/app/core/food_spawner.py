@@ -64,3 +64,18 @@ class FoodSpawner:
             )
             foods.append(food)
         return foods
+    
+    def spawn_corpses(self, store, rows) -> list:
+        """Turn dead entity rows of an EntityStore into corpse food"""
+        xs = store.x[rows].tolist()
+        ys = store.y[rows].tolist()
+        return [
+            Food(
+                id=f"corpse_{store.views[row].id[:8]}",
+                x=x,
+                y=y,
+                energy=10.0,  # Corpse provides some energy
+                color=(150, 75, 0)  # Brown for corpses
+            )
+            for row, x, y in zip(rows.tolist(), xs, ys)
+        ]
@@ -4,93 +4,184 @@ Handles collision detection, energy transfer, and food consumption
 """
 import math
 from typing import List, Tuple
-from .entity import Entity
-from .food_spawner import Food
+
+import numpy as np
+
+from .entity_store import EntityStore
+from .food_pool import FoodPool
 from .spatial_grid import SpatialGrid
 
 
 class PhysicsEngine:
     """Manages all physics calculations and interactions"""
     
-    def __init__(self, world_width: int, world_height: int):
+    def __init__(self, world_width: int, world_height: int, incremental_grid: bool = False,
+                 collision_iterations: int = 1):
         self.world_width = world_width
         self.world_height = world_height
-        self.spatial_grid = SpatialGrid(cell_size=50)
+        self.collision_iterations = collision_iterations
+        self._indexed_pool = None
+        self._indexed_version = -1
+        # (eater UIDs, energy eaten) of the last food consumption check
+        self.meals: Tuple[np.ndarray, np.ndarray] = (np.empty(0, dtype=np.int64), np.empty(0))
+        self.spatial_grid = SpatialGrid(
+            cell_size=50,
+            world_width=world_width,
+            world_height=world_height,
+            incremental=incremental_grid
+        )
     
-    def update(self, entities: List[Entity], foods: List[Food], dt: float) -> Tuple[List[Entity], List[Food]]:
-        """Update all physics for one timestep"""
-        # Rebuild spatial grid
-        self.spatial_grid.update_entities(entities)
-        self.spatial_grid.update_foods(foods)
+    def update(self, entities, foods, dt: float) -> Tuple[object, object]:
+        """Update all physics for one timestep
+        
+        `entities` is an EntityStore (or a list of entities, adopted into
+        one) and `foods` a FoodPool (or a list of foods). Stores and pools
+        are updated in place and handed back; for a food list the
+        remaining foods are returned as a new list.
+        """
+        store = EntityStore.adopt(entities)
+        pool = FoodPool.adopt(foods)
+        
+        # Rebuild (or incrementally update) spatial grid
+        self.spatial_grid.reset_stats()
+        self.spatial_grid.update_entities(store)
+        self.index_foods(pool)
         
         # Check food consumption
-        foods = self.check_food_consumption(entities, foods)
+        self.check_food_consumption(store, pool)
         
         # Check entity collisions (simple separation)
-        self.resolve_entity_collisions(entities)
+        self.resolve_entity_collisions(store)
         
-        return entities, foods
+        return entities, foods if pool is foods else pool.foods()
+    
+    def index_foods(self, pool: FoodPool):
+        """Bring the food layer up to date with `pool` (cheap when unchanged)"""
+        if pool is not self._indexed_pool:
+            # A different pool than last time: index it from scratch
+            self.spatial_grid['foods'].clear()
+            pool.pending = pool.active_slots().tolist()
+            self._indexed_pool = pool
+            self._indexed_version = -1
+        if pool.version != self._indexed_version:
+            self.spatial_grid.update_foods(pool)
+            self._indexed_version = pool.version
     
-    def check_food_consumption(self, entities: List[Entity], foods: List[Food]) -> List[Food]:
-        """Check if any entity is close enough to eat food"""
-        remaining_foods = []
+    def integrate(self, store: EntityStore, dt: float, photosynthesis: float, existence_tax: float):
+        """Batched movement, wall bounce and energy step for every entity
         
-        for food in foods:
-            eaten = False
-            
-            # Get nearby entities using spatial grid
-            nearby_entities = self.spatial_grid.get_nearby(food.x, food.y)
-            
-            for entity in nearby_entities:
-                if not isinstance(entity, Entity):
-                    continue
-                
-                # Calculate distance
-                dx = entity.x - food.x
-                dy = entity.y - food.y
-                dist_sq = dx * dx + dy * dy
-                eat_dist_sq = (entity.radius + food.radius) ** 2
-                
-                if dist_sq < eat_dist_sq:
-                    entity.eat_food(food.energy)
-                    eaten = True
-                    break
+        Performs exactly the same float operations, in the same order, as
+        Entity.update_physics followed by Entity.update_energy, so results
+        are bit-identical to the per-object path.
+        """
+        n = store.size
+        if n == 0:
+            return
+        radius = store.radius[:n]
+        
+        for pos, vel, limit in ((store.x[:n], store.vx[:n], self.world_width),
+                                (store.y[:n], store.vy[:n], self.world_height)):
+            # Update position
+            pos += vel * dt
             
-            if not eaten:
-                remaining_foods.append(food)
+            # Wall collision with bounce
+            low = pos - radius < 0
+            high = ~low & (pos + radius > limit)
+            pos[low] = radius[low]
+            pos[high] = limit - radius[high]
+            vel[low | high] *= -0.8  # Energy loss on bounce
+        
+        # Update trail
+        store.record_trail()
         
-        return remaining_foods
+        # Passive income and costs
+        energy = store.energy[:n]
+        energy += photosynthesis * dt
+        energy -= existence_tax * dt
+        np.minimum(energy, store.max_energy[:n], out=energy)
+        store.age[:n] += 1
     
-    def resolve_entity_collisions(self, entities: List[Entity]):
-        """Simple collision resolution - push entities apart"""
-        for i, entity1 in enumerate(entities):
-            # Get nearby entities using spatial grid
-            nearby = self.spatial_grid.get_nearby(entity1.x, entity1.y)
+    def check_food_consumption(self, store: EntityStore, pool: FoodPool) -> np.ndarray:
+        """Let entities eat the food within reach; returns the eaten slots
+        
+        One batched query from entity positions into the food layer, so the
+        cost follows the number of entities rather than the amount of food.
+        When several entities reach the same pellet the nearest one eats
+        it, with ties going to the oldest entity (lowest uid).
+        """
+        n = store.size
+        self.meals = (np.empty(0, dtype=np.int64), np.empty(0))
+        if n == 0 or len(pool) == 0:
+            return np.empty(0, dtype=np.int64)
+        
+        # Nearby food of every entity, from the food layer only
+        rows, slots = self.spatial_grid['foods'].candidates(store.x[:n], store.y[:n])
+        
+        # Calculate distance
+        dx = pool.x[slots] - store.x[rows]
+        dy = pool.y[slots] - store.y[rows]
+        dist_sq = dx * dx + dy * dy
+        eat_dist = store.radius[rows] + pool.radius[slots]
+        in_reach = dist_sq < eat_dist * eat_dist
+        if not in_reach.any():
+            return np.empty(0, dtype=np.int64)
+        rows, slots, dist_sq = rows[in_reach], slots[in_reach], dist_sq[in_reach]
+        
+        # Deterministic winner per pellet: nearest, then lowest uid
+        order = np.lexsort((store.uid[rows], dist_sq, slots))
+        eaten, first = np.unique(slots[order], return_index=True)
+        eaters = rows[order][first]
+        
+        # Per-eat clamping to max_energy reduces to one clamp on the sum
+        gained = np.bincount(eaters, weights=pool.energy[eaten], minlength=n)
+        energy = store.energy[:n]
+        hungry = gained > 0
+        energy[hungry] = np.minimum(energy[hungry] + gained[hungry], store.max_energy[:n][hungry])
+        
+        self.meals = (store.uid[eaters], pool.energy[eaten])
+        
+        # Remove in place
+        self.spatial_grid.remove_foods(eaten)
+        pool.remove_many(eaten)
+        return eaten
+    
+    def resolve_entity_collisions(self, store: EntityStore):
+        """Simple collision resolution - push entities apart
+        
+        The broad phase lists each candidate pair once (same cell plus the
+        forward half of the neighborhood); the narrow phase then tests and
+        separates all pairs at once. Extra relaxation iterations reuse the
+        same pairs against updated positions.
+        """
+        n = store.size
+        if n < 2:
+            return
+        
+        i, j = self.spatial_grid['entities'].half_pairs()
+        if i.size == 0:
+            return
+        
+        x = store.x[:n]
+        y = store.y[:n]
+        min_dist = store.radius[i] + store.radius[j]
+        
+        for _ in range(self.collision_iterations):
+            # Calculate distance
+            dx = x[j] - x[i]
+            dy = y[j] - y[i]
+            dist_sq = dx * dx + dy * dy
+            hit = (dist_sq < min_dist * min_dist) & (dist_sq > 0)
+            if not hit.any():
+                break
             
-            for entity2 in nearby:
-                if not isinstance(entity2, Entity):
-                    continue
-                if entity1.id == entity2.id:
-                    continue
-                
-                # Calculate distance
-                dx = entity2.x - entity1.x
-                dy = entity2.y - entity1.y
-                dist_sq = dx * dx + dy * dy
-                min_dist = entity1.radius + entity2.radius
-                
-                if dist_sq < min_dist * min_dist and dist_sq > 0:
-                    # Push apart
-                    dist = math.sqrt(dist_sq)
-                    overlap = min_dist - dist
-                    nx = dx / dist
-                    ny = dy / dist
-                    
-                    # Move each entity half the overlap distance
-                    entity1.x -= nx * overlap * 0.5
-                    entity1.y -= ny * overlap * 0.5
-                    entity2.x += nx * overlap * 0.5
-                    entity2.y += ny * overlap * 0.5
+            # Push apart: each entity moves half the overlap along the normal
+            dist = np.sqrt(dist_sq[hit])
+            push = (min_dist[hit] - dist) * 0.5 / dist
+            px = dx[hit] * push
+            py = dy[hit] * push
+            a, b = i[hit], j[hit]
+            x += np.bincount(b, weights=px, minlength=n) - np.bincount(a, weights=px, minlength=n)
+            y += np.bincount(b, weights=py, minlength=n) - np.bincount(a, weights=py, minlength=n)
     
     def distance_to_nearest(self, x: float, y: float, objects: List) -> Tuple[float, object]:
         """Find nearest object from a list"""
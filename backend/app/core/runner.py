@@ -0,0 +1,214 @@
+"""
+Simulation runner - drives the world on its own thread
+Ticks advance on a fixed timestep (an accumulator absorbs timer jitter and
+catches up a bounded number of ticks after a slow one). In turbo mode the
+timestep is divided by a speed multiplier, or ticks run back to back when
+the multiplier is 0; the simulated time per tick (World.dt) never changes.
+Frames are published at a separate render rate through a double buffer that
+the web layer reads without locks, and control commands are queued and
+applied between ticks.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from .viewport import Viewport, ViewStream, index_world
+from .wire import DeltaEncoder
+
+
+class Frame(NamedTuple):
+    """An immutable view of the world after one tick"""
+    tick: int
+    state: dict
+    statistics: dict
+    # Binary wire frame (keyframe or delta) and the keyframe it is based on
+    binary: bytes = b''
+    keyframe: bytes = b''
+    # Viewport subscription key -> (binary, keyframe) of that view
+    views: Optional[Dict[int, Tuple[bytes, bytes]]] = None
+
+
+class FrameBuffer:
+    """Two frame slots; the writer fills the back slot, then flips the front index"""
+
+    def __init__(self):
+        self._slots = [None, None]
+        self._front = 0
+
+    def publish(self, frame: Frame):
+        back = 1 - self._front
+        self._slots[back] = frame
+        self._front = back
+
+    def read(self) -> Optional[Frame]:
+        """Latest published frame (None before the first publish)"""
+        return self._slots[self._front]
+
+
+class SimulationRunner:
+    """Runs World.update at a fixed rate on a background thread"""
+
+    MODES = ('realtime', 'turbo')
+
+    def __init__(self, world, tick_rate: float = 60.0, render_rate: float = 30.0, max_catch_up: int = 5,
+                 mode: str = 'realtime', multiplier: float = 0.0, keyframe_interval: int = 120,
+                 view_margin: float = 64.0, tile_zoom: float = 0.25):
+        self.world = world
+        self.dt = 1.0 / tick_rate
+        # Seconds between published frames
+        self.render_interval = 1.0 / render_rate
+        # Ticks run back to back before the backlog is dropped
+        self.max_catch_up = max_catch_up
+        self.mode = 'realtime'
+        self.multiplier = 0.0
+        self.ticks_per_second = 0.0
+        # Connected JSON clients; per-object JSON state is only built for them
+        self.json_clients = 0
+        self.encoder = DeltaEncoder(keyframe_interval)
+        self.keyframe_interval = keyframe_interval
+        self.view_margin = view_margin
+        self.tile_zoom = tile_zoom
+        # Viewport subscriptions (only touched on the simulation thread)
+        self.views: Dict[int, ViewStream] = {}
+        self.set_mode(mode, multiplier)
+        self.frames = FrameBuffer()
+        self._commands: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Publish the initial frame and start ticking"""
+        if self.running:
+            return
+        self._publish()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="simulation", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop ticking (waits for the current tick to finish)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def set_mode(self, mode: str, multiplier: Optional[float] = None) -> dict:
+        """Switch between real time and turbo (multiplier 0 = as fast as possible)"""
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown run mode {mode!r}")
+        self.mode = mode
+        if multiplier is not None:
+            self.multiplier = max(0.0, float(multiplier))
+        return self.stats()
+
+    def period(self) -> float:
+        """Wall-clock seconds per tick (0 = no waiting)"""
+        if self.mode == 'realtime' or (self.world.paused and not self.world.step_mode):
+            return self.dt
+        return self.dt / self.multiplier if self.multiplier > 0 else 0.0
+
+    def stats(self) -> dict:
+        """Run mode and achieved speed"""
+        return {
+            'mode': self.mode,
+            'multiplier': self.multiplier,
+            'ticks_per_second': self.ticks_per_second,
+        }
+
+    def set_view(self, key: int, viewport: Optional[Viewport]):
+        """Subscribe `key` to a viewport, or drop its subscription with None"""
+        if viewport is None:
+            self.views.pop(key, None)
+        elif key in self.views:
+            self.views[key].viewport = viewport
+        else:
+            self.views[key] = ViewStream(viewport, self.keyframe_interval, self.view_margin, self.tile_zoom)
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Queue `fn(*args)` to run on the simulation thread between ticks"""
+        future: Future = Future()
+        self._commands.put((fn, args, future))
+        return future
+
+    def _apply_commands(self) -> bool:
+        """Run queued commands; True if any ran"""
+        applied = False
+        while True:
+            try:
+                fn, args, future = self._commands.get_nowait()
+            except queue.Empty:
+                return applied
+            applied = True
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _publish(self):
+        world = self.world
+        run = self.stats()
+        state = world.get_state(include_objects=self.json_clients > 0)
+        state['run'] = run
+        statistics = world.get_statistics()
+        statistics['run'] = run
+        binary, keyframe = self.encoder.encode(world, run)
+        views = None
+        if self.views:
+            index_world(world)
+            sequence = self.encoder.sequence
+            views = {key: view.encode(world, run, sequence) for key, view in self.views.items()}
+        self.frames.publish(Frame(world.tick, state, statistics, binary, keyframe, views))
+
+    def _tick(self) -> bool:
+        """One tick boundary: commands, then the update; True if anything changed"""
+        changed = self._apply_commands()
+        tick = self.world.tick
+        try:
+            self.world.update()
+        except Exception as e:
+            print(f"Simulation error: {e}")
+        return changed or self.world.tick != tick
+
+    def _run(self):
+        previous = time.perf_counter()
+        lag = 0.0
+        dirty = False
+        next_render = previous
+        window_start, window_tick = previous, self.world.tick
+        while not self._stop.is_set():
+            period = self.period()
+            if period == 0.0:
+                # Turbo without a cap: one tick per pass, no waiting
+                dirty |= self._tick()
+                lag = 0.0
+            else:
+                now = time.perf_counter()
+                lag += now - previous
+                steps = 0
+                while lag >= period and steps < self.max_catch_up:
+                    dirty |= self._tick()
+                    lag -= period
+                    steps += 1
+                if steps == self.max_catch_up:
+                    # Too far behind: drop the backlog instead of spiralling
+                    lag = min(lag, period)
+            previous = now = time.perf_counter()
+
+            # Achieved speed over (roughly) one-second windows
+            if now - window_start >= 1.0:
+                self.ticks_per_second = (self.world.tick - window_tick) / (now - window_start)
+                window_start, window_tick = now, self.world.tick
+
+            if dirty and now >= next_render:
+                self._publish()
+                dirty = False
+                next_render = now + self.render_interval
+
+            if period > 0.0:
+                self._stop.wait(max(0.0, period - lag))
@@ -0,0 +1,100 @@
+"""
+Sensors - per-tick perception for every creature
+Computed once per tick, before genome execution, as arrays indexed by
+EntityStore row. The VM sensor opcodes read from this buffer instead of
+scanning the world themselves.
+"""
+import math
+
+import numpy as np
+
+from .entity_store import EntityStore
+from .food_pool import FoodPool
+from .spatial_grid import GridLayer
+
+
+class SensorBuffer:
+    """Nearest-food distance/bearing and wall distance for each entity row"""
+
+    def __init__(self, sensor_range: float = 200.0):
+        self.sensor_range = sensor_range
+        self.food_dist = np.empty(0, dtype=np.float64)
+        self.food_bearing = np.empty(0, dtype=np.float64)  # radians, relative to heading
+        self.wall_dist = np.empty(0, dtype=np.float64)
+
+    def update(self, store: EntityStore, pool: FoodPool, food_layer: GridLayer,
+               world_width: float, world_height: float):
+        """Recompute all readings for the current store rows"""
+        n = store.size
+        x = store.x[:n]
+        y = store.y[:n]
+        angle = store.angle[:n]
+        self.food_dist, self.food_bearing = self._nearest_food(x, y, angle, pool, food_layer)
+        self.wall_dist = self._wall_distance(x, y, angle, store.radius[:n], world_width, world_height)
+
+    def _nearest_food(self, x, y, angle, pool: FoodPool, layer: GridLayer):
+        """Expanding-ring nearest-neighbor search over the food layer
+
+        Rings are searched outwards from each entity's cell. After ring r
+        every cell within r steps is covered, and anything further lies at
+        least r * cell_size away, so an entity is finished once its best
+        match is within that bound (or the sensor range is exhausted).
+        """
+        n = x.size
+        best_d2 = np.full(n, np.inf)
+        best_slot = np.full(n, -1, dtype=np.int64)
+        cx, cy = layer.cell_coords(x, y)
+        max_ring = math.ceil(self.sensor_range / layer.cell_size)
+
+        active = np.arange(n)
+        for ring in range(max_ring + 1):
+            query, slots = layer.ring_candidates(cx[active], cy[active], ring)
+            if slots.size:
+                rows = active[query]
+                dx = pool.x[slots] - x[rows]
+                dy = pool.y[slots] - y[rows]
+                d2 = dx * dx + dy * dy
+
+                # Closest candidate per row (ties to the lower slot)
+                order = np.lexsort((slots, d2, rows))
+                found, first = np.unique(rows[order], return_index=True)
+                cand_d2 = d2[order][first]
+                better = cand_d2 < best_d2[found]
+                best_d2[found[better]] = cand_d2[better]
+                best_slot[found[better]] = slots[order][first][better]
+
+            bound = ring * layer.cell_size
+            active = active[best_d2[active] > bound * bound]
+            if active.size == 0:
+                break
+
+        dist = np.sqrt(best_d2)
+        seen = dist <= self.sensor_range
+        bearing = np.zeros(n)
+        rows = np.flatnonzero(seen)
+        slots = best_slot[rows]
+        heading = np.arctan2(pool.y[slots] - y[rows], pool.x[slots] - x[rows]) - angle[rows]
+        bearing[rows] = (heading + math.pi) % (2 * math.pi) - math.pi
+        dist[~seen] = self.sensor_range
+        return dist, bearing
+
+    def _wall_distance(self, x, y, angle, radius, world_width, world_height):
+        """Distance along the heading until the body touches a wall"""
+        cos = np.cos(angle)
+        sin = np.sin(angle)
+        tx = np.full(x.size, np.inf)
+        ty = np.full(x.size, np.inf)
+        # The body touches a wall when its centre is one radius away from it
+        np.divide(world_width - radius - x, cos, out=tx, where=cos > 0)
+        np.divide(radius - x, cos, out=tx, where=cos < 0)
+        np.divide(world_height - radius - y, sin, out=ty, where=sin > 0)
+        np.divide(radius - y, sin, out=ty, where=sin < 0)
+        return np.clip(np.minimum(tx, ty), 0.0, None)
+
+    def read(self, row: int):
+        """(food distance, food bearing in degrees, wall distance) for one row"""
+        return (
+            float(self.food_dist[row]),
+            math.degrees(self.food_bearing[row]),
+            float(self.wall_dist[row]),
+        )
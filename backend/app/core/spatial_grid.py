@@ -1,52 +1,443 @@
 """
 Spatial grid for efficient collision detection
 Uses grid-based spatial partitioning to reduce collision checks from O(N²) to O(N)
+
+Each object type lives in its own layer. A layer is rebuilt by counting sort
+into flat CSR arrays: `cell_start[c]:cell_start[c] + cell_count[c]` is the
+slice of `items` (object indices) that fall in cell `c`.
 """
-from typing import Dict, List, Tuple, Set
-from collections import defaultdict
+import math
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+
+# Neighborhood offsets (dx outer, dy inner) - the 3x3 block around a cell
+NEIGHBOR_OFFSETS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+# Half of the 8 surrounding cells; together with the cell itself every
+# neighboring cell pair is visited from exactly one side
+FORWARD_OFFSETS = [(0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+_RING_OFFSETS: Dict[int, np.ndarray] = {}
+
+
+def ring_offsets(ring: int) -> np.ndarray:
+    """(k, 2) cell offsets at Chebyshev distance `ring` (cached)"""
+    offsets = _RING_OFFSETS.get(ring)
+    if offsets is None:
+        span = range(-ring, ring + 1)
+        offsets = np.array(
+            [(dx, dy) for dx in span for dy in span if max(abs(dx), abs(dy)) == ring],
+            dtype=np.int64,
+        ).reshape(-1, 2)
+        _RING_OFFSETS[ring] = offsets
+    return offsets
+
+
+class GridLayer:
+    """Flat cell-start/cell-count index for one object type"""
+
+    def __init__(self, cell_size: float, world_width: float, world_height: float):
+        self.cell_size = cell_size
+        self.cols = max(1, math.ceil(world_width / cell_size))
+        self.rows = max(1, math.ceil(world_height / cell_size))
+        self.num_cells = self.cols * self.rows
+
+        # Small grids sort as uint16, which numpy handles with a radix sort
+        self.cell_dtype = np.uint16 if self.num_cells < 2 ** 16 - 1 else np.int32
+
+        # Cell `num_cells` is an always-empty sentinel used for padding
+        self.cell_start = np.zeros(self.num_cells + 1, dtype=np.int64)
+        self.cell_count = np.zeros(self.num_cells + 1, dtype=np.int64)
+        self.items = np.empty(0, dtype=np.int64)
+        self.cell_of = np.empty(0, dtype=self.cell_dtype)
+        self.neighbors = self._build_neighbor_table(NEIGHBOR_OFFSETS)
+        self.forward_neighbors = self._build_neighbor_table(FORWARD_OFFSETS)
+
+    def _build_neighbor_table(self, offsets) -> np.ndarray:
+        """(num_cells + 1, len(offsets)) table of neighbor cells, sentinel outside the grid"""
+        cx, cy = np.divmod(np.arange(self.num_cells), self.rows)
+        table = np.full((self.num_cells + 1, len(offsets)), self.num_cells, dtype=np.int64)
+        for k, (dx, dy) in enumerate(offsets):
+            nx, ny = cx + dx, cy + dy
+            inside = (nx >= 0) & (nx < self.cols) & (ny >= 0) & (ny < self.rows)
+            table[:-1, k] = np.where(inside, nx * self.rows + ny, self.num_cells)
+        return table
+
+    def __len__(self) -> int:
+        return self.items.size
+
+    def cell_coords(self, xs, ys) -> Tuple[np.ndarray, np.ndarray]:
+        """Convert world coordinates to (column, row) cell coordinates, clamped"""
+        cx = np.clip(np.floor_divide(xs, self.cell_size), 0, self.cols - 1).astype(np.int64)
+        cy = np.clip(np.floor_divide(ys, self.cell_size), 0, self.rows - 1).astype(np.int64)
+        return cx, cy
+
+    def cell_index(self, xs, ys) -> np.ndarray:
+        """Convert world coordinates to flat cell indices (clamped to the grid)"""
+        cx, cy = self.cell_coords(xs, ys)
+        return (cx * self.rows + cy).astype(self.cell_dtype)
+
+    def clear(self):
+        """Empty every cell"""
+        self.cell_start[:] = 0
+        self.cell_count[:] = 0
+        self.items = np.empty(0, dtype=np.int64)
+        self.cell_of = np.empty(0, dtype=self.cell_dtype)
+
+    def rebuild(self, xs, ys, ids=None):
+        """Counting sort objects into cells (ids default to 0..n-1)"""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        cells = self.cell_index(xs, ys)
+
+        # Counting pass, then exclusive prefix sum for cell starts
+        counts = np.bincount(cells, minlength=self.num_cells + 1)
+        self.cell_count[:] = counts
+        self.cell_start[0] = 0
+        np.cumsum(counts[:-1], out=self.cell_start[1:])
+
+        # Stable scatter into cell order
+        self.items = np.argsort(cells, kind='stable')
+        if ids is not None:
+            self.items = np.asarray(ids, dtype=np.int64)[self.items]
+        self.cell_of = cells
+
+    def get_nearby(self, x: float, y: float) -> np.ndarray:
+        """Indices of objects in the 3x3 cells around (x, y)"""
+        cell = self.cell_index(x, y)
+        parts = [
+            self.items[self.cell_start[c]:self.cell_start[c] + self.cell_count[c]]
+            for c in self.neighbors[cell]
+        ]
+        return np.concatenate(parts)
+
+    def candidates(self, qx, qy, query_cells=None) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched 3x3 neighborhood query
+
+        Returns parallel arrays (query index, object index) listing every
+        object in the neighborhood of every query point, ordered by query
+        and then by cell. One call covers all queries; nothing is allocated
+        per query.
+        """
+        if query_cells is None:
+            query_cells = self.cell_index(np.asarray(qx, dtype=np.float64), np.asarray(qy, dtype=np.float64))
+        cells = self.neighbors[query_cells]
+        return self._expand(cells.ravel(), cells.shape[1])
+
+    def ring_candidates(self, cx: np.ndarray, cy: np.ndarray, ring: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Batched query of the cells exactly `ring` steps (Chebyshev) from each query cell"""
+        offsets = ring_offsets(ring)
+        nx = cx[:, None] + offsets[:, 0]
+        ny = cy[:, None] + offsets[:, 1]
+        inside = (nx >= 0) & (nx < self.cols) & (ny >= 0) & (ny < self.rows)
+        cells = np.where(inside, nx * self.rows + ny, self.num_cells)
+        return self._expand(cells.ravel(), len(offsets))
+
+    def cell_range(self, x0: float, y0: float, x1: float, y1: float) -> Tuple[int, int, int, int]:
+        """(first column, first row, last column, last row) of cells overlapping a rectangle"""
+        cx0, cy0 = self.cell_coords(x0, y0)
+        cx1, cy1 = self.cell_coords(x1, y1)
+        return int(cx0), int(cy0), int(cx1), int(cy1)
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> np.ndarray:
+        """Objects in every cell overlapping a rectangle (a superset of those inside it)"""
+        cx0, cy0, cx1, cy1 = self.cell_range(x0, y0, x1, y1)
+        cells = (np.arange(cx0, cx1 + 1)[:, None] * self.rows + np.arange(cy0, cy1 + 1)).ravel()
+        return self._expand(cells, 1)[1]
+
+    def counts(self) -> np.ndarray:
+        """(cols, rows) view of per-cell object counts"""
+        return self.cell_count[:-1].reshape(self.cols, self.rows)
+
+    def half_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Every unordered pair of objects in neighboring cells, listed once
+
+        Pairs within a cell are emitted in slot order (a < b); pairs across
+        cells only towards the four forward neighbors.
+        """
+        # Enumerate occupied slots: owning cell, slot within cell, object
+        cell, objs = self._expand(np.arange(self.num_cells), 1)
+        counts = self.cell_count[cell]
+        _, first = np.unique(cell, return_index=True)
+        local = np.arange(cell.size) - np.repeat(first, self.cell_count[cell[first]])
+
+        # Same cell: each slot pairs with the slots after it
+        later = counts - 1 - local
+        owner = np.repeat(np.arange(cell.size), later)
+        offset = np.arange(owner.size) - np.repeat(np.cumsum(later) - later, later)
+        partner = self.cell_start[cell[owner]] + local[owner] + 1 + offset
+        same_i, same_j = objs[owner], self.items[partner]
+
+        # Neighboring cells: forward half of the neighborhood only
+        query, cross_j = self._expand(self.forward_neighbors[cell].ravel(), len(FORWARD_OFFSETS))
+        cross_i = objs[query]
+
+        return np.concatenate((same_i, cross_i)), np.concatenate((same_j, cross_j))
+
+    def _expand(self, cells: np.ndarray, per_query: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Expand a flat list of cells (per_query per query) into (query, item) pairs"""
+        counts = self.cell_count[cells]
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        segment = np.repeat(np.arange(cells.size), counts)
+        first = np.cumsum(counts) - counts
+        positions = self.cell_start[cells][segment] + (np.arange(total) - first[segment])
+        return segment // per_query, self.items[positions]
+
+
+class IncrementalGridLayer(GridLayer):
+    """Grid layer whose objects keep their cell slot between ticks
+
+    Every cell owns a region of a shared slot pool (`items[cell_start[c]:
+    cell_start[c] + cell_cap[c]]`), `bucket_width` slots to begin with. A
+    cell that overflows moves to a region twice its size at the end of the
+    pool, so one crowded cell grows alone instead of widening every cell;
+    abandoned regions are reclaimed by compacting the pool once they
+    outweigh the live ones. Objects are only touched when their cell
+    changes, so a mostly static population costs one vectorized comparison
+    per tick. Cell `c` is the CSR range `cell_start[c] : cell_start[c] +
+    count`, so batched queries work exactly as for a rebuilt layer.
+    """
+
+    def __init__(self, cell_size: float, world_width: float, world_height: float,
+                 bucket_width: int = 8):
+        super().__init__(cell_size, world_width, world_height)
+        self.cell_of = np.full(0, -1, dtype=np.int64)
+        self.slot_of = np.full(0, -1, dtype=np.int64)
+        self.population = 0
+        self.bucket_width = bucket_width
+        self._allocate_pool(np.full(self.num_cells + 1, bucket_width, dtype=np.int64))
+        self.stats = {'relocated': 0, 'stationary': 0, 'inserted': 0, 'removed': 0}
+
+    def _allocate_pool(self, capacity: np.ndarray):
+        """Lay cells out back to back with the given capacities, keeping their contents"""
+        start = np.cumsum(capacity) - capacity
+        items = np.full(int(capacity.sum()), -1, dtype=np.int64)
+        if hasattr(self, 'cell_cap'):
+            counts = self.cell_count
+            total = int(counts.sum())
+            segment = np.repeat(np.arange(counts.size), counts)
+            offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            items[start[segment] + offset] = self.items[self.cell_start[segment] + offset]
+        self.items = items
+        self.cell_start = start
+        self.cell_cap = capacity
+        # End of the used part of the pool, and slots held by live regions
+        self.pool_end = items.size
+        self.reserved = items.size
+
+    def _grow_cell(self, cell: int):
+        """Move a full cell to a region of twice the size at the end of the pool"""
+        old_cap = int(self.cell_cap[cell])
+        new_cap = 2 * old_cap
+        if self.pool_end - self.reserved > self.reserved:
+            # Abandoned regions outweigh live ones: compact, then retry
+            self.compact()
+            if int(self.cell_count[cell]) < int(self.cell_cap[cell]):
+                return
+        if self.pool_end + new_cap > self.items.size:
+            # Leave room for this cell's next doubling as well
+            items = np.full(self.pool_end + 3 * new_cap, -1, dtype=np.int64)
+            items[:self.pool_end] = self.items[:self.pool_end]
+            self.items = items
+        start = int(self.cell_start[cell])
+        self.items[self.pool_end:self.pool_end + old_cap] = self.items[start:start + old_cap]
+        self.items[start:start + old_cap] = -1
+        self.cell_start[cell] = self.pool_end
+        self.cell_cap[cell] = new_cap
+        self.pool_end += new_cap
+        self.reserved += new_cap - old_cap
+
+    def compact(self):
+        """Drop abandoned regions and shrink cells that have emptied out"""
+        counts = self.cell_count
+        # Room for twice the current count, never below the default width
+        wanted = np.left_shift(1, np.ceil(np.log2(np.maximum(2 * counts, 1))).astype(np.int64))
+        self._allocate_pool(np.maximum(wanted, self.bucket_width))
+
+    def memory(self) -> int:
+        """Bytes held by the slot pool"""
+        return self.items.nbytes
+
+    def _ensure_objects(self, n: int):
+        """Grow per-object arrays to hold ids 0..n-1"""
+        size = self.cell_of.size
+        if n <= size:
+            return
+        capacity = max(n, 2 * size, 16)
+        for name in ('cell_of', 'slot_of'):
+            old = getattr(self, name)
+            new = np.full(capacity, -1, dtype=np.int64)
+            new[:size] = old
+            setattr(self, name, new)
+
+    def __len__(self) -> int:
+        return self.population
+
+    def reset_stats(self):
+        """Zero the per-tick counters"""
+        for key in self.stats:
+            self.stats[key] = 0
+
+    def clear(self):
+        """Empty every cell (and return crowded cells to the default width)"""
+        self.cell_count[:] = 0
+        self.cell_of[:] = -1
+        self.slot_of[:] = -1
+        self.population = 0
+        self._allocate_pool(np.full(self.num_cells + 1, self.bucket_width, dtype=np.int64))
+
+    def _place(self, obj: int, cell: int):
+        count = int(self.cell_count[cell])
+        if count == self.cell_cap[cell]:
+            self._grow_cell(cell)
+        self.items[self.cell_start[cell] + count] = obj
+        self.slot_of[obj] = count
+        self.cell_of[obj] = cell
+        self.cell_count[cell] = count + 1
+
+    def _unplace(self, obj: int):
+        cell = int(self.cell_of[obj])
+        slot = int(self.slot_of[obj])
+        start = int(self.cell_start[cell])
+        last = int(self.cell_count[cell]) - 1
+        moved = int(self.items[start + last])
+        self.items[start + slot] = moved
+        self.slot_of[moved] = slot
+        self.items[start + last] = -1
+        self.cell_count[cell] = last
+        self.cell_of[obj] = -1
+        self.slot_of[obj] = -1
+
+    def contains(self, handle: int) -> bool:
+        """Whether an object id is currently placed"""
+        return handle < self.cell_of.size and self.cell_of[handle] >= 0
+
+    def insert(self, handle: int, x: float, y: float):
+        """Place an object under a caller-chosen id (e.g. a pool slot)"""
+        self._ensure_objects(handle + 1)
+        if self.cell_of[handle] >= 0:
+            return
+        self._place(handle, int(self.cell_index(x, y)))
+        self.population += 1
+        self.stats['inserted'] += 1
+
+    def remove(self, handle: int):
+        """Remove an object placed with insert()"""
+        if not self.contains(handle):
+            return
+        self._unplace(handle)
+        self.population -= 1
+        self.stats['removed'] += 1
+
+    def rebuild(self, xs, ys, ids=None):
+        """Full reinsert; prefer sync() or insert()/remove() between ticks"""
+        self.clear()
+        if ids is None:
+            self.sync(xs, ys)
+            return
+        for handle, x, y in zip(np.asarray(ids).tolist(), np.asarray(xs).tolist(), np.asarray(ys).tolist()):
+            self.insert(handle, x, y)
+
+    def sync(self, xs, ys):
+        """Track objects 0..n-1 at the given positions, moving only cell changes"""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        n = xs.size
+        self._ensure_objects(n)
+        cells = self.cell_index(xs, ys).astype(np.int64)
+
+        # Objects that no longer exist
+        gone = np.flatnonzero(self.cell_of[n:] >= 0) + n
+        for obj in gone.tolist():
+            self._unplace(obj)
+
+        current = self.cell_of[:n]
+        absent = current < 0
+        changed = np.flatnonzero(~absent & (current != cells))
+        for obj in changed.tolist():
+            self._unplace(obj)
+            self._place(obj, int(cells[obj]))
+        new = np.flatnonzero(absent)
+        for obj in new.tolist():
+            self._place(obj, int(cells[obj]))
+
+        self.population = n
+        self.stats['removed'] += gone.size
+        self.stats['inserted'] += new.size
+        self.stats['relocated'] += changed.size
+        self.stats['stationary'] += n - new.size - changed.size
 
 
 class SpatialGrid:
-    """Grid-based spatial partitioning for fast neighbor queries"""
-    
-    def __init__(self, cell_size: int = 50):
+    """Grid-based spatial partitioning with independent per-type layers"""
+
+    LAYERS = ('entities', 'foods')
+
+    def __init__(self, cell_size: int = 50, world_width: float = 800, world_height: float = 600,
+                 layers: Iterable[str] = LAYERS, incremental: bool = False):
         self.cell_size = cell_size
-        self.grid: Dict[Tuple[int, int], List] = defaultdict(list)
-    
+        self.world_width = world_width
+        self.world_height = world_height
+        self.incremental = incremental
+        layer_class = IncrementalGridLayer if incremental else GridLayer
+        self.layers: Dict[str, GridLayer] = {
+            name: layer_class(cell_size, world_width, world_height) for name in layers
+        }
+
+    def __getitem__(self, name: str) -> GridLayer:
+        return self.layers[name]
+
     def clear(self):
-        """Clear all grid cells"""
-        self.grid.clear()
-    
-    def _get_cell(self, x: float, y: float) -> Tuple[int, int]:
-        """Convert world coordinates to grid cell coordinates"""
-        return (int(x // self.cell_size), int(y // self.cell_size))
-    
-    def insert(self, obj, x: float, y: float):
-        """Insert an object at given position"""
-        cell = self._get_cell(x, y)
-        self.grid[cell].append(obj)
-    
-    def get_nearby(self, x: float, y: float, radius: float = 0) -> List:
-        """Get all objects in nearby cells (including diagonals)"""
-        cell_x, cell_y = self._get_cell(x, y)
-        
-        # Check 3x3 grid around the cell
-        nearby = []
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                cell = (cell_x + dx, cell_y + dy)
-                if cell in self.grid:
-                    nearby.extend(self.grid[cell])
+        """Clear all layers"""
+        for layer in self.layers.values():
+            layer.clear()
+
+    def reset_stats(self):
+        """Zero per-tick relocation counters (incremental mode)"""
+        if self.incremental:
+            for layer in self.layers.values():
+                layer.reset_stats()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-layer relocation counters for the current tick (incremental mode)"""
+        if not self.incremental:
+            return {}
+        return {name: dict(layer.stats) for name, layer in self.layers.items()}
+
+    def update_entities(self, store):
+        """Index the entity layer from an EntityStore (objects are store rows)"""
+        n = store.size
+        layer = self.layers['entities']
+        if self.incremental:
+            layer.sync(store.x[:n], store.y[:n])
+        else:
+            layer.rebuild(store.x[:n], store.y[:n])
+
+    def update_foods(self, pool):
+        """Index the food layer from a FoodPool (objects are pool slots)
         
-        return nearby
-    
-    def update_entities(self, entities: List):
-        """Rebuild grid with current entity positions"""
-        self.clear()
-        for entity in entities:
-            self.insert(entity, entity.x, entity.y)
-    
-    def update_foods(self, foods: List):
-        """Add foods to grid"""
-        for food in foods:
-            self.insert(food, food.x, food.y)
+        Incremental mode only inserts foods added since the last call;
+        eaten foods are dropped with remove_foods().
+        """
+        layer = self.layers['foods']
+        if self.incremental:
+            added = pool.take_pending()
+            for slot, x, y in zip(added.tolist(), pool.x[added].tolist(), pool.y[added].tolist()):
+                layer.insert(slot, x, y)
+            layer.stats['stationary'] += len(layer) - added.size
+            return
+        slots = pool.active_slots()
+        layer.rebuild(pool.x[slots], pool.y[slots], ids=slots)
+
+    def remove_foods(self, slots):
+        """Drop eaten foods from the food layer (incremental mode)"""
+        if self.incremental:
+            layer = self.layers['foods']
+            for slot in np.asarray(slots).tolist():
+                layer.remove(slot)
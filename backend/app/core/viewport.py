@@ -0,0 +1,117 @@
+"""
+Viewports - per-client culled views of the world
+A client subscribed to a viewport only receives the objects inside its
+rectangle (plus a margin), looked up through the spatial grid. Every view
+has its own delta encoder, so panning sends the objects that came into view
+as additions and those that left as removals instead of a fresh keyframe.
+Zoomed out below `tile_zoom`, a view gets density tiles instead of objects.
+"""
+import math
+from typing import NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from . import wire
+
+
+# On-screen size a density tile aims for (pixels)
+TILE_PIXELS = 16
+
+
+class Viewport(NamedTuple):
+    """Visible world rectangle and zoom (screen pixels per world unit)"""
+    x: float
+    y: float
+    width: float
+    height: float
+    zoom: float
+
+    @classmethod
+    def parse(cls, params: dict) -> 'Viewport':
+        """Validate viewport parameters sent by a client"""
+        try:
+            viewport = cls(*(float(params[name]) for name in cls._fields))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Viewport needs numeric x, y, width, height and zoom")
+        if not all(math.isfinite(value) for value in viewport):
+            raise ValueError("Viewport values must be finite")
+        if viewport.width <= 0 or viewport.height <= 0 or viewport.zoom <= 0:
+            raise ValueError("Viewport width, height and zoom must be positive")
+        return viewport
+
+
+def index_world(world):
+    """Bring the spatial grid up to date for viewport queries between ticks"""
+    grid = world.physics.spatial_grid
+    if len(grid['entities']) != world.store.size:
+        grid.update_entities(world.store)
+    world.physics.index_foods(world.foods)
+
+
+class ViewStream:
+    """Frames for one subscribed viewport"""
+
+    def __init__(self, viewport: Viewport, keyframe_interval: int = 120,
+                 margin: float = 64.0, tile_zoom: float = 0.25):
+        self.viewport = viewport
+        self.margin = margin
+        self.tile_zoom = tile_zoom
+        self.encoder = wire.DeltaEncoder(keyframe_interval)
+
+    @property
+    def tiled(self) -> bool:
+        return self.viewport.zoom < self.tile_zoom
+
+    def bounds(self) -> Tuple[float, float, float, float]:
+        """Culling rectangle (x0, y0, x1, y1): the viewport plus the margin"""
+        v, m = self.viewport, self.margin
+        return v.x - m, v.y - m, v.x + v.width + m, v.y + v.height + m
+
+    def cull(self, world) -> Tuple[dict, dict]:
+        """Wire columns of the entities and foods inside the bounds"""
+        x0, y0, x1, y1 = self.bounds()
+        grid = world.physics.spatial_grid
+        store, pool = world.store, world.foods
+
+        rows = grid['entities'].query_rect(x0, y0, x1, y1)
+        rows = np.sort(rows[rows < store.size])
+        xs, ys = store.x[rows], store.y[rows]
+        rows = rows[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+
+        slots = grid['foods'].query_rect(x0, y0, x1, y1)
+        slots = np.sort(slots[(slots < pool.high_water)])
+        slots = slots[pool.active[slots]]
+        xs, ys = pool.x[slots], pool.y[slots]
+        slots = slots[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+
+        return wire.entity_columns(store, rows), wire.food_columns(pool, slots)
+
+    def tiles(self, world, run: Optional[dict], sequence: int) -> bytes:
+        """Density tile frame: grid cells merged into tiles about TILE_PIXELS wide"""
+        grid = world.physics.spatial_grid
+        layer = grid['entities']
+        cell = layer.cell_size
+        merge = max(1, math.ceil(TILE_PIXELS / (cell * self.viewport.zoom)))
+        cx0, cy0, cx1, cy1 = layer.cell_range(*self.bounds())
+
+        def merged(counts: np.ndarray) -> np.ndarray:
+            counts = counts[cx0:cx1 + 1, cy0:cy1 + 1]
+            cols, rows = -(-counts.shape[0] // merge), -(-counts.shape[1] // merge)
+            padded = np.zeros((cols * merge, rows * merge), dtype=np.int64)
+            padded[:counts.shape[0], :counts.shape[1]] = counts
+            return padded.reshape(cols, merge, rows, merge).sum(axis=(1, 3))
+
+        return wire.encode_tiles(
+            world, run, sequence, (cx0 * cell, cy0 * cell), merge * cell,
+            merged(layer.counts()), merged(grid['foods'].counts())
+        )
+
+    def encode(self, world, run: Optional[dict] = None, sequence: int = 0) -> Tuple[bytes, bytes]:
+        """(frame to send, keyframe it is based on) for this view"""
+        if self.tiled:
+            # Tiles are self-contained; objects resume with a keyframe
+            self.encoder.reset()
+            frame = self.tiles(world, run, sequence)
+            return frame, frame
+        entities, foods = self.cull(world)
+        return self.encoder.encode(world, run, sequence, entities, foods)
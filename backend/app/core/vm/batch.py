@@ -0,0 +1,172 @@
+"""
+Lockstep batch VM - runs one genome over many creatures at once
+Creatures are grouped by pooled genome ID; each group executes its program once over
+arrays of per-creature (lane) stacks, registers and sensor inputs. Every lane
+keeps its own pc and gas, so lanes that branch differently on JUMP_IF are
+simply masked out until the instruction they are waiting at comes up.
+"""
+from typing import List
+
+import numpy as np
+
+from .compiler import genome_compiler
+from .instructions import REGISTER_COUNT, STACK_DEPTH, Instruction, Opcode
+from .pool import GenomePool, genome_pool
+
+
+class BatchVM:
+    """Executes genome groups with vector operations per instruction"""
+
+    def __init__(self, max_gas: int = 50, min_group: int = 8):
+        self.max_gas = max_gas
+        # Smaller groups are cheaper to run one creature at a time
+        self.min_group = min_group
+
+    def run(self, store, sensors=None, fallback=None, rows=None):
+        """Run the genomes of `rows` (default: all); intents land in the store columns
+
+        Groups smaller than `min_group` (and creatures without a genome) are
+        handed to `fallback(entity)` instead.
+        """
+        if rows is None:
+            rows = np.arange(store.size)
+        ids = store.genome_id[rows]
+        order = rows[np.argsort(ids, kind='stable')]
+        gids, starts, counts = np.unique(store.genome_id[order], return_index=True, return_counts=True)
+
+        for gid, start, count in zip(gids.tolist(), starts.tolist(), counts.tolist()):
+            rows = order[start:start + count]
+            if gid == GenomePool.EMPTY or count < self.min_group:
+                if fallback is not None:
+                    for row in rows.tolist():
+                        fallback(store.views[row])
+                continue
+            program = genome_pool.program(gid)
+            summary = genome_compiler.summary(program, genome_pool.key(gid))
+            if summary is not None and summary.gas <= self.max_gas:
+                # Input-independent program: same outcome for every lane
+                self._apply(
+                    store, rows,
+                    np.full(count, np.nan if summary.move is None else summary.move),
+                    np.full(count, summary.rotate),
+                    np.full(count, summary.split)
+                )
+                continue
+            self.run_group(program, rows, store, sensors)
+
+    def run_group(self, program: List[Instruction], rows: np.ndarray, store, sensors=None) -> np.ndarray:
+        """Execute `program` for the given store rows; returns remaining gas per lane"""
+        n = len(program)
+        lanes = rows.size
+
+        # Per-lane machine state
+        pc = np.zeros(lanes, dtype=np.int64)
+        gas = np.full(lanes, self.max_gas, dtype=np.int64)
+        stack = np.zeros((lanes, STACK_DEPTH))
+        sp = np.zeros(lanes, dtype=np.int64)
+        move = np.full(lanes, np.nan)
+        rotate = np.zeros(lanes)
+        split = np.zeros(lanes, dtype=bool)
+
+        # Inputs
+        energy = store.energy[rows]
+        if sensors is not None:
+            food_dist = sensors.food_dist[rows]
+            food_bearing = np.degrees(sensors.food_bearing[rows])
+            wall_dist = sensors.wall_dist[rows]
+        else:
+            food_dist = food_bearing = wall_dist = np.zeros(lanes)
+
+        registers = store.registers[rows]
+
+        def push(m, values):
+            # Pushes onto a full stack are discarded
+            values = np.broadcast_to(values, m.shape)
+            room = sp[m] < STACK_DEPTH
+            m = m[room]
+            stack[m, sp[m]] = values[room]
+            sp[m] += 1
+
+        def pop(m):
+            has = sp[m] > 0
+            top = np.maximum(sp[m] - 1, 0)
+            values = np.where(has, stack[m, top], 0.0)
+            sp[m] = top
+            return values
+
+        active = np.flatnonzero((gas > 0) & (pc < n))
+        while active.size:
+            # Lowest waiting pc first, so lanes that jumped ahead reconverge
+            at = int(pc[active].min())
+            m = active[pc[active] == at]
+            ins = program[at]
+            op, arg = ins.op, ins.arg
+            gas[m] -= 1
+            pc[m] = at + 1
+
+            # Sensors
+            if op == Opcode.SEE_FOOD:
+                push(m, food_bearing[m] if arg == 1 else food_dist[m])
+            elif op == Opcode.SEE_WALL:
+                push(m, wall_dist[m])
+            elif op == Opcode.MY_ENERGY:
+                push(m, energy[m])
+
+            # Logic
+            elif op == Opcode.PUSH:
+                push(m, float(arg if arg is not None else 0))
+            elif op == Opcode.POP:
+                pop(m)
+            elif op in (Opcode.ADD, Opcode.SUB, Opcode.CMP):
+                b = pop(m)
+                a = pop(m)
+                if op == Opcode.ADD:
+                    push(m, a + b)
+                elif op == Opcode.SUB:
+                    push(m, a - b)
+                else:
+                    push(m, np.where(a < b, -1.0, np.where(a > b, 1.0, 0.0)))
+            elif op == Opcode.STORE:
+                registers[m, int(arg or 0) % REGISTER_COUNT] = pop(m)
+            elif op == Opcode.LOAD:
+                push(m, registers[m, int(arg or 0) % REGISTER_COUNT])
+            elif op == Opcode.JUMP:
+                if arg is not None and 0 <= arg < n:
+                    pc[m] = arg
+            elif op == Opcode.JUMP_IF:
+                cond = pop(m)
+                if arg is not None and 0 <= arg < n:
+                    pc[m] = np.where(cond != 0, arg, at + 1)
+
+            # Actions
+            elif op == Opcode.MOVE_FWD:
+                move[m] = 1.0
+            elif op == Opcode.MOVE_BACK:
+                move[m] = -1.0
+            elif op == Opcode.ROTATE:
+                rotate[m] += (arg or 0) / 180.0 * 3.141592653589793
+            elif op == Opcode.SPLIT:
+                split[m] = True
+
+            active = active[(gas[active] > 0) & (pc[active] < n)]
+
+        self._apply(store, rows, move, rotate, split)
+        store.registers[rows] = registers
+
+        return gas
+
+    @staticmethod
+    def _apply(store, rows, move, rotate, split):
+        """Write motion intents straight into the angle/velocity columns"""
+        turned = rotate != 0
+        store.angle[rows[turned]] += rotate[turned]
+
+        moving = ~np.isnan(move)
+        moved = rows[moving]
+        speed = 30.0 * move[moving]
+        angle = store.angle[moved]
+        store.vx[moved] = np.cos(angle) * speed
+        store.vy[moved] = np.sin(angle) * speed
+
+        for row in rows[split].tolist():
+            store.views[row]._vm_split = True
@@ -0,0 +1,144 @@
+"""
+Genome compiler - turns a genome into a specialized Python callable
+Programs are split into basic blocks; each reachable block becomes
+straight-line Python (see optimizer) with its gas charged once on entry,
+and control only dispatches at block boundaries. Compiled programs are
+shared through a bounded LRU cache keyed by the packed genome bytes, so the
+analysis runs once per distinct program.
+"""
+from collections import OrderedDict
+from typing import List, Optional
+
+from ...config import settings
+from .genome import pack
+from .instructions import STACK_DEPTH, Instruction
+from .interpreter import apply_intents, read_sensors, run
+from .optimizer import OptimizedProgram, Summary, optimize
+
+
+def generate_source(program: List[Instruction], optimized: Optional[OptimizedProgram] = None) -> str:
+    """Python source for a compiled program (see CompiledProgram.run)"""
+    if optimized is None:
+        optimized = optimize(program)
+    n = len(program)
+    lines = [
+        "def compiled(gas, registers, energy, food_dist, food_bearing, wall_dist):",
+        "    stack = []",
+        "    move = None",
+        "    rotate = 0.0",
+        "    split = False",
+        "    pc = 0",
+        f"    while 0 <= pc < {n}:",
+    ]
+    for index, block in enumerate(optimized.reachable):
+        lines.append(f"        {'if' if index == 0 else 'elif'} pc == {block.start}:")
+        guard = f"gas < {block.gas}"
+        if block.max_entry_depth < STACK_DEPTH:
+            guard += f" or len(stack) > {block.max_entry_depth}"
+        lines.append(f"            if {guard}:")
+        lines.append("                return resume(program, pc, gas, stack, registers, energy, food_dist,"
+                     " food_bearing, wall_dist, move, rotate, split)")
+        lines.append(f"            gas -= {block.gas}")
+        lines.extend("            " + line for line in block.lines)
+        lines.append(f"            pc = {block.next_pc}")
+    if n == 0:
+        lines.append("        break")
+    lines.append("    return gas, move, rotate, split")
+    return "\n".join(lines) + "\n"
+
+
+class CompiledProgram:
+    """A genome compiled to a Python function"""
+
+    def __init__(self, program: List[Instruction]):
+        self.program = list(program)
+        self.optimized = optimize(self.program)
+        # Precomputed outcome of loop-free programs (None when input dependent)
+        self.summary = self.optimized.summary
+        self.source = generate_source(self.program, self.optimized)
+        namespace = {'program': self.program, 'resume': run}
+        exec(compile(self.source, "<genome>", "exec"), namespace)
+        self.fn = namespace['compiled']
+
+    def run(self, creature, sensors=None, max_gas: int = 50) -> int:
+        """Execute for one creature; same semantics as VMInterpreter.execute"""
+        summary = self.summary
+        if summary is not None and summary.gas <= max_gas:
+            apply_intents(creature, summary.move, summary.rotate, summary.split)
+            return max_gas - summary.gas
+        food_dist, food_bearing, wall_dist = read_sensors(sensors, creature)
+        gas, move, rotate, split = self.fn(
+            max_gas, creature.registers, float(creature.energy), food_dist, food_bearing, wall_dist
+        )
+        apply_intents(creature, move, rotate, split)
+        return gas
+
+
+class GenomeCompiler:
+    """Bounded LRU cache of compiled programs, shared by all creatures"""
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._cache: "OrderedDict[bytes, CompiledProgram]" = OrderedDict()
+        # Summaries of genomes that were only analyzed, never compiled
+        self._summaries: "OrderedDict[bytes, Optional[Summary]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, program: List[Instruction], key: Optional[bytes] = None) -> CompiledProgram:
+        """Compiled program for a genome (key defaults to its packed bytes)"""
+        if key is None:
+            key = pack(program).tobytes()
+        compiled = self._cache.get(key)
+        if compiled is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return compiled
+
+        self.misses += 1
+        compiled = CompiledProgram(program)
+        self._cache[key] = compiled
+        if len(self._cache) > self.capacity:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+        return compiled
+
+    def summary(self, program: List[Instruction], key: Optional[bytes] = None) -> Optional[Summary]:
+        """Precomputed outcome of a genome, without compiling it or counting a hit/miss"""
+        if key is None:
+            key = pack(program).tobytes()
+        compiled = self._cache.get(key)
+        if compiled is not None:
+            return compiled.summary
+        if key in self._summaries:
+            self._summaries.move_to_end(key)
+            return self._summaries[key]
+
+        summary = optimize(program).summary
+        self._summaries[key] = summary
+        if len(self._summaries) > self.capacity:
+            self._summaries.popitem(last=False)
+        return summary
+
+    def clear(self):
+        """Drop all compiled programs and summaries (counters are kept)"""
+        self._cache.clear()
+        self._summaries.clear()
+
+    def stats(self) -> dict:
+        """Cache counters"""
+        return {
+            'size': len(self._cache),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+# Shared by every creature in the process
+genome_compiler = GenomeCompiler(capacity=settings.vm_cache_size)
@@ -1,10 +1,18 @@
 """
 Genome encoding/decoding and simple seed genomes (Phase 2 skeleton)
 """
-from typing import List
+from typing import List, Union
+
+import numpy as np
+
 from .instructions import Instruction, Opcode
 
 
+# Packed genome: one uint16 opcode word and one int16 argument per instruction
+GENOME_DTYPE = np.dtype([('op', '<u2'), ('arg', '<i2')])
+NO_ARG = -32768  # argument slot of instructions without an argument
+
+
 def seed_wanderer() -> List[Instruction]:
     """A minimal genome that just moves forward steadily."""
     return [
@@ -39,3 +47,22 @@ def decode(data: List[int]) -> List[Instruction]:
         arg = None if arg_val == -1 else int(arg_val)
         program.append(Instruction(Opcode(op_val), arg))
     return program
+
+
+def pack(program: Union[List[Instruction], np.ndarray]) -> np.ndarray:
+    """Pack to a GENOME_DTYPE array (arguments are clipped to int16)"""
+    if isinstance(program, np.ndarray):
+        return program.astype(GENOME_DTYPE, copy=False)
+    packed = np.empty(len(program), dtype=GENOME_DTYPE)
+    packed['op'] = [int(ins.op) for ins in program]
+    packed['arg'] = [NO_ARG if ins.arg is None else max(-32767, min(32767, int(ins.arg)))
+                     for ins in program]
+    return packed
+
+
+def unpack(packed: np.ndarray) -> List[Instruction]:
+    """Instructions from a packed genome"""
+    return [
+        Instruction(Opcode(op), None if arg == NO_ARG else arg)
+        for op, arg in zip(packed['op'].tolist(), packed['arg'].tolist())
+    ]
@@ -6,6 +6,12 @@ from dataclasses import dataclass
 from typing import Optional
 
 
+# Machine limits: registers are addressed modulo REGISTER_COUNT; a push onto
+# a full stack is discarded and a pop from an empty one yields 0.0
+REGISTER_COUNT = 16
+STACK_DEPTH = 16
+
+
 class Opcode(IntEnum):
     # Sensors (inputs)
     SEE_FOOD = 0x01
@@ -2,101 +2,140 @@
 Stack-based VM interpreter (Phase 2 skeleton)
 Currently supports a minimal subset to drive movement.
 """
-from typing import List
-from .instructions import Instruction, Opcode
+from math import cos, sin
+from typing import List, Optional, Tuple
+from .instructions import REGISTER_COUNT, STACK_DEPTH, Instruction, Opcode
+
+
+def read_sensors(sensors, creature) -> Tuple[float, float, float]:
+    """(food distance, food bearing in degrees, wall distance) for a creature"""
+    if sensors is not None and getattr(creature, "_row", -1) >= 0:
+        return sensors.read(creature._row)
+    return 0.0, 0.0, 0.0
+
+
+def apply_intents(creature, move: Optional[float], rotate: float, split: bool):
+    """Apply action intents to creature (simple mapping)"""
+    if rotate:
+        creature.angle += rotate
+    if move is not None:
+        # Map -1..1 to speed
+        speed = 30.0 * float(move)
+        creature.vx = cos(creature.angle) * speed
+        creature.vy = sin(creature.angle) * speed
+    if split:
+        creature._vm_split = True
+
+
+def run(program: List[Instruction], pc: int, gas: int, stack: List[float], registers,
+        energy: float, food_dist: float, food_bearing: float, wall_dist: float,
+        move: Optional[float] = None, rotate: float = 0.0, split: bool = False, hook=None):
+    """Interpret `program` from `pc` until gas runs out or pc leaves the program
+
+    `registers` is the creature's REGISTER_COUNT-slot register file (written
+    in place). `hook(pc, ins, stack)`, if given, is called before every
+    instruction (profiling/tracing). Returns (gas, move, rotate, split).
+    Compiled programs resume here when a block cannot be paid for in full.
+    """
+    n = len(program)
+
+    def pop_default(default=0.0):
+        return stack.pop() if stack else default
+
+    def push(value):
+        if len(stack) < STACK_DEPTH:
+            stack.append(value)
+
+    while gas > 0 and 0 <= pc < n:
+        ins = program[pc]
+        if hook is not None:
+            hook(pc, ins, stack)
+        gas -= 1
+        pc += 1
+
+        op = ins.op
+        arg = ins.arg
+
+        # Sensors
+        if op == Opcode.SEE_FOOD:
+            # arg 1 selects the bearing (degrees), otherwise distance
+            push(food_bearing if arg == 1 else food_dist)
+            continue
+        if op == Opcode.SEE_WALL:
+            push(wall_dist)
+            continue
+        if op == Opcode.MY_ENERGY:
+            push(energy)
+            continue
+
+        # Logic
+        if op == Opcode.PUSH:
+            push(float(arg if arg is not None else 0))
+            continue
+        if op == Opcode.POP:
+            pop_default()
+            continue
+        if op == Opcode.ADD:
+            b = pop_default(); a = pop_default()
+            push(a + b)
+            continue
+        if op == Opcode.SUB:
+            b = pop_default(); a = pop_default()
+            push(a - b)
+            continue
+        if op == Opcode.CMP:
+            b = pop_default(); a = pop_default()
+            push(-1.0 if a < b else (1.0 if a > b else 0.0))
+            continue
+        if op == Opcode.STORE:
+            v = pop_default()
+            k = arg if arg is not None else 0
+            registers[int(k) % REGISTER_COUNT] = v
+            continue
+        if op == Opcode.LOAD:
+            k = arg if arg is not None else 0
+            push(float(registers[int(k) % REGISTER_COUNT]))
+            continue
+        if op == Opcode.JUMP:
+            if arg is not None and 0 <= arg < n:
+                pc = arg
+            continue
+        if op == Opcode.JUMP_IF:
+            cond = pop_default()
+            if cond and arg is not None and 0 <= arg < n:
+                pc = arg
+            continue
+
+        # Actions (minimal behavior wiring)
+        if op == Opcode.MOVE_FWD:
+            move = 1.0
+            continue
+        if op == Opcode.MOVE_BACK:
+            move = -1.0
+            continue
+        if op == Opcode.ROTATE:
+            rotate += (arg or 0) / 180.0 * 3.141592653589793
+            continue
+        if op == Opcode.SPLIT:
+            split = True
+            continue
+        if op == Opcode.ATTACK or op == Opcode.NOOP:
+            continue
+
+    return gas, move, rotate, split
 
 
 class VMInterpreter:
-    def __init__(self, max_gas: int = 50):
+    def __init__(self, max_gas: int = 50, sensors=None):
         self.max_gas = max_gas
+        # Precomputed per-tick SensorBuffer (None: sensors read as 0)
+        self.sensors = sensors
 
     def execute(self, creature, program: List[Instruction]):
-        stack: List[float] = []
-        memory = creature.__dict__.setdefault("vm_memory", {})
-        pc = 0
-        gas = self.max_gas
-        n = len(program)
-
-        def pop_default(default=0.0):
-            return stack.pop() if stack else default
-
-        while gas > 0 and 0 <= pc < n:
-            ins = program[pc]
-            gas -= 1
-            pc += 1
-
-            op = ins.op
-            arg = ins.arg
-
-            # Sensors
-            if op == Opcode.MY_ENERGY:
-                stack.append(float(creature.energy))
-                continue
-
-            # Logic
-            if op == Opcode.PUSH:
-                stack.append(float(arg if arg is not None else 0))
-                continue
-            if op == Opcode.POP:
-                pop_default()
-                continue
-            if op == Opcode.ADD:
-                b = pop_default(); a = pop_default()
-                stack.append(a + b)
-                continue
-            if op == Opcode.SUB:
-                b = pop_default(); a = pop_default()
-                stack.append(a - b)
-                continue
-            if op == Opcode.CMP:
-                b = pop_default(); a = pop_default()
-                stack.append(-1.0 if a < b else (1.0 if a > b else 0.0))
-                continue
-            if op == Opcode.STORE:
-                v = pop_default()
-                k = arg if arg is not None else 0
-                memory[int(k)] = v
-                continue
-            if op == Opcode.LOAD:
-                k = arg if arg is not None else 0
-                stack.append(float(memory.get(int(k), 0.0)))
-                continue
-            if op == Opcode.JUMP:
-                if arg is not None and 0 <= arg < n:
-                    pc = arg
-                continue
-            if op == Opcode.JUMP_IF:
-                cond = pop_default()
-                if cond and arg is not None and 0 <= arg < n:
-                    pc = arg
-                continue
-
-            # Actions (minimal behavior wiring)
-            if op == Opcode.MOVE_FWD:
-                creature._vm_move = max(creature.__dict__.get("_vm_move", 0.0), 1.0)
-                continue
-            if op == Opcode.MOVE_BACK:
-                creature._vm_move = min(creature.__dict__.get("_vm_move", 0.0), -1.0)
-                continue
-            if op == Opcode.ROTATE:
-                delta = (arg or 0) / 180.0 * 3.141592653589793
-                creature._vm_rotate = creature.__dict__.get("_vm_rotate", 0.0) + delta
-                continue
-            if op == Opcode.SPLIT:
-                creature._vm_split = True
-                continue
-            if op == Opcode.ATTACK or op == Opcode.NOOP:
-                continue
-
-        # Apply action intents to creature (simple mapping)
-        if hasattr(creature, "_vm_rotate"):
-            creature.angle += creature._vm_rotate
-            creature.__dict__.pop("_vm_rotate", None)
-        if hasattr(creature, "_vm_move"):
-            # Map -1..1 to speed
-            speed = 30.0 * float(creature._vm_move)
-            from math import cos, sin
-            creature.vx = cos(creature.angle) * speed
-            creature.vy = sin(creature.angle) * speed
-            creature.__dict__.pop("_vm_move", None)
+        food_dist, food_bearing, wall_dist = read_sensors(self.sensors, creature)
+        gas, move, rotate, split = run(
+            program, 0, self.max_gas, [], creature.registers,
+            float(creature.energy), food_dist, food_bearing, wall_dist,
+        )
+        apply_intents(creature, move, rotate, split)
         return gas
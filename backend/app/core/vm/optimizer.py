@@ -0,0 +1,242 @@
+"""
+Genome optimizer - static analysis of a program before it is compiled
+Builds the control-flow graph over basic blocks, then translates every
+reachable block with a symbolic stack: NOOPs vanish, PUSH/POP pairs cancel,
+constant arithmetic is folded and constant branches become jumps. Gas is
+still charged per original block, and a block only runs translated when the
+stack has room for everything it pushes (otherwise the interpreter takes
+over), so a program behaves exactly as it does in the interpreter under any
+gas budget. Loop-free programs whose path does not depend on inputs get
+their gas cost and motion intent precomputed.
+"""
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .instructions import REGISTER_COUNT, STACK_DEPTH, Instruction, Opcode
+
+
+_POP = "(stack.pop() if stack else 0.0)"
+_SENSORS = {Opcode.SEE_WALL: "wall_dist", Opcode.MY_ENERGY: "energy"}
+
+# Symbolic stack entry: a float constant or the name of a Python value
+Value = Union[float, str]
+
+
+class Summary(NamedTuple):
+    """Outcome of a loop-free program with a fixed path"""
+    gas: int
+    move: Optional[float]
+    rotate: float
+    split: bool
+
+
+class Block:
+    """A translated basic block"""
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.end = end
+        self.lines: List[str] = []
+        self.next_pc = str(end)
+        self.successors: List[int] = [end]
+        self.stores = False
+        self.reachable = False
+        # Deepest entry stack for which no push in the block can overflow
+        self.max_entry_depth = STACK_DEPTH
+        # Net stack change and lowest point, relative to entry
+        self.height = 0
+        self.low = 0
+
+    @property
+    def gas(self) -> int:
+        return self.end - self.start
+
+
+def basic_blocks(program: List[Instruction]) -> List[Tuple[int, int]]:
+    """Split a program into (start, end) basic blocks"""
+    n = len(program)
+    leaders = {0}
+    for pc, ins in enumerate(program):
+        if ins.op in (Opcode.JUMP, Opcode.JUMP_IF):
+            if ins.arg is not None and 0 <= ins.arg < n:
+                leaders.add(ins.arg)
+            leaders.add(pc + 1)
+    starts = sorted(pc for pc in leaders if pc < n)
+    return list(zip(starts, starts[1:] + [n]))
+
+
+def _fmt(value: Value) -> str:
+    return repr(value) if isinstance(value, float) else value
+
+
+def _fold(op: Opcode, a: float, b: float) -> float:
+    if op == Opcode.ADD:
+        return a + b
+    if op == Opcode.SUB:
+        return a - b
+    return -1.0 if a < b else (1.0 if a > b else 0.0)
+
+
+def translate_block(program: List[Instruction], start: int, end: int) -> Block:
+    """Python lines for one block, keeping pushed values symbolic until needed"""
+    n = len(program)
+    block = Block(start, end)
+    lines = block.lines
+    pending: List[Value] = []
+    temps = 0
+    # Stack height relative to entry: current, lowest, highest, largest rise
+    height = low = peak = rise = 0
+
+    def bind(expr: str) -> str:
+        nonlocal temps
+        name = f"t{temps}"
+        temps += 1
+        lines.append(f"{name} = {expr}")
+        return name
+
+    def push(value: Value):
+        nonlocal height, peak, rise
+        pending.append(value)
+        height += 1
+        peak = max(peak, height)
+        rise = max(rise, height - low)
+
+    def pop(used: bool = True) -> Optional[Value]:
+        nonlocal height, low
+        height -= 1
+        low = min(low, height)
+        if pending:
+            return pending.pop()
+        if used:
+            return bind(_POP)
+        lines.append("if stack: stack.pop()")
+        return None
+
+    for pc in range(start, end):
+        op, arg = program[pc].op, program[pc].arg
+
+        # Stack values
+        if op == Opcode.SEE_FOOD:
+            push("food_bearing" if arg == 1 else "food_dist")
+        elif op in _SENSORS:
+            push(_SENSORS[op])
+        elif op == Opcode.PUSH:
+            push(float(arg if arg is not None else 0))
+        elif op == Opcode.LOAD:
+            push(bind(f"float(registers[{int(arg or 0) % REGISTER_COUNT}])"))
+        elif op == Opcode.POP:
+            pop(used=False)
+        elif op in (Opcode.ADD, Opcode.SUB, Opcode.CMP):
+            b = pop()
+            a = pop()
+            if isinstance(a, float) and isinstance(b, float):
+                push(_fold(op, a, b))
+            elif op == Opcode.CMP:
+                push(bind(f"-1.0 if {_fmt(a)} < {_fmt(b)} else (1.0 if {_fmt(a)} > {_fmt(b)} else 0.0)"))
+            else:
+                push(bind(f"{_fmt(a)} {'+' if op == Opcode.ADD else '-'} {_fmt(b)}"))
+        elif op == Opcode.STORE:
+            lines.append(f"registers[{int(arg or 0) % REGISTER_COUNT}] = {_fmt(pop())}")
+            block.stores = True
+
+        # Control flow (always the last instruction of a block)
+        elif op == Opcode.JUMP:
+            target = arg if arg is not None and 0 <= arg < n else pc + 1
+            block.next_pc, block.successors = str(target), [target]
+        elif op == Opcode.JUMP_IF:
+            cond = pop()
+            if arg is None or not 0 <= arg < n:
+                continue
+            if isinstance(cond, float) and rise <= STACK_DEPTH:
+                # (a block that can overflow on its own never runs translated,
+                # and a dropped push would make the folded condition wrong)
+                target = arg if cond else pc + 1
+                block.next_pc, block.successors = str(target), [target]
+            else:
+                block.next_pc = f"{arg} if {cond} else {pc + 1}"
+                block.successors = sorted({arg, pc + 1})
+
+        # Actions
+        elif op == Opcode.MOVE_FWD:
+            lines.append("move = 1.0")
+        elif op == Opcode.MOVE_BACK:
+            lines.append("move = -1.0")
+        elif op == Opcode.ROTATE:
+            lines.append(f"rotate += {(arg or 0) / 180.0 * 3.141592653589793!r}")
+        elif op == Opcode.SPLIT:
+            lines.append("split = True")
+        elif op not in (Opcode.ATTACK, Opcode.NOOP):
+            raise ValueError(f"Unknown opcode {op!r}")
+
+    block.max_entry_depth = STACK_DEPTH - peak if rise <= STACK_DEPTH else -1
+    block.height, block.low = height, low
+
+    # Whatever is still pending stays on the stack for the next block
+    if len(pending) == 1:
+        lines.append(f"stack.append({_fmt(pending[0])})")
+    elif pending:
+        lines.append(f"stack.extend(({', '.join(_fmt(v) for v in pending)}))")
+    return block
+
+
+class OptimizedProgram:
+    """Control-flow graph of translated blocks plus a static summary"""
+
+    def __init__(self, program: List[Instruction]):
+        self.program = list(program)
+        n = len(self.program)
+        self.blocks: Dict[int, Block] = {
+            start: translate_block(self.program, start, end)
+            for start, end in basic_blocks(self.program)
+        }
+
+        # Reachability over the folded edges
+        todo = [0] if n else []
+        while todo:
+            block = self.blocks[todo.pop()]
+            if not block.reachable:
+                block.reachable = True
+                todo.extend(pc for pc in block.successors if pc < n)
+
+        self.summary = self._summarize()
+
+    @property
+    def reachable(self) -> List[Block]:
+        """Reachable blocks in program order"""
+        return [block for block in self.blocks.values() if block.reachable]
+
+    def _summarize(self) -> Optional[Summary]:
+        """Gas and intents of a branch-free, loop-free, store-free path
+
+        The path must also stay within the stack: a push dropped on a full
+        stack would invalidate the folded branches along it.
+        """
+        n = len(self.program)
+        gas, move, rotate, split = 0, None, 0.0, False
+        seen = set()
+        pc = depth = 0
+        while pc < n:
+            block = self.blocks[pc]
+            if pc in seen or len(block.successors) > 1 or block.stores:
+                return None
+            if depth > block.max_entry_depth:
+                return None
+            seen.add(pc)
+            # Pops on an empty stack are no-ops
+            depth = block.height + max(depth, -block.low)
+            for ins in self.program[block.start:block.end]:
+                if ins.op == Opcode.MOVE_FWD:
+                    move = 1.0
+                elif ins.op == Opcode.MOVE_BACK:
+                    move = -1.0
+                elif ins.op == Opcode.ROTATE:
+                    rotate += (ins.arg or 0) / 180.0 * 3.141592653589793
+                elif ins.op == Opcode.SPLIT:
+                    split = True
+            gas += block.gas
+            pc = block.successors[0]
+        return Summary(gas, move, rotate, split)
+
+
+def optimize(program: List[Instruction]) -> OptimizedProgram:
+    """Analyze and translate a program"""
+    return OptimizedProgram(program)
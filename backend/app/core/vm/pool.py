@@ -0,0 +1,113 @@
+"""
+Genome pool - process-wide, content-addressed genome storage
+Programs are interned by the bytes of their packed form, so creatures with
+the same program share one copy and refer to it by a small integer ID.
+Pooled programs are never modified in place (copy-on-write: mutation builds
+a new program and interns that). Reference counts let IDs of extinct genomes
+be reused.
+"""
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+from .genome import pack, unpack
+from .instructions import Instruction
+
+
+class GenomePool:
+    """Interned genomes addressed by ID, with reference counting"""
+
+    # ID of the empty program; always present and never counted
+    EMPTY = 0
+
+    def __init__(self):
+        empty = pack([])
+        empty.flags.writeable = False
+        self.packed: List[Optional[np.ndarray]] = [empty]
+        self.programs: List[Optional[List[Instruction]]] = [[]]
+        self.keys: List[Optional[bytes]] = [empty.tobytes()]
+        self.refcounts: List[int] = [0]
+        self._ids: Dict[bytes, int] = {self.keys[0]: self.EMPTY}
+        self.free: List[int] = []
+        self.alive = 0
+        self.interned = 0
+        self.freed = 0
+
+    def __len__(self) -> int:
+        """Number of distinct genomes currently referenced"""
+        return self.alive
+
+    def acquire(self, program: Union[List[Instruction], np.ndarray]) -> int:
+        """Intern a program (instruction list or packed) and take a reference to it"""
+        packed = pack(program)
+        key = packed.tobytes()
+        gid = self._ids.get(key)
+        if gid is None:
+            gid = self._allocate(packed, key)
+        self.retain(gid)
+        return gid
+
+    def _allocate(self, packed: np.ndarray, key: bytes) -> int:
+        packed = packed.copy()
+        packed.flags.writeable = False
+        if self.free:
+            gid = self.free.pop()
+            self.packed[gid] = packed
+            self.programs[gid] = unpack(packed)
+            self.keys[gid] = key
+        else:
+            gid = len(self.programs)
+            self.packed.append(packed)
+            self.programs.append(unpack(packed))
+            self.keys.append(key)
+            self.refcounts.append(0)
+        self._ids[key] = gid
+        self.interned += 1
+        return gid
+
+    def retain(self, gid: int, count: int = 1):
+        """Take `count` more references to an interned genome"""
+        if gid == self.EMPTY or count <= 0:
+            return
+        if self.refcounts[gid] == 0:
+            self.alive += 1
+        self.refcounts[gid] += count
+
+    def release(self, gid: int):
+        """Drop a reference; the genome is freed when none are left"""
+        if gid == self.EMPTY:
+            return
+        self.refcounts[gid] -= 1
+        if self.refcounts[gid] == 0:
+            self.alive -= 1
+            del self._ids[self.keys[gid]]
+            self.packed[gid] = None
+            self.programs[gid] = None
+            self.keys[gid] = None
+            self.free.append(gid)
+            self.freed += 1
+
+    def program(self, gid: int) -> List[Instruction]:
+        """Shared program of a genome (do not modify in place)"""
+        return self.programs[gid]
+
+    def get_packed(self, gid: int) -> np.ndarray:
+        """Packed (read-only) form of a genome"""
+        return self.packed[gid]
+
+    def key(self, gid: int) -> bytes:
+        """Content key (packed bytes) of a genome"""
+        return self.keys[gid]
+
+    def stats(self) -> dict:
+        """Pool counters"""
+        return {
+            'alive': self.alive,
+            'references': sum(self.refcounts),
+            'interned': self.interned,
+            'freed': self.freed,
+        }
+
+
+# Shared by every creature in the process
+genome_pool = GenomePool()
@@ -0,0 +1,128 @@
+"""
+VM profiler - sampled opcode counts, gas usage and single-creature traces
+A sampled fraction of each tick's genome runs goes through the interpreter
+with a per-instruction hook instead of the compiled/batched path (all paths
+behave identically), so the cost scales with the sample rate and is nil
+when sampling is off.
+"""
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .interpreter import apply_intents, read_sensors, run
+from .pool import GenomePool
+
+
+class VMProfiler:
+    """Collects VM execution statistics from sampled genome runs"""
+
+    def __init__(self, sample_rate: float = 0.0, max_gas: int = 50, top: int = 10, seed: Optional[int] = None):
+        self.sample_rate = sample_rate
+        self.max_gas = max_gas
+        self.top = top
+        self._rng = np.random.default_rng(seed)
+        # Entity id (and uid) whose next run is traced, and the last finished trace
+        self.trace_target: Optional[str] = None
+        self.trace_uid = -1
+        self._traced = None
+        self.last_trace: Optional[dict] = None
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.trace_uid >= 0
+
+    def reset(self):
+        """Forget everything collected so far"""
+        self.runs = 0
+        self.exhausted = 0
+        self.op_counts: Counter = Counter()
+        self.gas_histogram = np.zeros(self.max_gas + 1, dtype=np.int64)
+        # Keyed by genome content, so freed and reused pool IDs do not mix
+        self.genome_cost: Counter = Counter()
+        self.genome_runs: Counter = Counter()
+        self.genome_programs: Dict[bytes, list] = {}
+
+    def request_trace(self, store, entity_id: str) -> bool:
+        """Trace the given creature's next genome run (False if it has none)"""
+        row = store.find(entity_id)
+        if row < 0 or store.genome_id[row] == GenomePool.EMPTY:
+            return False
+        self.trace_target = entity_id
+        self.trace_uid = int(store.uid[row])
+        return True
+
+    def sample(self, store, rows: np.ndarray) -> np.ndarray:
+        """Rows to run through the profiler this tick (a traced creature runs even if unscheduled)"""
+        rows = rows[store.genome_id[rows] != GenomePool.EMPTY]
+        picked = rows[self._rng.random(rows.size) < self.sample_rate]
+        if self.trace_uid >= 0:
+            found = np.flatnonzero(store.uid[:store.size] == self.trace_uid)
+            if found.size and store.genome_id[found[0]] != GenomePool.EMPTY:
+                picked = np.union1d(picked, found)
+                self._traced = store.views[int(found[0])]
+            else:
+                # The creature died before its next run
+                self._end_trace()
+        return picked
+
+    def _end_trace(self):
+        self.trace_target = None
+        self.trace_uid = -1
+        self._traced = None
+
+    def run(self, creature, sensors=None, tick: int = 0) -> int:
+        """Execute one creature's genome with instrumentation; returns remaining gas"""
+        program = creature.genome
+        counts = self.op_counts
+        steps: Optional[List[dict]] = [] if creature is self._traced else None
+
+        def hook(pc, ins, stack):
+            counts[ins.op.name] += 1
+            if steps is not None:
+                steps.append({'pc': pc, 'op': ins.op.name, 'arg': ins.arg, 'stack': list(stack)})
+
+        food_dist, food_bearing, wall_dist = read_sensors(sensors, creature)
+        gas, move, rotate, split = run(
+            program, 0, self.max_gas, [], creature.registers,
+            float(creature.energy), food_dist, food_bearing, wall_dist, hook=hook,
+        )
+        apply_intents(creature, move, rotate, split)
+
+        used = self.max_gas - gas
+        self.runs += 1
+        self.gas_histogram[used] += 1
+        if gas == 0:
+            self.exhausted += 1
+        key = creature.genome_key
+        self.genome_cost[key] += used
+        self.genome_runs[key] += 1
+        self.genome_programs.setdefault(key, program)
+
+        if steps is not None:
+            self.last_trace = {'entity_id': creature.id, 'tick': tick, 'gas_used': used, 'steps': steps}
+            self._end_trace()
+        return gas
+
+    def report(self) -> Dict:
+        """Collected statistics (top genomes by sampled cumulative gas)"""
+        top = []
+        for key, cost in self.genome_cost.most_common(self.top):
+            top.append({
+                'cost': cost,
+                'runs': self.genome_runs[key],
+                'program': [
+                    ins.op.name if ins.arg is None else f"{ins.op.name} {ins.arg}"
+                    for ins in self.genome_programs[key]
+                ],
+            })
+        return {
+            'sample_rate': self.sample_rate,
+            'runs': self.runs,
+            'exhausted': self.exhausted,
+            'op_counts': dict(self.op_counts.most_common()),
+            'gas_histogram': self.gas_histogram.tolist(),
+            'top_genomes': top,
+            'trace': self.last_trace,
+        }
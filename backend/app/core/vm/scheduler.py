@@ -0,0 +1,62 @@
+"""
+VM scheduler - spreads genome execution across ticks under a budget
+Each tick the creatures that have waited longest are picked until their
+estimated instruction cost fills the per-tick budget (round-robin by
+staleness). Creatures left out keep their last motion intent, since their
+velocity columns are simply not rewritten.
+"""
+import numpy as np
+
+from .compiler import genome_compiler
+from .pool import GenomePool, genome_pool
+
+
+class VMScheduler:
+    """Chooses which creatures think this tick"""
+
+    def __init__(self, budget: int = 0, max_gas: int = 50):
+        # Instructions per tick across all creatures (0 = unlimited)
+        self.budget = budget
+        self.max_gas = max_gas
+        self.scheduled = 0
+        self.avg_staleness = 0.0
+        self.max_staleness = 0
+
+    def cost(self, gid: int) -> int:
+        """Estimated instructions one run of a genome takes"""
+        if gid == GenomePool.EMPTY:
+            return 0
+        summary = genome_compiler.summary(genome_pool.program(gid), genome_pool.key(gid))
+        if summary is not None:
+            return min(summary.gas, self.max_gas)
+        return self.max_gas
+
+    def select(self, store) -> np.ndarray:
+        """Rows to run this tick (ascending); updates staleness bookkeeping"""
+        n = store.size
+        idle = store.vm_idle[:n]
+        if self.budget <= 0:
+            rows = np.arange(n)
+        else:
+            # Longest-waiting first; ties keep row order
+            order = np.argsort(-idle, kind='stable')
+            gids, inverse = np.unique(store.genome_id[order], return_inverse=True)
+            costs = np.array([self.cost(gid) for gid in gids.tolist()], dtype=np.int64)[inverse]
+            take = max(1, int(np.searchsorted(np.cumsum(costs), self.budget, side='right')))
+            rows = np.sort(order[:take])
+
+        idle += 1
+        idle[rows] = 0
+        self.scheduled = int(rows.size)
+        self.avg_staleness = float(idle.mean()) if n else 0.0
+        self.max_staleness = int(idle.max()) if n else 0
+        return rows
+
+    def stats(self) -> dict:
+        """Counters for the last tick"""
+        return {
+            'budget': self.budget,
+            'scheduled': self.scheduled,
+            'avg_staleness': self.avg_staleness,
+            'max_staleness': self.max_staleness,
+        }
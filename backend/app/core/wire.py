@@ -0,0 +1,356 @@
+"""
+Wire format - versioned binary encoding of the world state
+A frame is a fixed header, the color palette, then one contiguous
+little-endian column per field: uint32 IDs, float32 positions, angles and
+energy, uint8 palette indices. Every section starts on a 4-byte boundary so
+the browser can view it as a typed array without copying.
+
+Keyframes carry every object in the frame (the whole world, or a viewport's
+share of it). Delta frames carry what changed since the last keyframe (not
+since the previous frame), so a client that misses deltas only needs that
+keyframe to apply the next one: keyframe rows that are gone or changed are
+bitmasks, changed creatures send quantized position, angle and energy, and
+creatures or foods added since the keyframe are sent in full. Tile frames
+carry per-tile object counts instead of objects. The header always counts
+the whole world.
+"""
+import struct
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .entity_store import PALETTE
+
+
+MAGIC = b'VZST'
+VERSION = 3
+
+# magic, version, flags, tick, generation, world width/height, world entity
+# count, world food count, ticks/sec, speed multiplier, run mode, frame kind,
+# palette size, frame sequence number, sequence number of its keyframe
+HEADER = struct.Struct('<4sHHQIIIIIffBBHII')
+# Keyframe counts: entities and foods in the frame
+KEYFRAME_HEADER = struct.Struct('<II')
+# Delta counts: keyframe entities and foods, changed, added entities and foods
+DELTA_HEADER = struct.Struct('<IIIII')
+# Tiles: origin x/y, tile size, columns, rows
+TILE_HEADER = struct.Struct('<fffII')
+
+FLAG_PAUSED = 1
+RUN_MODES = ('realtime', 'turbo')
+FRAME_KINDS = ('keyframe', 'delta', 'tiles')
+KEYFRAME, DELTA, TILES = range(3)
+
+# Column name -> little-endian dtype, in frame order
+ENTITY_FIELDS: List[Tuple[str, str]] = [
+    ('id', '<u4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('angle', '<f4'),
+    ('radius', '<f4'),
+    ('energy', '<f4'),
+    ('max_energy', '<f4'),
+    ('color', 'u1'),
+]
+FOOD_FIELDS: List[Tuple[str, str]] = [
+    ('id', '<u4'),
+    ('x', '<f4'),
+    ('y', '<f4'),
+    ('radius', '<f4'),
+    ('color', 'u1'),
+]
+# Quantized fields sent for changed creatures
+CHANGED_FIELDS: List[Tuple[str, str]] = [
+    ('x', '<u2'),
+    ('y', '<u2'),
+    ('energy', '<u2'),
+    ('angle', 'u1'),
+]
+
+# Energy resolution in delta frames (1/64 of a unit)
+ENERGY_SCALE = 64.0
+TWO_PI = 2 * np.pi
+
+
+def _padded(data: bytes) -> bytes:
+    return data + b'\0' * (-len(data) % 4)
+
+
+def entity_columns(store, rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Entity columns as sent on the wire (IDs are the store's uids; default all rows)"""
+    if rows is None:
+        rows = slice(0, store.size)
+    columns = {'id': store.uid[rows].astype('<u4')}
+    for name, dtype in ENTITY_FIELDS[1:]:
+        columns[name] = getattr(store, name)[rows].astype(dtype)
+    return columns
+
+
+def food_columns(foods, slots: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Food columns as sent on the wire (IDs are pool slots; default all active)"""
+    if slots is None:
+        slots = foods.active_slots()
+    columns = {'id': slots.astype('<u4')}
+    for name, dtype in FOOD_FIELDS[1:]:
+        columns[name] = getattr(foods, name)[slots].astype(dtype)
+    return columns
+
+
+def quantize(columns: Dict[str, np.ndarray], width: float, height: float) -> Dict[str, np.ndarray]:
+    """Changed-creature fields at wire precision"""
+    return {
+        'x': np.clip(np.rint(columns['x'] / width * 65535), 0, 65535).astype('<u2'),
+        'y': np.clip(np.rint(columns['y'] / height * 65535), 0, 65535).astype('<u2'),
+        'energy': np.clip(np.rint(columns['energy'] * ENERGY_SCALE), 0, 65535).astype('<u2'),
+        'angle': (np.rint(np.mod(columns['angle'], TWO_PI) / TWO_PI * 256).astype(np.int64) % 256).astype('u1'),
+    }
+
+
+def dequantize(values: Dict[str, np.ndarray], width: float, height: float) -> Dict[str, np.ndarray]:
+    """Inverse of quantize (float32, like keyframe columns)"""
+    return {
+        'x': (values['x'] / 65535 * width).astype('<f4'),
+        'y': (values['y'] / 65535 * height).astype('<f4'),
+        'energy': (values['energy'] / ENERGY_SCALE).astype('<f4'),
+        'angle': (values['angle'] / 256 * TWO_PI).astype('<f4'),
+    }
+
+
+def _header(world, run: Optional[dict], kind: int, sequence: int, keyframe: int) -> List[bytes]:
+    run = run or {}
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        FLAG_PAUSED if world.paused else 0,
+        world.tick,
+        world.generation,
+        world.width,
+        world.height,
+        world.store.size,
+        len(world.foods),
+        run.get('ticks_per_second', 0.0),
+        run.get('multiplier', 0.0),
+        RUN_MODES.index(run.get('mode', 'realtime')),
+        kind,
+        len(PALETTE),
+        sequence,
+        keyframe,
+    )
+    return [header, _padded(bytes(c for color in PALETTE for c in color))]
+
+
+def _columns(columns: Dict[str, np.ndarray], fields) -> List[bytes]:
+    return [_padded(columns[name].tobytes()) for name, _ in fields]
+
+
+def _bits(mask: np.ndarray) -> bytes:
+    return _padded(np.packbits(mask, bitorder='little').tobytes())
+
+
+def encode_state(world, run: Optional[dict] = None, sequence: int = 0) -> bytes:
+    """Keyframe of the world's current state"""
+    return _encode_keyframe(world, run, sequence, entity_columns(world.store), food_columns(world.foods))
+
+
+def _encode_keyframe(world, run, sequence, entities, foods) -> bytes:
+    parts = _header(world, run, KEYFRAME, sequence, sequence)
+    parts.append(KEYFRAME_HEADER.pack(len(entities['id']), len(foods['id'])))
+    parts += _columns(entities, ENTITY_FIELDS)
+    parts += _columns(foods, FOOD_FIELDS)
+    return b''.join(parts)
+
+
+def encode_tiles(world, run: Optional[dict], sequence: int, origin: Tuple[float, float],
+                 tile_size: float, entities: np.ndarray, foods: np.ndarray) -> bytes:
+    """Tile frame: (columns, rows) object counts, column-major like the spatial grid"""
+    cols, rows = entities.shape
+    parts = _header(world, run, TILES, sequence, sequence)
+    parts.append(TILE_HEADER.pack(origin[0], origin[1], tile_size, cols, rows))
+    for counts in (entities, foods):
+        parts.append(_padded(np.minimum(counts, 65535).astype('<u2').tobytes()))
+    return b''.join(parts)
+
+
+class DeltaEncoder:
+    """Keyframes every `keyframe_interval` ticks, deltas against the last keyframe in between"""
+
+    def __init__(self, keyframe_interval: int = 120):
+        self.keyframe_interval = keyframe_interval
+        self.sequence = 0
+        # Latest keyframe and what clients hold after applying it
+        self.keyframe = b''
+        self._key: Optional[dict] = None
+
+    def reset(self):
+        """Make the next frame a keyframe"""
+        self._key = None
+
+    def encode(self, world, run: Optional[dict] = None, sequence: Optional[int] = None,
+               entities: Optional[Dict[str, np.ndarray]] = None,
+               foods: Optional[Dict[str, np.ndarray]] = None) -> Tuple[bytes, bytes]:
+        """(frame to send, keyframe it is based on) for the current state
+        
+        `entities` and `foods` are the columns to send (default: the whole
+        world); `sequence` lets several encoders number frames alike.
+        """
+        self.sequence = self.sequence + 1 if sequence is None else sequence
+        if entities is None:
+            entities = entity_columns(world.store)
+        if foods is None:
+            foods = food_columns(world.foods)
+        key = self._key
+        if key is None or not 0 <= world.tick - key['tick'] < self.keyframe_interval:
+            self.keyframe = _encode_keyframe(world, run, self.sequence, entities, foods)
+            self._key = {
+                'tick': world.tick,
+                'sequence': self.sequence,
+                'ids': entities['id'],
+                'order': np.argsort(entities['id'], kind='stable'),
+                'values': quantize(entities, world.width, world.height),
+                'food_slots': foods['id'].astype(np.int64),
+                'food_names': [world.foods.ids[slot] for slot in foods['id'].tolist()],
+            }
+            return self.keyframe, self.keyframe
+        return self._encode_delta(world, run, entities, foods), self.keyframe
+
+    def _encode_delta(self, world, run, entities, foods) -> bytes:
+        key = self._key
+
+        # Creatures: find each current uid's keyframe row
+        order = key['order']
+        ids = entities['id']
+        if order.size:
+            sorted_ids = key['ids'][order]
+            pos = np.minimum(np.searchsorted(sorted_ids, ids), order.size - 1)
+            found = sorted_ids[pos] == ids
+            key_rows = order[pos[found]]
+        else:
+            found = np.zeros(ids.size, dtype=bool)
+            key_rows = np.zeros(0, dtype=np.int64)
+        rank = np.argsort(key_rows)
+        key_rows = key_rows[rank]
+        rows = np.flatnonzero(found)[rank]
+
+        removed = np.ones(order.size, dtype=bool)
+        removed[key_rows] = False
+        current = quantize({name: entities[name][rows] for name, _ in CHANGED_FIELDS},
+                           world.width, world.height)
+        differs = np.zeros(rows.size, dtype=bool)
+        for name, _ in CHANGED_FIELDS:
+            differs |= current[name] != key['values'][name][key_rows]
+        changed = np.zeros(order.size, dtype=bool)
+        changed[key_rows[differs]] = True
+        values = {name: current[name][differs] for name, _ in CHANGED_FIELDS}
+        added = {name: column[~found] for name, column in entities.items()}
+
+        # Foods: a keyframe pellet is gone once it is not sent or its slot
+        # holds something else
+        names = world.foods.ids
+        kept = np.isin(key['food_slots'], foods['id']) & np.array([
+            slot < len(names) and names[slot] == name
+            for slot, name in zip(key['food_slots'].tolist(), key['food_names'])
+        ], dtype=bool)
+        new_foods = ~np.isin(foods['id'], key['food_slots'][kept])
+        added_foods = {name: column[new_foods] for name, column in foods.items()}
+
+        parts = _header(world, run, DELTA, self.sequence, key['sequence'])
+        parts.append(DELTA_HEADER.pack(order.size, kept.size, int(differs.sum()),
+                                       int((~found).sum()), int(new_foods.sum())))
+        parts += [_bits(removed), _bits(changed)]
+        parts += _columns(values, CHANGED_FIELDS)
+        parts += _columns(added, ENTITY_FIELDS)
+        parts.append(_bits(~kept))
+        parts += _columns(added_foods, FOOD_FIELDS)
+        return b''.join(parts)
+
+
+def decode_state(data: bytes) -> dict:
+    """Inverse of encode_state / DeltaEncoder / encode_tiles (columns come back as NumPy arrays)"""
+    (magic, version, flags, tick, generation, width, height, n_entities, n_foods,
+     tps, multiplier, mode, kind, n_colors, sequence, keyframe) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a world state frame")
+    if version != VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+
+    offset = HEADER.size
+    palette = np.frombuffer(data, 'u1', n_colors * 3, offset).reshape(-1, 3)
+    offset += n_colors * 3 + (-n_colors * 3 % 4)
+
+    def read(dtype, count):
+        nonlocal offset
+        column = np.frombuffer(data, dtype, count, offset)
+        offset += column.nbytes + (-column.nbytes % 4)
+        return column
+
+    def columns(fields, count):
+        return {name: read(dtype, count) for name, dtype in fields}
+
+    def bits(count):
+        return np.unpackbits(read('u1', (count + 7) // 8), count=count, bitorder='little').astype(bool)
+
+    state = {
+        'version': version,
+        'kind': FRAME_KINDS[kind],
+        'sequence': sequence,
+        'keyframe': keyframe,
+        'tick': tick,
+        'generation': generation,
+        'paused': bool(flags & FLAG_PAUSED),
+        'world_width': width,
+        'world_height': height,
+        'population': n_entities,
+        'food_count': n_foods,
+        'run': {'mode': RUN_MODES[mode], 'multiplier': multiplier, 'ticks_per_second': tps},
+        'palette': [tuple(c) for c in palette.tolist()],
+    }
+    if kind == KEYFRAME:
+        frame_entities, frame_foods = KEYFRAME_HEADER.unpack_from(data, offset)
+        offset += KEYFRAME_HEADER.size
+        state['entities'] = columns(ENTITY_FIELDS, frame_entities)
+        state['foods'] = columns(FOOD_FIELDS, frame_foods)
+        return state
+    if kind == TILES:
+        x, y, size, cols, rows = TILE_HEADER.unpack_from(data, offset)
+        offset += TILE_HEADER.size
+        state['tiles'] = {
+            'origin': (x, y),
+            'size': size,
+            'entities': read('<u2', cols * rows).reshape(cols, rows),
+            'foods': read('<u2', cols * rows).reshape(cols, rows),
+        }
+        return state
+
+    key_entities, key_foods, n_changed, n_added, n_added_foods = DELTA_HEADER.unpack_from(data, offset)
+    offset += DELTA_HEADER.size
+    state['removed'] = bits(key_entities)
+    state['changed'] = bits(key_entities)
+    state['values'] = columns(CHANGED_FIELDS, n_changed)
+    state['added'] = columns(ENTITY_FIELDS, n_added)
+    state['foods_removed'] = bits(key_foods)
+    state['foods_added'] = columns(FOOD_FIELDS, n_added_foods)
+    return state
+
+
+def apply_delta(keyframe: dict, delta: dict) -> dict:
+    """World state a client reconstructs from a decoded keyframe and delta"""
+    if delta['keyframe'] != keyframe['sequence']:
+        raise ValueError("Delta is based on a different keyframe")
+    state = {k: v for k, v in delta.items()
+             if k not in ('removed', 'changed', 'values', 'added', 'foods_removed', 'foods_added')}
+
+    entities = {name: column.copy() for name, column in keyframe['entities'].items()}
+    values = dequantize(delta['values'], delta['world_width'], delta['world_height'])
+    for name, column in values.items():
+        entities[name][delta['changed']] = column
+    keep = ~delta['removed']
+    state['entities'] = {
+        name: np.concatenate([column[keep], delta['added'][name]])
+        for name, column in entities.items()
+    }
+    keep = ~delta['foods_removed']
+    state['foods'] = {
+        name: np.concatenate([column[keep], delta['foods_added'][name]])
+        for name, column in keyframe['foods'].items()
+    }
+    return state
@@ -5,10 +5,23 @@ Manages the entire simulation state and update loop
 import random
 import time
 from typing import List, Dict
+
+import numpy as np
+
 from .entity import Entity
-from .food_spawner import FoodSpawner, Food
+from .entity_store import EntityStore
+from .food_pool import FoodPool
+from .food_spawner import FoodSpawner
 from .physics import PhysicsEngine
+from .sensors import SensorBuffer
+from .vm.batch import BatchVM
+from .vm.compiler import genome_compiler
+from .vm.pool import genome_pool
+from .vm.profiler import VMProfiler
+from .vm.scheduler import VMScheduler
 from ..config import settings
+from ..evolution.mutation import mutate_batch
+from ..persistence import lineage as events
 
 
 class World:
@@ -19,15 +32,33 @@ class World:
         self.height = settings.world_height
         
         # Simulation state
-        self.entities: List[Entity] = []
-        self.foods: List[Food] = []
+        self.store = EntityStore(capacity=settings.initial_population)
+        self.foods = FoodPool()
         self.generation = 0
         self.tick = 0
         self.paused = False
         self.step_mode = False  # For single-step debugging
         
         # Systems
-        self.physics = PhysicsEngine(self.width, self.height)
+        self.physics = PhysicsEngine(
+            self.width,
+            self.height,
+            incremental_grid=settings.incremental_spatial_grid,
+            collision_iterations=settings.collision_iterations
+        )
+        self.sensors = SensorBuffer(sensor_range=settings.sensor_range)
+        self.batch_vm = BatchVM(
+            max_gas=settings.max_gas_per_tick,
+            min_group=settings.vm_batch_min_group
+        )
+        self.vm_scheduler = VMScheduler(
+            budget=settings.vm_tick_budget,
+            max_gas=settings.max_gas_per_tick
+        )
+        self.vm_profiler = VMProfiler(
+            sample_rate=settings.vm_profile_sample_rate,
+            max_gas=settings.max_gas_per_tick
+        )
         self.food_spawner = FoodSpawner(
             world_width=self.width,
             world_height=self.height,
@@ -36,6 +67,9 @@ class World:
             food_energy=settings.food_energy
         )
         
+        # Lineage event log (attached by the app; None records nothing)
+        self.lineage = None
+        
         # Performance tracking
         self.last_update_time = time.time()
         self.dt = 1.0 / settings.target_fps
@@ -52,10 +86,10 @@ class World:
                 energy=random.uniform(40, 60),
                 color=self._get_random_color()
             )
-            self.entities.append(entity)
+            self.store.append(entity)
         
         # Spawn some initial food
-        self.foods = self.food_spawner.spawn_food()
+        self.foods.extend(self.food_spawner.spawn_food())
     
     def _get_random_color(self) -> tuple:
         """Generate random creature color"""
@@ -68,6 +102,11 @@ class World:
         ]
         return random.choice(colors)
     
+    @property
+    def entities(self) -> List[Entity]:
+        """Per-object views of all living entities (row order)"""
+        return self.store.entities()
+    
     def update(self):
         """Main simulation update loop"""
         if self.paused and not self.step_mode:
@@ -78,86 +117,133 @@ class World:
             self.step_mode = False
             self.paused = True
         
-        # Update entities
-        alive_entities = []
-        new_entities = []
+        store = self.store
+        lineage = self.lineage
         
-        for entity in self.entities:
-            # Phase 1/2: Choose behavior by feature flag
-            if settings.enable_vm:
-                entity.execute_genome()
-            else:
-                entity.simple_behavior()
-            
-            # Update physics
-            entity.update_physics(self.dt, self.width, self.height)
-            
-            # Update energy (photosynthesis and existence tax)
-            entity.update_energy(
-                self.dt,
-                settings.photosynthesis_rate,
-                settings.existence_tax
+        # Sensor stage: one batched pass before any genome runs
+        if settings.enable_vm:
+            self.physics.index_foods(self.foods)
+            self.sensors.update(
+                store,
+                self.foods,
+                self.physics.spatial_grid['foods'],
+                self.width,
+                self.height
             )
-            
-            # Check reproduction
-            if entity.can_reproduce(settings.reproduction_energy):
-                child = entity.reproduce()
-                new_entities.append(child)
-            
-            # Check if alive
-            if entity.is_alive():
-                alive_entities.append(entity)
+        
+        # Update entities
+        if settings.enable_vm:
+            # Only scheduled creatures think; the rest keep their last intent
+            sensors = self.sensors
+            rows = self.vm_scheduler.select(store)
+            if self.vm_profiler.enabled:
+                # Sampled creatures run instrumented instead
+                sampled = self.vm_profiler.sample(store, rows)
+                for row in sampled.tolist():
+                    self.vm_profiler.run(store.views[row], sensors, self.tick)
+                rows = np.setdiff1d(rows, sampled, assume_unique=True)
+            if settings.vm_batch:
+                # Genome groups run in lockstep; stragglers run one by one
+                self.batch_vm.run(store, sensors, fallback=lambda e: e.execute_genome(sensors), rows=rows)
             else:
-                # Entity died - create food from corpse
-                corpse_food = Food(
-                    id=f"corpse_{entity.id[:8]}",
-                    x=entity.x,
-                    y=entity.y,
-                    energy=10.0,  # Corpse provides some energy
-                    color=(150, 75, 0)  # Brown for corpses
-                )
-                self.foods.append(corpse_food)
+                for row in rows.tolist():
+                    store.views[row].execute_genome(sensors)
+        else:
+            # Phase 1: hardcoded behavior
+            for entity in store.entities():
+                entity.simple_behavior()
+        
+        # Update physics and energy (photosynthesis and existence tax)
+        self.physics.integrate(
+            store,
+            self.dt,
+            settings.photosynthesis_rate,
+            settings.existence_tax
+        )
+        
+        n = store.size
+        
+        # Check reproduction (all offspring genomes are mutated in one batch)
+        parents = np.flatnonzero(store.energy[:n] >= settings.reproduction_energy)
+        parent_uids = store.uid[parents]
+        genomes = mutate_batch(
+            [genome_pool.get_packed(gid) for gid in store.genome_id[parents].tolist()],
+            settings.mutation_rate
+        )
+        new_entities = [
+            store.views[row].reproduce(genome)
+            for row, genome in zip(parents.tolist(), genomes)
+        ]
+        
+        # Dead entities become food (corpses)
+        dead = np.flatnonzero(store.energy[:n] <= 0)
+        if dead.size:
+            if lineage is not None:
+                lineage.record(events.DEATH, self.tick, store.uid[dead], events.STARVED)
+            self.foods.extend(self.food_spawner.spawn_corpses(store, dead))
+            store.remove_many(dead)
         
         # Add new offspring
-        alive_entities.extend(new_entities)
+        for child in new_entities:
+            store.append(child)
+        if lineage is not None and new_entities:
+            born = slice(store.size - len(new_entities), store.size)
+            lineage.record(
+                events.BIRTH, self.tick, store.uid[born], parent_uids,
+                store.generation[born], store.energy[born]
+            )
         
         # Apply population cap
-        if len(alive_entities) > settings.max_population:
+        if store.size > settings.max_population:
             # Kill random entities if over capacity (environmental pressure)
-            alive_entities = random.sample(alive_entities, settings.max_population)
-        
-        self.entities = alive_entities
+            excess = store.size - settings.max_population
+            culled = random.sample(range(store.size), excess)
+            if lineage is not None:
+                lineage.record(events.DEATH, self.tick, store.uid[culled], events.CULLED)
+            store.remove_many(culled)
         
         # Update physics (collision detection, food consumption)
-        self.entities, self.foods = self.physics.update(self.entities, self.foods, self.dt)
+        self.physics.update(store, self.foods, self.dt)
+        if lineage is not None:
+            eaters, eaten = self.physics.meals
+            if eaters.size:
+                lineage.record(events.EAT, self.tick, eaters, value=eaten)
+            lineage.maybe_flush()
         
         # Spawn new food
-        self.foods = self.food_spawner.update(self.dt, self.foods)
+        self.food_spawner.update(self.dt, self.foods)
         
         # Update counters
         self.tick += 1
-        if len(self.entities) > 0:
-            max_gen = max(e.generation for e in self.entities)
+        if store.size > 0:
+            max_gen = int(store.generation[:store.size].max())
             if max_gen > self.generation:
                 self.generation = max_gen
     
-    def get_state(self) -> Dict:
-        """Get current world state for transmission to clients"""
-        return {
+    def get_state(self, include_objects: bool = True) -> Dict:
+        """Get current world state for transmission to clients
+        
+        Without `include_objects` only the counters are returned (binary
+        clients get entities and foods from the wire frame instead).
+        """
+        state = {
             'tick': self.tick,
             'generation': self.generation,
-            'population': len(self.entities),
+            'population': self.store.size,
             'food_count': len(self.foods),
             'paused': self.paused,
-            'entities': [e.to_dict() for e in self.entities],
-            'foods': [f.to_dict() for f in self.foods],
             'world_width': self.width,
             'world_height': self.height,
         }
+        if include_objects:
+            state['entities'] = [e.to_dict() for e in self.store.views]
+            state['foods'] = self.foods.to_dicts()
+        return state
     
     def get_statistics(self) -> Dict:
         """Get simulation statistics"""
-        if not self.entities:
+        n = self.store.size
+        if n == 0:
             return {
                 'population': 0,
                 'avg_energy': 0,
@@ -166,11 +252,15 @@ class World:
             }
         
         return {
-            'population': len(self.entities),
-            'avg_energy': sum(e.energy for e in self.entities) / len(self.entities),
-            'avg_age': sum(e.age for e in self.entities) / len(self.entities),
+            'population': n,
+            'avg_energy': float(self.store.energy[:n].mean()),
+            'avg_age': float(self.store.age[:n].mean()),
             'generation': self.generation,
-            'food_count': len(self.foods)
+            'food_count': len(self.foods),
+            'spatial_grid': self.physics.spatial_grid.stats(),
+            'vm_cache': genome_compiler.stats(),
+            'genomes': genome_pool.stats(),
+            'vm_scheduler': self.vm_scheduler.stats()
         }
     
     def pause(self):
@@ -189,8 +279,14 @@ class World:
     
     def reset(self):
         """Reset world to initial state"""
-        self.entities.clear()
+        if self.lineage is not None:
+            self.lineage.record(events.DEATH, self.tick, self.store.uid[:self.store.size], events.RESET)
+        self.store.clear()
         self.foods.clear()
+        self.physics.spatial_grid.clear()
         self.tick = 0
         self.generation = 0
         self._spawn_initial_population()
+        if self.lineage is not None:
+            n = self.store.size
+            self.lineage.record(events.BIRTH, self.tick, self.store.uid[:n], -1, 0, self.store.energy[:n])
@@ -2,47 +2,106 @@
 FastAPI main application entry point
 VIVARIUM ZERO - Artificial Life Simulation System
 """
-from fastapi import FastAPI, WebSocket
+from fastapi import FastAPI, HTTPException, WebSocket
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
 import asyncio
 from contextlib import asynccontextmanager
+import os
+import re
+from typing import Optional
 
+from .core.runner import SimulationRunner
 from .core.world import World
-from .api.websocket import websocket_endpoint, broadcast_world_state
+from .api.websocket import manager, websocket_endpoint, broadcast_world_state, run_command
+from .persistence.lineage import LineageLog
+from .persistence.checkpoint import EXTENSION, list_checkpoints, load_checkpoint, write_checkpoint
+from .persistence.snapshots import SnapshotStore, SnapshotWriter, capture, restore
 from .config import settings
 
 
-# Global world instance
+# Global world instance, ticked on the simulation thread
 world = World()
+# Publishes at the render rate to reduce bandwidth, however fast it ticks
+runner = SimulationRunner(
+    world,
+    tick_rate=settings.target_fps,
+    render_rate=settings.render_fps,
+    multiplier=settings.turbo_multiplier,
+    keyframe_interval=settings.keyframe_interval,
+    view_margin=settings.viewport_margin,
+    tile_zoom=settings.viewport_tile_zoom
+)
 
-# Background task for simulation loop
+# Periodic snapshots, written to SQLite off the simulation thread
+snapshots = SnapshotWriter(SnapshotStore(settings.database_path, settings.snapshot_retention))
+
+# Birth/death/eat events and the ancestry index built from them
+lineage = LineageLog(
+    settings.lineage_path,
+    chunk_size=settings.lineage_chunk_size,
+    flush_interval=settings.lineage_flush_interval
+)
+
+# Background tasks for broadcasting and snapshots
 simulation_task = None
+snapshot_task = None
 
 
 async def simulation_loop():
-    """Main simulation loop running in background"""
+    """Broadcast newly published frames to all connected clients"""
+    last = None
     while True:
         try:
-            # Update world
-            world.update()
-            
-            # Broadcast state to all connected clients (every 2 frames to reduce bandwidth)
-            if world.tick % 2 == 0:
-                await broadcast_world_state(world)
+            frame = runner.frames.read()
+            if frame is not last:
+                last = frame
+                await broadcast_world_state(frame)
             
-            # Sleep to maintain target FPS
-            await asyncio.sleep(1.0 / settings.target_fps)
+            await asyncio.sleep(1.0 / settings.render_fps)
         
         except Exception as e:
-            print(f"Simulation error: {e}")
+            print(f"Broadcast error: {e}")
             await asyncio.sleep(1.0)
 
 
+def reset_to_checkpoint(path: str) -> dict:
+    """Load a checkpoint as the live world (simulation thread); clients get a keyframe"""
+    checkpoint = load_checkpoint(world, path)
+    resync_lineage()
+    runner.encoder.reset()
+    for view in runner.views.values():
+        view.encoder.reset()
+    return checkpoint.summary()
+
+
+def resync_lineage():
+    """Tell the lineage log which creatures the (replaced) world now holds"""
+    n = world.store.size
+    lineage.resync(world.tick, world.store.uid[:n], world.store.generation[:n])
+
+
+def checkpoint_path(name: str) -> str:
+    """Path of a named checkpoint (names are plain file names)"""
+    if not re.fullmatch(r'[A-Za-z0-9_.-]+', name) or name.startswith('.'):
+        raise HTTPException(status_code=400, detail="Invalid checkpoint name")
+    return os.path.join(settings.checkpoint_dir, name + EXTENSION)
+
+
+async def snapshot_loop():
+    """Capture a snapshot every `snapshot_interval` seconds, at a tick boundary"""
+    while True:
+        await asyncio.sleep(settings.snapshot_interval)
+        try:
+            await run_command(runner, snapshots.capture, world)
+        except Exception as e:
+            print(f"Snapshot error: {e}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
-    global simulation_task
+    global simulation_task, snapshot_task
     
     # Startup
     print("🌱 VIVARIUM ZERO starting...")
@@ -50,19 +109,46 @@ async def lifespan(app: FastAPI):
     print(f"   Initial population: {settings.initial_population}")
     print(f"   Target FPS: {settings.target_fps}")
     
-    # Start simulation loop
+    # Replay the lineage log before any restore reports to it
+    lineage.start()
+    
+    # Resume from a checkpoint if one is configured, else the latest snapshot
+    if settings.checkpoint_path:
+        summary = reset_to_checkpoint(settings.checkpoint_path)
+        print(f"   Loaded checkpoint: tick {summary['tick']}, population {summary['population']}")
+    elif settings.snapshot_restore:
+        snapshot = snapshots.store.load()
+        if snapshot is not None:
+            restore(world, snapshot)
+            print(f"   Restored snapshot: tick {snapshot.tick}, population {snapshot.population}")
+    
+    # Record from the world as it is now
+    resync_lineage()
+    world.lineage = lineage
+    
+    # Start simulation thread, broadcast loop and snapshots
+    runner.start()
     simulation_task = asyncio.create_task(simulation_loop())
+    snapshots.start()
+    if settings.snapshot_interval > 0:
+        snapshot_task = asyncio.create_task(snapshot_loop())
     
     yield
     
     # Shutdown
     print("🛑 VIVARIUM ZERO shutting down...")
-    if simulation_task:
-        simulation_task.cancel()
-        try:
-            await simulation_task
-        except asyncio.CancelledError:
-            pass
+    runner.stop()
+    for task in (simulation_task, snapshot_task):
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    # Finish queued snapshot and lineage writes
+    snapshots.close()
+    world.lineage = None
+    lineage.close()
 
 
 # Create FastAPI app
@@ -75,7 +161,6 @@ app = FastAPI(
 
 
 # Mount static files (frontend)
-import os
 frontend_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "frontend")
 app.mount("/static", StaticFiles(directory=frontend_dir), name="static")
 
@@ -92,51 +177,162 @@ async def root():
 @app.websocket("/ws")
 async def websocket_route(websocket: WebSocket):
     """WebSocket endpoint for real-time simulation data"""
-    await websocket_endpoint(websocket, world)
+    await websocket_endpoint(websocket, runner)
 
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
+    frame = runner.frames.read()
     return {
         "status": "healthy",
-        "tick": world.tick,
-        "population": len(world.entities),
-        "generation": world.generation
+        "tick": frame.tick,
+        "population": frame.statistics['population'],
+        "generation": frame.statistics['generation']
     }
 
 
 @app.get("/api/statistics")
 async def get_statistics():
     """Get current simulation statistics"""
-    return world.get_statistics()
+    return runner.frames.read().statistics
+
+
+@app.get("/api/statistics/connections")
+async def get_connection_statistics():
+    """Get per-viewer delivery metrics (frames sent/dropped, send latency)"""
+    return manager.stats()
+
+
+@app.get("/api/snapshots")
+async def list_snapshots():
+    """Get retained snapshots and the writer's metrics (last duration and size)"""
+    return {
+        "writer": snapshots.stats(),
+        "snapshots": await asyncio.to_thread(snapshots.store.list)
+    }
+
+
+@app.post("/api/snapshots")
+async def take_snapshot():
+    """Capture a snapshot now (written in the background)"""
+    queued = await run_command(runner, snapshots.capture, world)
+    return {"status": "queued" if queued else "skipped", "tick": world.tick}
+
+
+@app.get("/api/checkpoints")
+async def get_checkpoints():
+    """List saved checkpoints"""
+    return await asyncio.to_thread(list_checkpoints, settings.checkpoint_dir)
+
+
+@app.post("/api/checkpoints/{name}")
+async def save_checkpoint(name: str):
+    """Save the world as a named checkpoint (copied between ticks, written in the background)"""
+    path = checkpoint_path(name)
+    snapshot = await run_command(runner, capture, world)
+    return await asyncio.to_thread(write_checkpoint, snapshot, path)
+
+
+@app.post("/api/checkpoints/{name}/restore")
+async def restore_checkpoint(name: str):
+    """Reset the world to a named checkpoint"""
+    path = checkpoint_path(name)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    return {"status": "restored", **(await run_command(runner, reset_to_checkpoint, path))}
+
+
+@app.get("/api/lineage")
+async def get_lineage_statistics():
+    """Get lineage log counters (events recorded/written, creatures indexed)"""
+    return lineage.stats()
+
+
+@app.get("/api/lineage/surviving")
+async def get_surviving_lineages(generation: int, limit: int = 100):
+    """Get the lineages from a generation that still have living members"""
+    return await asyncio.to_thread(lineage.surviving, generation, limit)
+
+
+@app.get("/api/lineage/{uid}/ancestors")
+async def get_ancestors(uid: int):
+    """Get a creature's ancestors, parent first"""
+    return {"uid": uid, "ancestors": await asyncio.to_thread(lineage.ancestors, uid)}
+
+
+@app.get("/api/lineage/{uid}/descendants")
+async def get_descendants(uid: int, limit: int = 1000):
+    """Get a creature's descendants (count per generation and the first `limit`)"""
+    return await asyncio.to_thread(lineage.descendants, uid, limit)
+
+
+@app.get("/api/statistics/vm")
+async def get_vm_profile():
+    """Get sampled VM profile (opcode counts, gas histogram, top genomes, trace)"""
+    return await run_command(runner, world.vm_profiler.report)
+
+
+@app.post("/api/statistics/vm")
+async def configure_vm_profile(sample_rate: float, reset: bool = False):
+    """Set the VM profiler sample rate (0 disables it)"""
+    profiler = world.vm_profiler
+    
+    def configure():
+        profiler.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        if reset:
+            profiler.reset()
+        return profiler.sample_rate
+    
+    return {"status": "configured", "sample_rate": await run_command(runner, configure)}
+
+
+@app.post("/api/statistics/vm/trace/{entity_id}")
+async def trace_entity(entity_id: str):
+    """Record the pc/stack sequence of one creature's next genome run"""
+    def request():
+        return world.vm_profiler.request_trace(world.store, entity_id)
+    
+    if not await run_command(runner, request):
+        raise HTTPException(status_code=404, detail="Entity not found or has no genome")
+    return {"status": "tracing", "entity_id": entity_id}
 
 
 @app.post("/api/control/pause")
 async def pause_simulation():
     """Pause the simulation"""
-    world.pause()
+    await manager.control(runner, 'pause')
     return {"status": "paused"}
 
 
 @app.post("/api/control/resume")
 async def resume_simulation():
     """Resume the simulation"""
-    world.resume()
+    await manager.control(runner, 'resume')
     return {"status": "resumed"}
 
 
 @app.post("/api/control/step")
 async def step_simulation():
     """Execute single simulation step"""
-    world.step()
+    await manager.control(runner, 'step')
     return {"status": "stepped", "tick": world.tick}
 
 
+@app.post("/api/control/speed")
+async def set_speed(mode: str, multiplier: Optional[float] = None):
+    """Switch between real time and turbo (multiplier 0 = as fast as possible)"""
+    try:
+        run = await run_command(runner, runner.set_mode, mode, multiplier)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "speed", **run}
+
+
 @app.post("/api/control/reset")
 async def reset_simulation():
     """Reset the simulation"""
-    world.reset()
+    await manager.control(runner, 'reset')
     return {"status": "reset"}
 
 
@@ -0,0 +1,403 @@
+"""
+Lineage log - append-only record of births, deaths and meals
+The simulation thread appends whole batches of events per tick into a
+preallocated chunk (a few array copies, nothing per event). Full chunks,
+and the partial one every `flush_interval` seconds, go to a writer thread
+that appends them to the log file and folds them into the ancestry index.
+Creature UIDs are dense, so the index is a set of arrays indexed by UID:
+ancestors follow `parent`, descendants walk a children CSR built on
+demand, and surviving lineages jump every living creature back to its
+ancestor in a given generation at once.
+"""
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+# Event kinds
+BIRTH, DEATH, EAT = range(3)
+EVENT_KINDS = ('birth', 'death', 'eat')
+
+# Death causes (in `other`)
+STARVED, CULLED, RESET, RESTORED = range(4)
+DEATH_CAUSES = ('starved', 'culled', 'reset', 'restored')
+
+# One fixed-size record per event; `other` is the parent UID of a birth
+# (-1 for founders) or the cause of a death, `value` the energy born with
+# or eaten
+EVENT_DTYPE = np.dtype([
+    ('tick', '<i8'),
+    ('uid', '<i8'),
+    ('other', '<i8'),
+    ('value', '<f4'),
+    ('generation', '<i4'),
+    ('kind', 'u1'),
+], align=True)
+
+
+class LineageIndex:
+    """Per-UID parent, generation, birth/death ticks and meal counts"""
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0  # One past the highest UID seen
+        self._allocate(capacity)
+        self._children: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.events = 0
+
+    def _allocate(self, capacity: int):
+        old = self.__dict__.get('parent')
+        columns = {
+            'parent': (np.int64, -1),
+            'generation': (np.int32, -1),
+            'born': (np.int64, -1),
+            'died': (np.int64, -1),
+            'meals': (np.int32, 0),
+        }
+        for name, (dtype, fill) in columns.items():
+            column = np.full(capacity, fill, dtype=dtype)
+            if old is not None:
+                column[:self.size] = getattr(self, name)[:self.size]
+            setattr(self, name, column)
+        self.capacity = capacity
+
+    def _reserve(self, uid: int):
+        if uid >= self.capacity:
+            capacity = self.capacity
+            while capacity <= uid:
+                capacity *= 2
+            self._allocate(capacity)
+        self.size = max(self.size, uid + 1)
+
+    def apply(self, events: np.ndarray):
+        """Fold a batch of events (in log order) into the index"""
+        if events.size == 0:
+            return
+        self._reserve(int(events['uid'].max()))
+        self.events += events.size
+        kind = events['kind']
+
+        births = events[kind == BIRTH]
+        if births.size:
+            uids = births['uid']
+            # A creature coming back (restored) keeps the ancestry it was born with
+            known = self.born[uids] >= 0
+            fresh = uids[~known]
+            self.parent[fresh] = births['other'][~known]
+            self.generation[fresh] = births['generation'][~known]
+            self.born[fresh] = births['tick'][~known]
+            self.died[uids] = -1
+            self._children = None
+
+        deaths = events[kind == DEATH]
+        self.died[deaths['uid']] = deaths['tick']
+
+        meals = events['uid'][kind == EAT]
+        if meals.size:
+            uids, counts = np.unique(meals, return_counts=True)
+            self.meals[uids] += counts.astype(np.int32)
+
+    def alive(self) -> np.ndarray:
+        """UIDs born and not dead, ascending"""
+        n = self.size
+        return np.flatnonzero((self.born[:n] >= 0) & (self.died[:n] < 0))
+
+    def children(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(start, uids): children of u are uids[start[u]:start[u + 1]]"""
+        if self._children is None:
+            n = self.size
+            parent = self.parent[:n]
+            born = np.flatnonzero(parent >= 0)
+            uids = born[np.argsort(parent[born], kind='stable')]
+            start = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(parent[born], minlength=n), out=start[1:])
+            self._children = (start, uids)
+        return self._children
+
+    def describe(self, uids: np.ndarray) -> List[dict]:
+        """Index entries of some UIDs"""
+        return [
+            {
+                'uid': uid,
+                'parent': parent,
+                'generation': generation,
+                'born': born,
+                'died': died,
+                'meals': meals,
+            }
+            for uid, parent, generation, born, died, meals in zip(
+                uids.tolist(),
+                self.parent[uids].tolist(),
+                self.generation[uids].tolist(),
+                self.born[uids].tolist(),
+                self.died[uids].tolist(),
+                self.meals[uids].tolist()
+            )
+        ]
+
+    def ancestors(self, uid: int) -> np.ndarray:
+        """Parent, grandparent, ... of a creature back to its founder"""
+        chain = []
+        if 0 <= uid < self.size:
+            uid = int(self.parent[uid])
+            while uid >= 0:
+                chain.append(uid)
+                uid = int(self.parent[uid])
+        return np.array(chain, dtype=np.int64)
+
+    def descendants(self, uid: int) -> np.ndarray:
+        """Every descendant of a creature, generation by generation"""
+        if not 0 <= uid < self.size:
+            return np.empty(0, dtype=np.int64)
+        start, children = self.children()
+        found = []
+        frontier = np.array([uid], dtype=np.int64)
+        while frontier.size:
+            # Concatenate the children ranges of the whole frontier
+            first, counts = start[frontier], start[frontier + 1] - start[frontier]
+            total = int(counts.sum())
+            if total == 0:
+                break
+            offsets = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(total)
+            frontier = children[offsets]
+            found.append(frontier)
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def surviving(self, generation: int) -> Tuple[np.ndarray, np.ndarray, int]:
+        """(founders, living descendants each, lineages) for creatures of a generation
+
+        Founders are the generation's creatures with living descendants
+        (themselves included); `lineages` counts all creatures of the
+        generation.
+        """
+        n = self.size
+        lineages = int(np.count_nonzero(self.generation[:n] == generation))
+        ancestor = self.alive()
+        ancestor = ancestor[self.generation[ancestor] >= generation]
+        # Jump every living creature back one generation at a time, together
+        while ancestor.size:
+            behind = self.generation[ancestor] > generation
+            if not behind.any():
+                break
+            ancestor = ancestor[~behind | (self.parent[ancestor] >= 0)]
+            behind = self.generation[ancestor] > generation
+            ancestor[behind] = self.parent[ancestor[behind]]
+        ancestor = ancestor[self.generation[ancestor] == generation]
+        founders, counts = np.unique(ancestor, return_counts=True)
+        return founders, counts, lineages
+
+    def stats(self) -> dict:
+        return {
+            'events': self.events,
+            'creatures': self.size,
+            'alive': int(self.alive().size),
+        }
+
+
+class LineageLog:
+    """Buffered event log feeding a file and a LineageIndex
+
+    `record`, `flush` and `resync` belong to the simulation thread; the
+    query methods may run on any thread.
+    """
+
+    def __init__(self, path: Optional[str] = None, chunk_size: int = 65536, flush_interval: float = 1.0):
+        self.path = path or None
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.index = LineageIndex()
+        self._lock = threading.Lock()
+        self._chunk = np.zeros(chunk_size, dtype=EVENT_DTYPE)
+        self._used = 0
+        self._flushed_at = time.monotonic()
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+
+        # Metrics
+        self.recorded = 0
+        self.written = 0
+        self.chunks = 0
+
+    # Simulation thread
+
+    def record(self, kind: int, tick: int, uids: np.ndarray, other=-1, generation=0, value=0.0):
+        """Append a batch of events of one kind (arrays or scalars per field)"""
+        uids = np.asarray(uids)
+        count = uids.size
+        done = 0
+        while done < count:
+            if self._used == self.chunk_size:
+                self._seal()
+            take = min(count - done, self.chunk_size - self._used)
+            rows = self._chunk[self._used:self._used + take]
+            part = slice(done, done + take)
+            rows['kind'] = kind
+            rows['tick'] = tick
+            rows['uid'] = uids[part]
+            rows['other'] = other[part] if np.ndim(other) else other
+            rows['generation'] = generation[part] if np.ndim(generation) else generation
+            rows['value'] = value[part] if np.ndim(value) else value
+            self._used += take
+            done += take
+        self.recorded += count
+
+    def maybe_flush(self):
+        """Flush the partial chunk once `flush_interval` has passed"""
+        if self._used and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Hand the buffered events to the writer"""
+        if self._used:
+            self._seal()
+        self._flushed_at = time.monotonic()
+
+    def _seal(self):
+        chunk, self._chunk = self._chunk[:self._used], np.zeros(self.chunk_size, dtype=EVENT_DTYPE)
+        self._used = 0
+        self._submit(chunk)
+
+    def resync(self, tick: int, uids: np.ndarray, generations: np.ndarray):
+        """Match the index to a replaced world (restore, startup)
+
+        Creatures the index has alive but the world lacks die (cause
+        RESTORED); creatures of the world it does not have alive are born
+        again, keeping any ancestry already known.
+        """
+        self.flush()
+        self._submit(('resync', tick, np.asarray(uids).copy(), np.asarray(generations).copy()))
+
+    def _submit(self, job):
+        if self._thread is None:
+            # Not started: apply in place (tools and tests)
+            self._process(job)
+        else:
+            self._jobs.put(job)
+
+    # Writer thread
+
+    def start(self):
+        """Replay the existing log into the index, then start the writer"""
+        if self.path and os.path.exists(self.path):
+            self._replay()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="lineage-writer", daemon=True)
+            self._thread.start()
+
+    def _replay(self):
+        size = os.path.getsize(self.path)
+        whole = size - size % EVENT_DTYPE.itemsize
+        if whole != size:
+            # Drop a record cut short by a crash so appends stay aligned
+            with open(self.path, 'r+b') as f:
+                f.truncate(whole)
+        with open(self.path, 'rb') as f:
+            while True:
+                events = np.fromfile(f, dtype=EVENT_DTYPE, count=1 << 20)
+                if events.size == 0:
+                    break
+                with self._lock:
+                    self.index.apply(events)
+                self.written += events.size
+
+    def close(self):
+        """Flush, write everything queued and stop the writer"""
+        self.flush()
+        if self._thread is not None:
+            self._jobs.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                self._process(job)
+            except Exception as e:
+                print(f"Lineage log error: {e}")
+
+    def _process(self, job):
+        if isinstance(job, tuple):
+            job = self._resync_events(*job[1:])
+        if self.path:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, 'ab')
+            self._file.write(job.tobytes())
+            self._file.flush()
+        with self._lock:
+            self.index.apply(job)
+        self.written += job.size
+        self.chunks += 1
+
+    def _resync_events(self, tick: int, uids: np.ndarray, generations: np.ndarray) -> np.ndarray:
+        index = self.index
+        alive = index.alive()
+        gone = np.setdiff1d(alive, uids, assume_unique=True)
+        back = ~np.isin(uids, alive, assume_unique=True)
+        events = np.zeros(gone.size + int(back.sum()), dtype=EVENT_DTYPE)
+        events['tick'] = tick
+        dead, born = events[:gone.size], events[gone.size:]
+        dead['kind'], dead['uid'], dead['other'] = DEATH, gone, RESTORED
+        born['kind'], born['uid'], born['generation'] = BIRTH, uids[back], generations[back]
+        born['other'] = -1
+        return events
+
+    # Queries (any thread)
+
+    def ancestors(self, uid: int) -> List[dict]:
+        """A creature's ancestors, parent first"""
+        with self._lock:
+            return self.index.describe(self.index.ancestors(uid))
+
+    def descendants(self, uid: int, limit: int = 1000) -> dict:
+        """Count of a creature's descendants, per generation, and the first `limit`"""
+        with self._lock:
+            uids = self.index.descendants(uid)
+            generations, counts = np.unique(self.index.generation[uids], return_counts=True)
+            alive = int(np.count_nonzero(self.index.died[uids] < 0))
+            return {
+                'uid': uid,
+                'count': int(uids.size),
+                'alive': alive,
+                'generations': dict(zip(generations.tolist(), counts.tolist())),
+                'descendants': self.index.describe(uids[:limit]),
+            }
+
+    def surviving(self, generation: int, limit: int = 100) -> dict:
+        """Lineages from a generation that still have living members"""
+        with self._lock:
+            founders, counts, lineages = self.index.surviving(generation)
+        order = np.argsort(-counts, kind='stable')[:limit]
+        return {
+            'generation': generation,
+            'lineages': lineages,
+            'surviving': int(founders.size),
+            'founders': [
+                {'uid': uid, 'alive': alive}
+                for uid, alive in zip(founders[order].tolist(), counts[order].tolist())
+            ],
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            index = self.index.stats()
+        return {
+            'path': self.path,
+            'recorded': self.recorded,
+            'written': self.written,
+            'buffered': self._used,
+            'queued_chunks': self._jobs.qsize(),
+            **index,
+        }
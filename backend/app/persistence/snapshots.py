@@ -0,0 +1,398 @@
+"""
+Snapshots - periodic world checkpoints in SQLite
+A snapshot is captured on the simulation thread at a tick boundary by
+copying the store and food columns (a few memcpys, no serialization); a
+background writer thread then stores it in SQLite (WAL mode), so the
+simulation never waits on disk. Only the newest `retention` snapshots are
+kept, and the latest one can be restored at startup.
+"""
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ..core.entity import Entity
+from ..core.entity_store import PALETTE, EntityStore, color_index
+from ..core.food_spawner import Food
+from ..core.vm.genome import GENOME_DTYPE
+from ..core.vm.pool import genome_pool
+
+
+# Food columns saved (only active slots are captured)
+FOOD_COLUMNS = ('x', 'y', 'energy', 'radius', 'color')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    tick INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    population INTEGER NOT NULL,
+    food_count INTEGER NOT NULL,
+    created REAL NOT NULL,
+    meta TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    capture_ms REAL NOT NULL,
+    write_ms REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot_columns (
+    snapshot_id INTEGER NOT NULL,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dtype TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (snapshot_id, owner, name)
+);
+CREATE TABLE IF NOT EXISTS snapshot_genomes (
+    snapshot_id INTEGER NOT NULL,
+    gid INTEGER NOT NULL,
+    packed BLOB NOT NULL,
+    PRIMARY KEY (snapshot_id, gid)
+);
+"""
+
+
+class Snapshot(NamedTuple):
+    """World state copied at a tick boundary"""
+    tick: int
+    generation: int
+    next_uid: int
+    created: float
+    palette: List[Tuple[int, int, int]]
+    entities: Dict[str, np.ndarray]  # Store columns, plus 'id'/'parent_id' lists
+    foods: Dict[str, np.ndarray]  # Active food columns, plus 'id' list
+    genomes: Dict[int, bytes]  # Packed genomes referenced by entities['genome_id']
+    capture_ms: float = 0.0
+
+    @property
+    def population(self) -> int:
+        return len(self.entities['id'])
+
+    @property
+    def food_count(self) -> int:
+        return len(self.foods['id'])
+
+
+def capture(world) -> Snapshot:
+    """Copy the world's state (run on the simulation thread between ticks)"""
+    start = time.perf_counter()
+    store, pool = world.store, world.foods
+    n = store.size
+    columns = list(EntityStore.COLUMNS) + list(EntityStore.TRAIL_COLUMNS) + list(EntityStore.VM_COLUMNS)
+    entities = {name: getattr(store, name)[:n].copy() for name in columns}
+    entities['id'], entities['parent_id'] = store.identities()
+
+    slots = pool.active_slots()
+    foods = {name: getattr(pool, name)[slots] for name in FOOD_COLUMNS}
+    foods['id'] = [pool.ids[slot] for slot in slots.tolist()]
+
+    # Pooled genomes are immutable, so their bytes are shared, not copied
+    genomes = {gid: genome_pool.key(gid) for gid in np.unique(entities['genome_id']).tolist()}
+
+    return Snapshot(
+        tick=world.tick,
+        generation=world.generation,
+        next_uid=store.next_uid,
+        created=time.time(),
+        palette=list(PALETTE),
+        entities=entities,
+        foods=foods,
+        genomes=genomes,
+        capture_ms=(time.perf_counter() - start) * 1000
+    )
+
+
+def restore(world, snapshot: Snapshot):
+    """Replace the world's state with a snapshot's (simulation thread or startup)"""
+    store, pool = world.store, world.foods
+    store.clear()
+    pool.clear()
+    world.physics.spatial_grid.clear()
+
+    # Palette indices and genome IDs are process-local: map them to this process
+    colors = np.array([color_index(color) for color in snapshot.palette] or [0], dtype=np.uint8)
+    gids = {gid: genome_pool.acquire(np.frombuffer(packed, dtype=GENOME_DTYPE))
+            for gid, packed in snapshot.genomes.items()}
+
+    entities = snapshot.entities
+    for i, (eid, parent_id) in enumerate(zip(entities['id'], entities['parent_id'])):
+        store.append(Entity(
+            id=eid,
+            parent_id=parent_id,
+            genome_id=gids[int(entities['genome_id'][i])]
+        ))
+    n = store.size
+    for name in list(EntityStore.COLUMNS) + list(EntityStore.TRAIL_COLUMNS) + list(EntityStore.VM_COLUMNS):
+        if name == 'genome_id':
+            continue
+        values = entities[name]
+        getattr(store, name)[:n] = colors[values] if name == 'color' else values
+    # Never reuse a UID already handed out in this process (clients key on them)
+    store.next_uid = max(store.next_uid, snapshot.next_uid)
+    # The entities now hold their own references
+    for gid in gids.values():
+        genome_pool.release(gid)
+
+    foods = snapshot.foods
+    pool.extend(
+        Food(
+            id=fid,
+            x=float(foods['x'][i]),
+            y=float(foods['y'][i]),
+            energy=float(foods['energy'][i]),
+            radius=float(foods['radius'][i]),
+            color=snapshot.palette[int(foods['color'][i])]
+        )
+        for i, fid in enumerate(foods['id'])
+    )
+
+    world.tick = snapshot.tick
+    world.generation = snapshot.generation
+
+
+def _encode(value) -> Tuple[str, str, bytes]:
+    """(dtype, shape, bytes) of a column; string lists are stored as JSON"""
+    if isinstance(value, list):
+        return 'json', '[]', json.dumps(value).encode()
+    value = np.ascontiguousarray(value)
+    return value.dtype.str, json.dumps(value.shape), value.tobytes()
+
+
+def _decode(dtype: str, shape: str, data: bytes):
+    if dtype == 'json':
+        return json.loads(data)
+    return np.frombuffer(data, dtype=np.dtype(dtype)).reshape(json.loads(shape))
+
+
+class SnapshotStore:
+    """SQLite database of snapshots
+
+    The writer thread keeps one connection; readers open their own, which
+    WAL lets run alongside a write.
+    """
+
+    def __init__(self, path: str, retention: int = 10):
+        self.path = path
+        self.retention = retention
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Open the database on first use (WAL: readers never block the writer)"""
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def exists(self) -> bool:
+        return self._conn is not None or os.path.exists(self.path)
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def save(self, snapshots: List[Snapshot]) -> List[dict]:
+        """Write snapshots in one transaction and prune old ones; their summaries"""
+        conn = self.conn
+        summaries = []
+        with conn:
+            for snapshot in snapshots:
+                start = time.perf_counter()
+                rows = [
+                    (owner, name) + _encode(value)
+                    for owner, columns in (('entities', snapshot.entities), ('foods', snapshot.foods))
+                    for name, value in columns.items()
+                ]
+                genomes = [(gid, packed) for gid, packed in snapshot.genomes.items()]
+                size = sum(len(row[-1]) for row in rows) + sum(len(packed) for _, packed in genomes)
+                meta = json.dumps({'next_uid': snapshot.next_uid, 'palette': snapshot.palette})
+                cursor = conn.execute(
+                    "INSERT INTO snapshots (tick, generation, population, food_count, created, meta,"
+                    " size_bytes, capture_ms, write_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                    (snapshot.tick, snapshot.generation, snapshot.population, snapshot.food_count,
+                     snapshot.created, meta, size, snapshot.capture_ms)
+                )
+                sid = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO snapshot_columns VALUES (?, ?, ?, ?, ?, ?)",
+                    [(sid,) + row for row in rows]
+                )
+                conn.executemany(
+                    "INSERT INTO snapshot_genomes VALUES (?, ?, ?)",
+                    [(sid, gid, packed) for gid, packed in genomes]
+                )
+                write_ms = (time.perf_counter() - start) * 1000
+                conn.execute("UPDATE snapshots SET write_ms = ? WHERE id = ?", (write_ms, sid))
+                summaries.append({
+                    'id': sid,
+                    'tick': snapshot.tick,
+                    'size_bytes': size,
+                    'capture_ms': snapshot.capture_ms,
+                    'write_ms': write_ms,
+                })
+            self._prune(conn)
+        return summaries
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Delete all but the newest `retention` snapshots"""
+        if self.retention <= 0:
+            return
+        old = [row[0] for row in conn.execute(
+            "SELECT id FROM snapshots ORDER BY id DESC LIMIT -1 OFFSET ?", (self.retention,)
+        )]
+        if old:
+            params = [(sid,) for sid in old]
+            conn.executemany("DELETE FROM snapshot_columns WHERE snapshot_id = ?", params)
+            conn.executemany("DELETE FROM snapshot_genomes WHERE snapshot_id = ?", params)
+            conn.executemany("DELETE FROM snapshots WHERE id = ?", params)
+
+    def list(self) -> List[dict]:
+        """Summaries of the retained snapshots, newest first"""
+        if not self.exists():
+            return []
+        conn = self._reader()
+        try:
+            cursor = conn.execute(
+                "SELECT id, tick, generation, population, food_count, created, size_bytes,"
+                " capture_ms, write_ms FROM snapshots ORDER BY id DESC"
+            )
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor]
+        finally:
+            conn.close()
+
+    def load(self, sid: Optional[int] = None) -> Optional[Snapshot]:
+        """A snapshot by ID (default: the latest), or None"""
+        if not self.exists():
+            return None
+        conn = self._reader()
+        try:
+            return self._load(conn, sid)
+        finally:
+            conn.close()
+
+    def _load(self, conn: sqlite3.Connection, sid: Optional[int]) -> Optional[Snapshot]:
+        row = conn.execute(
+            "SELECT id, tick, generation, created, meta, capture_ms FROM snapshots"
+            + (" WHERE id = ?" if sid is not None else " ORDER BY id DESC LIMIT 1"),
+            (sid,) if sid is not None else ()
+        ).fetchone()
+        if row is None:
+            return None
+        sid, tick, generation, created, meta, capture_ms = row
+        meta = json.loads(meta)
+        columns: Dict[str, dict] = {'entities': {}, 'foods': {}}
+        for owner, name, dtype, shape, data in conn.execute(
+            "SELECT owner, name, dtype, shape, data FROM snapshot_columns WHERE snapshot_id = ?", (sid,)
+        ):
+            columns[owner][name] = _decode(dtype, shape, data)
+        genomes = dict(conn.execute(
+            "SELECT gid, packed FROM snapshot_genomes WHERE snapshot_id = ?", (sid,)
+        ).fetchall())
+        return Snapshot(
+            tick=tick,
+            generation=generation,
+            next_uid=meta['next_uid'],
+            created=created,
+            palette=[tuple(color) for color in meta['palette']],
+            entities=columns['entities'],
+            foods=columns['foods'],
+            genomes=genomes,
+            capture_ms=capture_ms
+        )
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class SnapshotWriter:
+    """Background thread writing captured snapshots to a SnapshotStore
+
+    `submit` never blocks: if the writer is still behind by `max_pending`
+    snapshots, the new one is skipped (the next interval catches up).
+    """
+
+    def __init__(self, store: SnapshotStore, max_pending: int = 2):
+        self.store = store
+        self._queue: "queue.Queue[Optional[Snapshot]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+
+        # Metrics
+        self.written = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last: Optional[dict] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, snapshot: Snapshot) -> bool:
+        """Queue a snapshot for writing; False if it was skipped"""
+        try:
+            self._queue.put_nowait(snapshot)
+        except queue.Full:
+            self.skipped += 1
+            return False
+        return True
+
+    def capture(self, world) -> bool:
+        """Capture the world and queue it (simulation thread, between ticks)"""
+        return self.submit(capture(world))
+
+    def close(self):
+        """Write what is queued, then stop the thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self.store.close()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting into the same transaction
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            batch = [snapshot for snapshot in batch if snapshot is not None]
+            if batch:
+                try:
+                    summaries = self.store.save(batch)
+                except sqlite3.Error as e:
+                    self.errors += 1
+                    print(f"Snapshot write failed: {e}")
+                else:
+                    self.written += len(summaries)
+                    self.last = summaries[-1]
+            if stop:
+                return
+
+    def stats(self) -> dict:
+        """Writer counters and the last snapshot's duration and size"""
+        return {
+            'path': self.store.path,
+            'written': self.written,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'pending': self._queue.qsize(),
+            'last': self.last,
+        }
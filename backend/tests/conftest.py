@@ -0,0 +1,17 @@
+"""
+Shared test fixtures
+"""
+import pytest
+
+
+def _advance(world, ticks=20):
+    """Run `ticks` world updates; returns the world"""
+    for _ in range(ticks):
+        world.update()
+    return world
+
+
+@pytest.fixture
+def advance():
+    """Helper that steps a world forward a number of ticks"""
+    return _advance
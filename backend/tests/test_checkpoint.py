@@ -0,0 +1,144 @@
+"""
+Unit tests for memory-mapped checkpoints
+"""
+import mmap
+import os
+
+import numpy as np
+import pytest
+
+from app.core.entity_store import EntityStore
+from app.core.vm.genome import seed_turner, seed_wanderer
+from app.core.vm.pool import genome_pool
+from app.core.world import World
+from app.persistence import checkpoint
+from app.persistence.checkpoint import Checkpoint, load_checkpoint, write_checkpoint
+from app.persistence.snapshots import capture
+
+
+def mapped(array):
+    """True if an array is a view of a memory map"""
+    while isinstance(array, np.ndarray):
+        array = array.base
+    if isinstance(array, memoryview):
+        array = array.obj
+    return isinstance(array, mmap.mmap)
+
+
+def test_round_trip_maps_columns(tmp_path, advance):
+    """Test a loaded checkpoint is the same world, backed by the file mapping"""
+    world = advance(World())
+    path = str(tmp_path / "world.vzck")
+    summary = write_checkpoint(capture(world), path)
+    assert summary['size_bytes'] == os.path.getsize(path)
+    assert not os.path.exists(path + ".tmp")
+
+    restored = World()
+    load_checkpoint(restored, path)
+    n = world.store.size
+    assert restored.tick == world.tick and restored.store.size == n
+    for name in ('uid', 'x', 'energy', 'trail', 'registers'):
+        column = getattr(restored.store, name)
+        assert mapped(column)
+        np.testing.assert_array_equal(column[:n], getattr(world.store, name)[:n])
+    assert [e.id for e in restored.store.views] == [e.id for e in world.store.views]
+    assert [e.color for e in restored.store.views] == [e.color for e in world.store.views]
+    assert [e.genome_key for e in restored.store.views] == [e.genome_key for e in world.store.views]
+    assert sorted(f.id for f in restored.foods) == sorted(f.id for f in world.foods)
+
+
+def test_changes_stay_out_of_the_file(tmp_path, advance):
+    """Test the live world writes to private pages, and keeps running and growing"""
+    world = advance(World())
+    path = str(tmp_path / "world.vzck")
+    write_checkpoint(capture(world), path)
+    x = Checkpoint(path).array('entities', 'x').copy()
+
+    restored = World()
+    load_checkpoint(restored, path)
+    restored.store.x[:] += 1
+    advance(restored, 30)
+    restored.store._grow(restored.store.capacity + 1)
+    np.testing.assert_array_equal(Checkpoint(path).array('entities', 'x'), x)
+
+
+def test_load_keeps_genome_references(tmp_path, advance):
+    """Test loading takes exactly one genome reference per creature"""
+    world = advance(World(), 5)
+    path = str(tmp_path / "world.vzck")
+    write_checkpoint(capture(world), path)
+    before = genome_pool.stats()['references']
+    load_checkpoint(world, path)
+    assert genome_pool.stats()['references'] == before
+
+
+def test_load_binds_no_views(tmp_path, advance):
+    """Test a restore builds no per-creature objects until a creature is asked for"""
+    world = advance(World())
+    path = str(tmp_path / "world.vzck")
+    write_checkpoint(capture(world), path)
+    ids = [e.id for e in world.store.views]
+
+    restored = World()
+    load_checkpoint(restored, path)
+    views = restored.store.views
+    assert views.bound() == 0
+    assert restored.store.identities()[0] == ids
+    row = restored.store.find(ids[-1])
+    assert row == len(ids) - 1 and views.bound() == 0
+    assert views[row].id == ids[-1] and views.bound() == 1
+
+
+def test_lazy_views_survive_removal_and_release_genomes(tmp_path, advance):
+    """Test unbound rows keep their ids when moved and hand back their genome when removed"""
+    world = advance(World(), 5)
+    for row, genome in enumerate([seed_wanderer(), seed_turner()] * (world.store.size // 2)):
+        world.store.views[row].genome = genome
+    path = str(tmp_path / "world.vzck")
+    write_checkpoint(capture(world), path)
+    expected = dict(zip(world.store.uid[:world.store.size].tolist(), (e.id for e in world.store.views)))
+    before = genome_pool.stats()['references']
+
+    load_checkpoint(world, path)
+    store = world.store
+    store.views[store.size - 1].energy += 1
+    store.remove_many([0, 2])
+    store.remove(1)
+    assert store.views.bound() == 1
+    for row in range(store.size):
+        assert store.views[row].id == expected[int(store.uid[row])]
+    assert genome_pool.stats()['references'] == before - 3
+
+    world.reset()
+    load_checkpoint(world, path)
+    assert genome_pool.stats()['references'] == before
+
+    # A dropped store hands its unbound rows' references back at once
+    world.store = EntityStore()
+    assert genome_pool.stats()['references'] == before - len(expected)
+
+
+def test_rejects_other_files(tmp_path):
+    """Test files that are not checkpoints are refused"""
+    path = tmp_path / "junk.vzck"
+    path.write_bytes(b"not a checkpoint" * 10)
+    with pytest.raises(ValueError):
+        Checkpoint(str(path))
+
+
+def test_cli_inspect_and_diff(tmp_path, capsys, advance):
+    """Test the CLI describes a checkpoint and reports differences"""
+    world = World()
+    a, b = str(tmp_path / "a.vzck"), str(tmp_path / "b.vzck")
+    write_checkpoint(capture(world), a)
+    advance(world, 10)
+    write_checkpoint(capture(world), b)
+
+    assert checkpoint.main(['inspect', a]) == 0
+    assert 'entities.x' in capsys.readouterr().out
+    assert checkpoint.main(['diff', a, a]) == 0
+    assert capsys.readouterr().out.strip() == 'identical'
+    assert checkpoint.main(['diff', a, b]) == 1
+    out = capsys.readouterr().out
+    assert 'tick: 0 -> 10' in out and 'entities.x' in out
+    assert checkpoint.main(['inspect', str(tmp_path / "missing.vzck")]) == 2
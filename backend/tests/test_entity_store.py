@@ -0,0 +1,93 @@
+"""
+Unit tests for EntityStore
+"""
+import pytest
+import numpy as np
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+
+
+def test_append_attaches_view():
+    """Test appending moves entity state into store columns"""
+    store = EntityStore(capacity=2)
+    entity = Entity(x=100, y=200, energy=50, color=(255, 100, 100))
+    
+    row = store.append(entity)
+    
+    assert row == 0
+    assert len(store) == 1
+    assert store.x[0] == 100
+    assert store.energy[0] == 50
+    assert entity.x == 100
+    assert entity.color == (255, 100, 100)
+    
+    # Writes through the view land in the columns
+    entity.energy = 75
+    assert store.energy[0] == 75
+
+
+def test_amortized_growth():
+    """Test store grows past its initial capacity"""
+    store = EntityStore(capacity=1)
+    entities = [Entity(x=i, y=i) for i in range(10)]
+    
+    for entity in entities:
+        store.append(entity)
+    
+    assert len(store) == 10
+    assert store.capacity >= 10
+    assert [e.x for e in entities] == list(range(10))
+    assert len(set(store.uid[:10].tolist())) == 10
+
+
+def test_swap_remove():
+    """Test removing a row moves the last row into the hole"""
+    store = EntityStore()
+    a, b, c = Entity(x=1), Entity(x=2), Entity(x=3)
+    for entity in (a, b, c):
+        store.append(entity)
+    
+    store.remove(0)
+    
+    assert len(store) == 2
+    assert store.views == [c, b]
+    assert c.x == 3
+    assert store.x[0] == 3
+    
+    # Removed entity keeps its last state as a detached object
+    assert a._store is None
+    assert a.x == 1
+
+
+def test_remove_many():
+    """Test batch removal keeps views and columns consistent"""
+    store = EntityStore()
+    entities = [Entity(x=i, energy=i + 1) for i in range(8)]
+    for entity in entities:
+        store.append(entity)
+    
+    store.remove_many(np.array([1, 6, 3]))
+    
+    survivors = [e for i, e in enumerate(entities) if i not in (1, 3, 6)]
+    assert len(store) == 5
+    assert set(store.views) == set(survivors)
+    for row, entity in enumerate(store.views):
+        assert entity._row == row
+        assert store.x[row] == entity.x
+        assert entity.energy == entity.x + 1
+
+
+def test_adopt_list():
+    """Test adopting a list of detached entities creates one store"""
+    entities = [Entity(x=1), Entity(x=2)]
+    
+    store = EntityStore.adopt(entities)
+    
+    assert len(store) == 2
+    assert EntityStore.adopt(entities) is store
+    
+    other = EntityStore()
+    stranger = Entity(x=3)
+    other.append(stranger)
+    with pytest.raises(ValueError):
+        EntityStore.adopt([entities[0], stranger])
@@ -0,0 +1,83 @@
+"""
+Unit tests for FoodPool and batched food consumption
+"""
+import pytest
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.food_pool import FoodPool
+from app.core.food_spawner import Food
+from app.core.physics import PhysicsEngine
+
+
+def test_add_and_remove_reuses_slots():
+    """Test freed slots are handed out again"""
+    pool = FoodPool(capacity=1)
+    a = pool.add(Food(id="a", x=1, y=1))
+    b = pool.add(Food(id="b", x=2, y=2))
+    
+    pool.remove_many([a])
+    c = pool.add(Food(id="c", x=3, y=3))
+    
+    assert c == a
+    assert len(pool) == 2
+    assert sorted(f.id for f in pool) == ["b", "c"]
+    assert pool.get(b).x == 2
+
+
+def test_to_dicts_matches_food():
+    """Test pool serialization matches Food.to_dict"""
+    food = Food(id="f1", x=10, y=20, color=(150, 75, 0))
+    pool = FoodPool.adopt([food])
+    
+    assert pool.to_dicts() == [food.to_dict()]
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_nearest_entity_wins_contested_food(incremental):
+    """Test several entities reaching one pellet: the nearest eats it"""
+    physics = PhysicsEngine(800, 600, incremental_grid=incremental)
+    far = Entity(x=108, y=100, energy=50)
+    near = Entity(x=96, y=100, energy=50)
+    store = EntityStore.adopt([far, near])
+    pool = FoodPool.adopt([Food(id="f1", x=100, y=100, energy=20)])
+    
+    physics.update(store, pool, dt=0.016)
+    
+    assert len(pool) == 0
+    assert near.energy == 70
+    assert far.energy == 50
+
+
+def test_tie_goes_to_lowest_uid():
+    """Test equidistant eaters are resolved by uid"""
+    physics = PhysicsEngine(800, 600)
+    first = Entity(x=96, y=100, energy=50)
+    second = Entity(x=104, y=100, energy=50)
+    store = EntityStore.adopt([first, second])
+    
+    # Re-attaching gives `first` a newer uid than `second`
+    store.remove(0)
+    store.append(first)
+    pool = FoodPool.adopt([Food(id="f1", x=100, y=100, energy=20)])
+    
+    physics.update(store, pool, dt=0.016)
+    
+    assert second.energy == 70
+    assert first.energy == 50
+
+
+def test_persistent_pool_across_ticks():
+    """Test the incremental food layer follows spawns and consumption"""
+    physics = PhysicsEngine(800, 600, incremental_grid=True)
+    entity = Entity(x=100, y=100, energy=10)
+    store = EntityStore.adopt([entity])
+    pool = FoodPool()
+    
+    physics.update(store, pool, dt=0.016)
+    pool.add(Food(id="f1", x=300, y=300, energy=20))
+    pool.add(Food(id="f2", x=102, y=100, energy=20))
+    physics.update(store, pool, dt=0.016)
+    
+    assert entity.energy == 30
+    assert [f.id for f in pool] == ["f1"]
+    assert len(physics.spatial_grid['foods']) == 1
@@ -0,0 +1,74 @@
+"""
+Unit tests for the content-addressed genome pool
+"""
+import gc
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.vm.genome import pack, seed_turner, seed_wanderer
+from app.core.vm.instructions import Instruction, Opcode
+from app.core.vm.pool import GenomePool, genome_pool
+
+
+def test_intern_by_content():
+    """Test equal programs share one ID and distinct programs do not"""
+    pool = GenomePool()
+    a = pool.acquire(seed_wanderer())
+    b = pool.acquire(seed_wanderer())
+    c = pool.acquire(seed_turner())
+    
+    assert a == b != c
+    assert len(pool) == 2
+    assert pool.refcounts[a] == 2
+    assert pool.acquire([]) == GenomePool.EMPTY
+
+
+def test_release_frees_and_reuses_ids():
+    """Test unreferenced genomes are freed and their IDs recycled"""
+    pool = GenomePool()
+    a = pool.acquire(seed_wanderer())
+    pool.release(a)
+    
+    assert len(pool) == 0
+    assert pool.program(a) is None
+    assert pool.stats() == {'alive': 0, 'references': 0, 'interned': 1, 'freed': 1}
+    
+    b = pool.acquire(seed_turner())
+    assert b == a
+    assert pool.program(b) == seed_turner()
+
+
+def test_entity_references_follow_lifetime():
+    """Test creatures hold one reference while alive, including in a store"""
+    program = [Instruction(Opcode.ROTATE, 7), Instruction(Opcode.MOVE_BACK)]
+    entities = [Entity(x=10, y=10, genome=list(program)) for _ in range(3)]
+    gid = entities[0].genome_id
+    store = EntityStore.adopt(entities)
+    
+    assert genome_pool.refcounts[gid] == 3
+    assert store.genome_id[:3].tolist() == [gid] * 3
+    assert entities[1].genome == program
+    
+    store.clear()
+    del entities, store
+    gc.collect()
+    assert genome_pool.program(gid) is None
+
+
+def test_reproduce_shares_unmutated_genome():
+    """Test children share the parent's genome ID unless mutation changes it"""
+    parent = Entity(x=100, y=100, energy=90, genome=seed_turner())
+    packed = genome_pool.get_packed(parent.genome_id)
+    
+    child = parent.reproduce(packed)
+    assert child.genome_id == parent.genome_id
+    assert genome_pool.refcounts[parent.genome_id] == 2
+    
+    mutant = parent.reproduce(pack(seed_turner() + [Instruction(Opcode.NOOP)]))
+    assert mutant.genome_id != parent.genome_id
+    assert mutant.genome == seed_turner() + [Instruction(Opcode.NOOP)]
+
+
+def test_arguments_distinguish_none_from_minus_one():
+    """Test PUSH with no argument and PUSH -1 are different genomes"""
+    pool = GenomePool()
+    assert pool.acquire([Instruction(Opcode.PUSH)]) != pool.acquire([Instruction(Opcode.PUSH, -1)])
@@ -0,0 +1,115 @@
+"""
+Unit tests for the lineage event log and ancestry index
+"""
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app.core.food_spawner import Food
+from app.core.world import World
+from app.persistence.lineage import BIRTH, DEATH, EAT, EVENT_DTYPE, STARVED, LineageLog
+
+
+def family(log):
+    """Founders 0 and 1; 2 and 3 are children of 0, 4 of 2, 5 of 1; 0, 1, 3 and 5 die"""
+    log.record(BIRTH, 0, [0, 1], -1, 0)
+    log.record(BIRTH, 1, [2, 3, 5], [0, 0, 1], 1)
+    log.record(BIRTH, 2, [4], [2], 2)
+    log.record(DEATH, 3, [0, 1, 3, 5], STARVED)
+    log.record(EAT, 3, [4, 4, 2])
+    log.flush()
+
+
+def test_ancestry_queries():
+    """Test ancestors, descendants and surviving lineages on a known tree"""
+    log = LineageLog()
+    family(log)
+    assert [a['uid'] for a in log.ancestors(4)] == [2, 0]
+    assert log.ancestors(0) == []
+
+    descendants = log.descendants(0)
+    assert sorted(d['uid'] for d in descendants['descendants']) == [2, 3, 4]
+    assert descendants['count'] == 3 and descendants['alive'] == 2
+    assert descendants['generations'] == {1: 2, 2: 1}
+    assert log.descendants(2)['descendants'][0]['meals'] == 2
+
+    surviving = log.surviving(0)
+    assert surviving['lineages'] == 2 and surviving['surviving'] == 1
+    assert surviving['founders'] == [{'uid': 0, 'alive': 2}]
+    assert log.surviving(1)['founders'] == [{'uid': 2, 'alive': 2}]
+
+
+def test_chunks_flush_when_full():
+    """Test events are handed over in whole chunks, the rest on flush"""
+    log = LineageLog(chunk_size=4)
+    log.record(BIRTH, 0, np.arange(10), -1, 0)
+    assert log.written == 8 and log.stats()['buffered'] == 2
+    log.flush()
+    assert log.written == 10 and log.index.alive().tolist() == list(range(10))
+
+
+def test_log_file_replays(tmp_path):
+    """Test a restarted log rebuilds its index from the file"""
+    path = str(tmp_path / "lineage.log")
+    log = LineageLog(path)
+    log.start()
+    family(log)
+    log.close()
+
+    # A record cut short by a crash is dropped
+    with open(path, 'ab') as f:
+        f.write(b'\0' * (EVENT_DTYPE.itemsize // 2))
+    replayed = LineageLog(path)
+    replayed.start()
+    assert [a['uid'] for a in replayed.ancestors(4)] == [2, 0]
+    assert replayed.surviving(0)['founders'] == [{'uid': 0, 'alive': 2}]
+    replayed.record(DEATH, 4, [4], STARVED)
+    replayed.close()
+    assert (tmp_path / "lineage.log").stat().st_size % EVENT_DTYPE.itemsize == 0
+
+
+def test_resync_matches_world():
+    """Test resync kills creatures the world lost and revives restored ones"""
+    log = LineageLog()
+    family(log)
+    log.resync(5, np.array([3, 4, 9]), np.array([1, 2, 0]))
+    assert log.index.alive().tolist() == [3, 4, 9]
+    assert log.index.parent[3] == 0 and log.index.parent[9] == -1
+
+
+def test_world_records_births_deaths_and_meals():
+    """Test the world reports its events in batches"""
+    world = World()
+    log = LineageLog()
+    world.lineage = log
+    store = world.store
+    n = store.size
+    parents = store.uid[:n].copy()
+
+    # Everyone reproduces; the first creature starves; the second eats
+    store.energy[:n] = 100
+    store.energy[0] = -1
+    world.foods.add(Food(id="meal", x=store.x[1], y=store.y[1]))
+    world.update()
+    log.flush()
+
+    index = log.index
+    children = np.arange(parents.max() + 1, store.next_uid)
+    assert children.size == n - 1
+    assert sorted(index.parent[children].tolist()) == sorted(parents[1:].tolist())
+    assert (index.generation[children] == 1).all()
+    assert index.died[parents[0]] == 0
+    assert index.meals[parents[1]] >= 1
+    assert log.stats()['recorded'] >= (n - 1) + 1 + 1
+
+
+def test_lineage_endpoints():
+    """Test the ancestry queries are served over REST"""
+    from app.main import app
+
+    with TestClient(app) as client:
+        stats = client.get("/api/lineage").json()
+        assert stats['alive'] > 0
+        surviving = client.get("/api/lineage/surviving", params={'generation': 0}).json()
+        assert surviving['generation'] == 0 and surviving['surviving'] >= 0
+        assert client.get("/api/lineage/0/ancestors").json() == {'uid': 0, 'ancestors': []}
+        assert client.get("/api/lineage/0/descendants").json()['uid'] == 0
@@ -0,0 +1,54 @@
+"""
+Unit tests for genome packing and batched mutation
+"""
+import random
+import numpy as np
+from app.core.vm.genome import GENOME_DTYPE, NO_ARG, pack, seed_turner, seed_wanderer, unpack
+from app.core.vm.instructions import Instruction, Opcode
+from app.evolution.mutation import ALL_OPS, mutate, mutate_batch
+
+
+def test_pack_round_trip():
+    """Test packing keeps opcodes and missing arguments"""
+    program = seed_turner() + [Instruction(Opcode.PUSH), Instruction(Opcode.PUSH, -1)]
+    packed = pack(program)
+    
+    assert packed.dtype == GENOME_DTYPE
+    assert packed.nbytes == 4 * len(program)
+    assert packed['arg'][2] == NO_ARG
+    assert unpack(packed) == program
+
+
+def test_mutate_batch_rate_zero_returns_same_objects():
+    """Test unmutated (and empty) genomes come back untouched"""
+    genomes = [pack(seed_wanderer()), pack([]), pack(seed_turner())]
+    out = mutate_batch(genomes, rate=0.0)
+    assert all(a is b for a, b in zip(out, genomes))
+
+
+def test_mutate_batch_produces_valid_genomes():
+    """Test every operator firing yields valid, bounded genomes"""
+    rng = np.random.default_rng(1)
+    genomes = [pack(seed_turner() * k) for k in range(1, 40)] + [pack([])]
+    out = mutate_batch(genomes, rate=10.0, max_len=12, rng=rng)
+    
+    valid = {int(op) for op in ALL_OPS}
+    for before, after in zip(genomes, out):
+        if before.size == 0:
+            assert after is before
+            continue
+        assert 1 <= after.size <= 12
+        assert set(after['op'].tolist()) <= valid
+        unpack(after)
+
+
+def test_mutate_batch_matches_scalar_rates():
+    """Test batched mutation changes genomes about as often as mutate"""
+    random.seed(3)
+    program = seed_turner() * 5
+    rate = 0.2
+    scalar = sum(mutate(program, rate) is not program for _ in range(4000))
+    
+    out = mutate_batch([pack(program)] * 4000, rate, rng=np.random.default_rng(3))
+    batched = sum(g.size != 10 or not np.array_equal(g, pack(program)) for g in out)
+    assert abs(scalar - batched) < 200
@@ -0,0 +1,105 @@
+"""
+Unit tests for the static genome optimizer
+"""
+import math
+import pytest
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.vm.batch import BatchVM
+from app.core.vm.compiler import CompiledProgram
+from app.core.vm.genome import seed_turner, seed_wanderer
+from app.core.vm.instructions import STACK_DEPTH, Instruction, Opcode
+from app.core.vm.interpreter import VMInterpreter
+from app.core.vm.optimizer import Summary, optimize
+from app.core.vm.scheduler import VMScheduler
+
+I = Instruction
+
+
+def test_unreachable_blocks_are_dropped():
+    """Test code after an unconditional jump is not emitted"""
+    program = [I(Opcode.JUMP, 3), I(Opcode.MOVE_BACK), I(Opcode.SPLIT), I(Opcode.MOVE_FWD)]
+    optimized = optimize(program)
+    
+    assert [block.start for block in optimized.reachable] == [0, 3]
+    assert "split = True" not in CompiledProgram(program).source
+
+
+def test_constants_fold_and_pairs_cancel():
+    """Test PUSH/POP pairs and constant arithmetic leave no stack traffic"""
+    program = [
+        I(Opcode.PUSH, 7), I(Opcode.POP), I(Opcode.NOOP),
+        I(Opcode.PUSH, 2), I(Opcode.PUSH, 3), I(Opcode.ADD), I(Opcode.STORE, 1),
+    ]
+    block = optimize(program).blocks[0]
+    assert block.lines == ["registers[1] = 5.0"]
+
+
+def test_constant_branch_becomes_jump():
+    """Test JUMP_IF on a folded constant has a single successor"""
+    program = [I(Opcode.PUSH, 1), I(Opcode.PUSH, 1), I(Opcode.SUB), I(Opcode.JUMP_IF, 5),
+               I(Opcode.MOVE_FWD), I(Opcode.MOVE_BACK)]
+    optimized = optimize(program)
+    
+    assert optimized.blocks[0].successors == [4]
+    assert optimized.summary == Summary(gas=6, move=-1.0, rotate=0.0, split=False)
+
+
+def test_summaries_of_seed_genomes():
+    """Test loop-free seed genomes are fully precomputed"""
+    assert optimize(seed_wanderer()).summary == Summary(2, 1.0, 0.0, False)
+    assert optimize(seed_turner()).summary == Summary(2, 1.0, 10 / 180.0 * math.pi, False)
+
+
+@pytest.mark.parametrize("program", [
+    [I(Opcode.SEE_FOOD), I(Opcode.JUMP_IF, 3), I(Opcode.MOVE_BACK), I(Opcode.MOVE_FWD)],
+    [I(Opcode.ROTATE, 1), I(Opcode.JUMP, 0)],
+    [I(Opcode.MY_ENERGY), I(Opcode.STORE, 0), I(Opcode.MOVE_FWD)],
+])
+def test_no_summary_when_outcome_depends_on_state(program):
+    """Test input-dependent branches, loops and stores are not summarized"""
+    assert optimize(program).summary is None
+
+
+def test_summary_respects_gas_budget():
+    """Test a budget shorter than the path runs the program normally"""
+    program = [I(Opcode.ROTATE, 5), I(Opcode.NOOP), I(Opcode.NOOP), I(Opcode.MOVE_FWD)]
+    for max_gas in range(6):
+        a = Entity(x=0, y=0, angle=0.5)
+        b = Entity(x=0, y=0, angle=0.5)
+        assert VMInterpreter(max_gas=max_gas).execute(a, program) == \
+            CompiledProgram(program).run(b, max_gas=max_gas)
+        assert (a.angle, a.vx, a.vy) == (b.angle, b.vx, b.vy)
+
+
+def stack_program(pushes, split):
+    """`pushes` ones, then a folded branch on 0 that lands on MOVE_BACK (unless the push was dropped)"""
+    program = [I(Opcode.PUSH, 1)] * pushes
+    if split:
+        program.append(I(Opcode.JUMP, len(program) + 1))
+    base = len(program)
+    return program + [I(Opcode.PUSH, 0), I(Opcode.JUMP_IF, base + 4), I(Opcode.MOVE_BACK),
+                      I(Opcode.JUMP, base + 5), I(Opcode.MOVE_FWD), I(Opcode.NOOP)]
+
+
+@pytest.mark.parametrize("split", [False, True])
+@pytest.mark.parametrize("pushes", [STACK_DEPTH - 2, STACK_DEPTH - 1, STACK_DEPTH, STACK_DEPTH + 3])
+def test_full_stack_paths_agree(pushes, split):
+    """Test interpreter, compiled, batch and summary agree at and past stack capacity"""
+    program = stack_program(pushes, split)
+    single, compiled = (Entity(x=100, y=100, angle=0.5, genome=program) for _ in range(2))
+    gas = VMInterpreter(max_gas=50).execute(single, program)
+    assert CompiledProgram(program).run(compiled, max_gas=50) == gas
+    assert (compiled.vx, compiled.vy) == (single.vx, single.vy)
+
+    store = EntityStore.adopt([Entity(x=100, y=100, angle=0.5, genome=program) for _ in range(3)])
+    BatchVM(max_gas=50, min_group=1).run(store)
+    assert store.vx[:3].tolist() == pytest.approx([single.vx] * 3)
+
+    summary = optimize(program).summary
+    if summary is not None:
+        assert summary.gas == 50 - gas
+        assert summary.move == math.copysign(1.0, single.vx)
+        assert VMScheduler(max_gas=50).cost(store.genome_id[0]) == 50 - gas
+    # A dropped push changes the branch, so past capacity nothing is precomputed
+    assert (summary is None) == (pushes >= STACK_DEPTH)
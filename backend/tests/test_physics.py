@@ -1,8 +1,10 @@
 """
 Unit tests for Physics Engine
 """
+import random
 import pytest
 from app.core.entity import Entity
+from app.core.entity_store import EntityStore
 from app.core.food_spawner import Food
 from app.core.physics import PhysicsEngine
 
@@ -89,3 +91,71 @@ def test_distance_to_nearest():
     assert nearest is not None
     assert nearest.id == "f3"
     assert dist < 100
+
+
+def test_integrate_matches_per_entity_path():
+    """Test batched integrator is bit-identical to update_physics/update_energy"""
+    physics = PhysicsEngine(800, 600)
+    rng = random.Random(42)
+    
+    def make(seed_rng):
+        return [
+            Entity(
+                x=seed_rng.uniform(-20, 820),
+                y=seed_rng.uniform(-20, 620),
+                vx=seed_rng.uniform(-400, 400),
+                vy=seed_rng.uniform(-400, 400),
+                radius=seed_rng.uniform(4, 12),
+                energy=seed_rng.uniform(0, 120),
+            )
+            for _ in range(200)
+        ]
+    
+    reference = make(random.Random(7))
+    batched = make(random.Random(7))
+    store = EntityStore.adopt(batched)
+    
+    for _ in range(30):
+        dt = rng.uniform(0.001, 0.5)
+        for entity in reference:
+            entity.update_physics(dt, 800, 600)
+            entity.update_energy(dt, 0.5, 0.2)
+        physics.integrate(store, dt, 0.5, 0.2)
+    
+    for ref, entity in zip(reference, batched):
+        assert (ref.x, ref.y, ref.vx, ref.vy) == (entity.x, entity.y, entity.vx, entity.vy)
+        assert ref.energy == entity.energy
+        assert ref.age == entity.age
+        assert ref.trail == entity.trail
+
+
+def test_collision_pair_separated_once():
+    """Test an overlapping pair is pushed exactly apart in one step"""
+    physics = PhysicsEngine(800, 600)
+    
+    entity1 = Entity(x=100, y=100, radius=8)
+    entity2 = Entity(x=110, y=100, radius=8)
+    
+    physics.update([entity1, entity2], [], dt=0.016)
+    
+    assert entity2.x - entity1.x == pytest.approx(16)
+    assert entity1.x == pytest.approx(97)
+    assert entity2.x == pytest.approx(113)
+
+
+def test_collision_iterations_relax_clusters():
+    """Test extra relaxation iterations reduce residual overlap"""
+    def residual(iterations):
+        physics = PhysicsEngine(800, 600, collision_iterations=iterations)
+        rng = random.Random(1)
+        entities = [Entity(x=200 + rng.uniform(-20, 20), y=200 + rng.uniform(-20, 20), radius=8)
+                    for _ in range(40)]
+        physics.update(entities, [], dt=0.016)
+        overlap = 0.0
+        for a in range(len(entities)):
+            for b in range(a + 1, len(entities)):
+                d = ((entities[a].x - entities[b].x) ** 2 + (entities[a].y - entities[b].y) ** 2) ** 0.5
+                overlap += max(0.0, 16 - d)
+        return overlap
+    
+    assert residual(8) < residual(1)
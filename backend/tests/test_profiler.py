@@ -0,0 +1,84 @@
+"""
+Unit tests for the sampled VM profiler
+"""
+import numpy as np
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.vm.instructions import Instruction, Opcode
+from app.core.vm.interpreter import VMInterpreter
+from app.core.vm.profiler import VMProfiler
+
+PROGRAM = [Instruction(Opcode.PUSH, 3), Instruction(Opcode.ROTATE, 5), Instruction(Opcode.MOVE_FWD)]
+SPINNER = [Instruction(Opcode.ROTATE, 1), Instruction(Opcode.JUMP, 0)]
+
+
+def test_sampling_rate_bounds():
+    """Test rate 0 samples nothing and rate 1 samples every genome run"""
+    store = EntityStore.adopt([Entity(x=0, y=0, genome=list(PROGRAM)) for _ in range(6)] + [Entity(x=0, y=0)])
+    rows = np.arange(7)
+    
+    assert VMProfiler(sample_rate=0.0).sample(store, rows).size == 0
+    assert VMProfiler(sample_rate=1.0).sample(store, rows).tolist() == [0, 1, 2, 3, 4, 5]
+
+
+def test_profiled_run_matches_interpreter_and_counts():
+    """Test instrumented runs behave normally and record opcodes and gas"""
+    profiler = VMProfiler(sample_rate=1.0, max_gas=10)
+    a = Entity(x=0, y=0, angle=0.5, genome=list(PROGRAM))
+    b = Entity(x=0, y=0, angle=0.5, genome=list(PROGRAM))
+    spinner = Entity(x=0, y=0, genome=list(SPINNER))
+    
+    assert profiler.run(a) == VMInterpreter(max_gas=10).execute(b, PROGRAM)
+    assert (a.angle, a.vx, a.vy) == (b.angle, b.vx, b.vy)
+    profiler.run(spinner)
+    
+    report = profiler.report()
+    assert report['op_counts'] == {'ROTATE': 6, 'JUMP': 5, 'PUSH': 1, 'MOVE_FWD': 1}
+    assert report['gas_histogram'][3] == 1 and report['gas_histogram'][10] == 1
+    assert report['exhausted'] == 1
+    assert report['top_genomes'][0]['program'] == ['ROTATE 1', 'JUMP 0']
+
+
+def test_trace_records_one_run():
+    """Test a requested trace captures pc and stack for a single run"""
+    profiler = VMProfiler()
+    entity = Entity(x=0, y=0, genome=list(PROGRAM))
+    store = EntityStore.adopt([entity])
+    assert profiler.request_trace(store, entity.id)
+    
+    assert profiler.enabled
+    assert profiler.sample(store, np.arange(1)).tolist() == [0]
+    profiler.run(entity, tick=7)
+    
+    trace = profiler.report()['trace']
+    assert trace['tick'] == 7
+    assert [(s['pc'], s['stack']) for s in trace['steps']] == [(0, []), (1, [3.0]), (2, [3.0])]
+    assert not profiler.enabled
+
+
+def test_trace_requests_are_checked_and_expire():
+    """Test unknown or genome-less targets are refused and a dead target's request lapses"""
+    profiler = VMProfiler()
+    entity = Entity(x=0, y=0, genome=list(PROGRAM))
+    store = EntityStore.adopt([entity, Entity(x=0, y=0)])
+    
+    assert not profiler.request_trace(store, 'no-such-id')
+    assert not profiler.request_trace(store, store.views[1].id)
+    assert not profiler.enabled
+    
+    # Traced even when the scheduler left it out this tick
+    assert profiler.request_trace(store, entity.id)
+    assert profiler.sample(store, np.arange(0)).tolist() == [0]
+    
+    store.remove(0)
+    assert profiler.sample(store, np.arange(store.size)).size == 0
+    assert not profiler.enabled and profiler.report()['trace'] is None
+
+
+def test_trace_endpoint_rejects_unknown_entity():
+    """Test tracing an id that is not in the world is a 404"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    with TestClient(app) as client:
+        assert client.post("/api/statistics/vm/trace/no-such-id").status_code == 404
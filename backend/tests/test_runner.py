@@ -0,0 +1,94 @@
+"""
+Unit tests for the threaded simulation runner
+"""
+import time
+from app.core.runner import Frame, FrameBuffer, SimulationRunner
+from app.core.world import World
+from app.config import settings
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def test_frame_buffer_flips():
+    """Test readers always see the most recently published frame"""
+    frames = FrameBuffer()
+    assert frames.read() is None
+    for tick in range(3):
+        frame = Frame(tick, {}, {})
+        frames.publish(frame)
+        assert frames.read() is frame
+
+
+def test_runner_ticks_and_publishes():
+    """Test the world advances on its own thread and frames are published"""
+    runner = SimulationRunner(World(), tick_rate=200, render_rate=200)
+    runner.start()
+    try:
+        assert wait_for(lambda: runner.frames.read().tick >= 5)
+        frame = runner.frames.read()
+        assert frame.state['tick'] == frame.tick
+        assert frame.statistics['population'] == frame.state['population']
+    finally:
+        runner.stop()
+    assert not runner.running
+
+
+def test_commands_apply_between_ticks():
+    """Test pause and step go through the command queue"""
+    world = World()
+    runner = SimulationRunner(world, tick_rate=200, render_rate=200)
+    runner.start()
+    try:
+        runner.submit(world.pause).result(timeout=2)
+        paused_at = world.tick
+        time.sleep(0.05)
+        assert world.tick == paused_at
+        
+        runner.submit(world.step).result(timeout=2)
+        assert wait_for(lambda: runner.frames.read().tick == paused_at + 1)
+        time.sleep(0.05)
+        assert world.tick == paused_at + 1 and world.paused
+    finally:
+        runner.stop()
+
+
+def test_turbo_outpaces_real_time():
+    """Test turbo ticks faster than the tick rate and reports its speed"""
+    world = World()
+    runner = SimulationRunner(world, tick_rate=20, render_rate=50, mode='turbo')
+    runner.start()
+    try:
+        assert wait_for(lambda: runner.ticks_per_second > 20, timeout=3.0)
+        frame = runner.frames.read()
+        assert frame.statistics['run']['mode'] == 'turbo'
+        
+        runner.submit(runner.set_mode, 'realtime').result(timeout=2)
+        assert runner.period() == runner.dt
+        assert wait_for(lambda: runner.frames.read().state['run']['mode'] == 'realtime')
+    finally:
+        runner.stop()
+    # World time per tick is the same in either mode
+    assert world.dt == 1.0 / settings.target_fps
+
+
+def test_set_mode_validates():
+    """Test unknown modes are rejected and multipliers set the turbo period"""
+    runner = SimulationRunner(World(), tick_rate=60)
+    try:
+        runner.set_mode('warp')
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+    runner.set_mode('turbo', 4)
+    assert runner.period() == runner.dt / 4
+    runner.set_mode('turbo', 0)
+    assert runner.period() == 0.0
+    runner.world.pause()
+    assert runner.period() == runner.dt
@@ -0,0 +1,77 @@
+"""
+Unit tests for the time-sliced VM scheduler
+"""
+import numpy as np
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.vm.batch import BatchVM
+from app.core.vm.compiler import genome_compiler
+from app.core.vm.genome import seed_wanderer
+from app.core.vm.instructions import Instruction, Opcode
+from app.core.vm.scheduler import VMScheduler
+
+# Loops forever, so it always costs the full gas budget
+SPINNER = [Instruction(Opcode.ROTATE, 1), Instruction(Opcode.JUMP, 0)]
+
+
+def make_store(count, genome):
+    return EntityStore.adopt([Entity(x=10, y=10, angle=0.5, genome=list(genome)) for _ in range(count)])
+
+
+def test_unlimited_budget_runs_everyone():
+    """Test a zero budget schedules every creature each tick"""
+    store = make_store(5, SPINNER)
+    scheduler = VMScheduler(budget=0)
+    
+    assert scheduler.select(store).tolist() == [0, 1, 2, 3, 4]
+    assert scheduler.stats()['avg_staleness'] == 0.0
+
+
+def test_budget_round_robins_by_staleness():
+    """Test creatures take turns and staleness stays bounded"""
+    store = make_store(10, SPINNER)
+    scheduler = VMScheduler(budget=150, max_gas=50)
+    
+    seen = []
+    for _ in range(4):
+        rows = scheduler.select(store)
+        assert rows.size == 3
+        seen.extend(rows.tolist())
+    
+    assert sorted(set(seen)) == list(range(10))
+    assert scheduler.max_staleness <= 3
+    assert scheduler.stats()['scheduled'] == 3
+
+
+def test_cost_uses_precomputed_summary():
+    """Test cheap loop-free genomes pack more creatures into the budget"""
+    store = make_store(10, seed_wanderer())
+    scheduler = VMScheduler(budget=10, max_gas=50)
+    
+    assert scheduler.cost(store.genome_id[0]) == 2
+    assert scheduler.select(store).size == 5
+
+
+def test_cost_does_not_compile():
+    """Test cost estimates leave the compiled-program cache and its counters alone"""
+    genome = [Instruction(Opcode.ROTATE, 7), Instruction(Opcode.MOVE_BACK), Instruction(Opcode.NOOP)]
+    store = make_store(1, genome)
+    before = genome_compiler.stats()
+    
+    assert VMScheduler(max_gas=50).cost(store.genome_id[0]) == 3
+    assert genome_compiler.stats() == before
+
+
+def test_unscheduled_keep_last_intent():
+    """Test creatures that do not run keep their velocity"""
+    store = make_store(4, [Instruction(Opcode.MOVE_BACK), Instruction(Opcode.SEE_FOOD), Instruction(Opcode.POP)])
+    store.vx[:4] = 7.0
+    scheduler = VMScheduler(budget=6, max_gas=50)
+    
+    rows = scheduler.select(store)
+    BatchVM(min_group=1).run(store, rows=rows)
+    
+    ran = np.zeros(4, dtype=bool)
+    ran[rows] = True
+    assert np.all(store.vx[:4][~ran] == 7.0)
+    assert np.all(store.vx[:4][ran] < 0)
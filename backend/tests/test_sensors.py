@@ -0,0 +1,111 @@
+"""
+Unit tests for the sensor stage and VM sensor opcodes
+"""
+import math
+import pytest
+import numpy as np
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.food_pool import FoodPool
+from app.core.food_spawner import Food
+from app.core.physics import PhysicsEngine
+from app.core.sensors import SensorBuffer
+from app.core.vm.instructions import Instruction, Opcode
+from app.core.vm.interpreter import VMInterpreter
+
+
+def make_world(num_entities, num_foods, seed):
+    rng = np.random.default_rng(seed)
+    entities = [
+        Entity(x=x, y=y, angle=a)
+        for x, y, a in zip(rng.uniform(10, 790, num_entities),
+                           rng.uniform(10, 590, num_entities),
+                           rng.uniform(0.1, 6.2, num_entities))
+    ]
+    foods = [
+        Food(id=f"f{i}", x=x, y=y)
+        for i, (x, y) in enumerate(zip(rng.uniform(0, 800, num_foods), rng.uniform(0, 600, num_foods)))
+    ]
+    return EntityStore.adopt(entities), FoodPool.adopt(foods)
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_nearest_food_matches_brute_force(incremental):
+    """Test expanding-ring search finds the true nearest food in range"""
+    store, pool = make_world(100, 60, seed=2)
+    physics = PhysicsEngine(800, 600, incremental_grid=incremental)
+    physics.index_foods(pool)
+    sensors = SensorBuffer(sensor_range=200.0)
+    
+    sensors.update(store, pool, physics.spatial_grid['foods'], 800, 600)
+    
+    slots = pool.active_slots()
+    for row in range(store.size):
+        d = np.hypot(pool.x[slots] - store.x[row], pool.y[slots] - store.y[row])
+        expected = min(d.min(), 200.0)
+        assert sensors.food_dist[row] == pytest.approx(expected)
+
+
+def test_food_bearing_relative_to_heading():
+    """Test bearing is measured from the creature's heading"""
+    store = EntityStore.adopt([Entity(x=100, y=100, angle=math.pi / 2)])
+    pool = FoodPool.adopt([Food(id="f1", x=130, y=100)])
+    physics = PhysicsEngine(800, 600)
+    physics.index_foods(pool)
+    sensors = SensorBuffer()
+    
+    sensors.update(store, pool, physics.spatial_grid['foods'], 800, 600)
+    
+    assert sensors.food_dist[0] == pytest.approx(30)
+    assert sensors.food_bearing[0] == pytest.approx(-math.pi / 2)
+
+
+def test_wall_distance_along_heading():
+    """Test analytic wall ray distance (to body contact)"""
+    store = EntityStore.adopt([
+        Entity(x=100, y=300, angle=math.pi, radius=8),      # facing left wall
+        Entity(x=700, y=300, angle=0.001, radius=8),        # facing right wall
+    ])
+    sensors = SensorBuffer()
+    
+    sensors.update(store, FoodPool(), PhysicsEngine(800, 600).spatial_grid['foods'], 800, 600)
+    
+    assert sensors.wall_dist[0] == pytest.approx(92)
+    assert sensors.wall_dist[1] == pytest.approx(92, rel=1e-3)
+
+
+def test_wall_distance_oblique_heading():
+    """Test the radius is taken off before projecting onto the heading"""
+    store = EntityStore.adopt([
+        Entity(x=780, y=300, angle=math.pi / 3, radius=8),  # 20 px from the right wall, cos = 0.5
+        Entity(x=700, y=520, angle=math.pi / 4, radius=8),  # bottom wall is nearer along the ray
+    ])
+    sensors = SensorBuffer()
+    
+    sensors.update(store, FoodPool(), PhysicsEngine(800, 600).spatial_grid['foods'], 800, 600)
+    
+    assert sensors.wall_dist[0] == pytest.approx(24)
+    assert sensors.wall_dist[1] == pytest.approx(72 * math.sqrt(2))
+
+
+def test_vm_reads_sensor_buffer():
+    """Test SEE_FOOD / SEE_WALL push precomputed readings"""
+    entity = Entity(x=100, y=100, angle=0.001)
+    store = EntityStore.adopt([entity])
+    pool = FoodPool.adopt([Food(id="f1", x=150, y=100)])
+    physics = PhysicsEngine(800, 600)
+    physics.index_foods(pool)
+    sensors = SensorBuffer()
+    sensors.update(store, pool, physics.spatial_grid['foods'], 800, 600)
+    
+    # Store SEE_FOOD distance in register 0, SEE_WALL in register 1
+    program = [
+        Instruction(Opcode.SEE_FOOD),
+        Instruction(Opcode.STORE, 0),
+        Instruction(Opcode.SEE_WALL),
+        Instruction(Opcode.STORE, 1),
+    ]
+    VMInterpreter(max_gas=10, sensors=sensors).execute(entity, program)
+    
+    assert entity.registers[0] == pytest.approx(50)
+    assert entity.registers[1] == pytest.approx(sensors.wall_dist[0])
@@ -0,0 +1,100 @@
+"""
+Unit tests for SQLite world snapshots
+"""
+import sqlite3
+
+import numpy as np
+
+from app.core.vm.pool import genome_pool
+from app.core.world import World
+from app.persistence.snapshots import SnapshotStore, SnapshotWriter, capture, restore
+
+
+def test_capture_is_a_copy(advance):
+    """Test a captured snapshot does not change as the world moves on"""
+    world = advance(World(), 1)
+    snapshot = capture(world)
+    x = snapshot.entities['x'].copy()
+    advance(world, 5)
+    np.testing.assert_array_equal(snapshot.entities['x'], x)
+    assert snapshot.tick == 1 and snapshot.capture_ms >= 0
+
+
+def test_round_trip_restores_world(tmp_path, advance):
+    """Test a saved snapshot restores the same creatures, foods and counters"""
+    world = advance(World())
+    store = SnapshotStore(str(tmp_path / "vivarium.db"))
+    [summary] = store.save([capture(world)])
+    assert summary['size_bytes'] > 0 and summary['write_ms'] >= 0
+    store.close()
+
+    restored = World()
+    restore(restored, SnapshotStore(str(tmp_path / "vivarium.db")).load())
+
+    n = world.store.size
+    assert restored.tick == world.tick and restored.generation == world.generation
+    assert restored.store.size == n and restored.store.next_uid >= world.store.next_uid
+    for name in ('uid', 'x', 'y', 'energy', 'age', 'trail', 'registers'):
+        np.testing.assert_array_equal(getattr(restored.store, name)[:n], getattr(world.store, name)[:n])
+    assert [e.id for e in restored.store.views] == [e.id for e in world.store.views]
+    assert [e.color for e in restored.store.views] == [e.color for e in world.store.views]
+    assert [e.genome_key for e in restored.store.views] == [e.genome_key for e in world.store.views]
+    assert sorted(f.id for f in restored.foods) == sorted(f.id for f in world.foods)
+
+    # Restored creatures keep evolving
+    advance(restored, 5)
+    assert restored.tick == world.tick + 5
+
+
+def test_restore_keeps_genome_references(advance):
+    """Test restoring takes exactly one genome reference per creature"""
+    world = advance(World(), 5)
+    snapshot = capture(world)
+    before = genome_pool.stats()['references']
+    restore(world, snapshot)
+    assert genome_pool.stats()['references'] == before
+
+
+def test_retention_keeps_newest(tmp_path):
+    """Test old snapshots are pruned, with their columns"""
+    world = World()
+    store = SnapshotStore(str(tmp_path / "vivarium.db"), retention=2)
+    for _ in range(4):
+        world.update()
+        store.save([capture(world)])
+    assert [s['tick'] for s in store.list()] == [4, 3]
+    assert store.load().tick == 4
+    (columns,) = store.conn.execute("SELECT COUNT(DISTINCT snapshot_id) FROM snapshot_columns").fetchone()
+    assert columns == 2
+    store.close()
+
+
+def test_writer_runs_in_background(tmp_path):
+    """Test submitted snapshots are written by the writer thread in WAL mode"""
+    path = str(tmp_path / "vivarium.db")
+    writer = SnapshotWriter(SnapshotStore(path), max_pending=8)
+    world = World()
+    writer.start()
+    for _ in range(3):
+        world.update()
+        assert writer.capture(world)
+    writer.close()
+
+    stats = writer.stats()
+    assert stats['written'] == 3 and stats['errors'] == 0
+    assert stats['last']['tick'] == 3 and stats['last']['size_bytes'] > 0
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    conn.close()
+
+
+def test_writer_skips_when_behind(tmp_path):
+    """Test submit never blocks: a full queue skips the snapshot"""
+    writer = SnapshotWriter(SnapshotStore(str(tmp_path / "vivarium.db")), max_pending=1)
+    world = World()
+    assert writer.capture(world)
+    assert not writer.capture(world)
+    assert writer.stats()['skipped'] == 1
+    writer.start()
+    writer.close()
+    assert writer.written == 1
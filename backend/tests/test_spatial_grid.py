@@ -2,8 +2,12 @@
 Unit tests for Spatial Grid
 """
 import pytest
+import numpy as np
 from app.core.spatial_grid import SpatialGrid
 from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.food_spawner import Food
+from app.core.food_pool import FoodPool
 
 
 def test_spatial_grid_creation():
@@ -11,79 +15,208 @@ def test_spatial_grid_creation():
     grid = SpatialGrid(cell_size=50)
     
     assert grid.cell_size == 50
-    assert len(grid.grid) == 0
+    assert len(grid['entities']) == 0
+    assert len(grid['foods']) == 0
+
+
+def test_incremental_crowded_cell_grows_alone():
+    """Test one crowded cell does not widen every other cell's storage"""
+    grid = SpatialGrid(cell_size=50, world_width=8000, world_height=8000, incremental=True)
+    layer = grid['foods']
+    empty = layer.memory()
+    rng = np.random.default_rng(5)
+    
+    # A corpse pile: thousands of foods in one cell, plus a few scattered ones
+    for slot in range(4000):
+        layer.insert(slot, 4000 + rng.uniform(0, 49), 4000 + rng.uniform(0, 49))
+    for slot in range(4000, 4100):
+        layer.insert(slot, *rng.uniform(0, 8000, 2))
+    
+    assert layer.memory() < empty + 8 * 4 * 4100
+    assert sorted(layer.get_nearby(4020, 4020).tolist()) == list(range(4000))
+    
+    # Once the pile is eaten the pool compacts back down
+    for slot in range(4000):
+        layer.remove(slot)
+    layer.compact()
+    assert layer.memory() == empty
+    assert len(layer.query_rect(0, 0, 8000, 8000)) == 100
 
 
 def test_insert_and_retrieve():
     """Test inserting objects and retrieving nearby ones"""
     grid = SpatialGrid(cell_size=50)
+    layer = grid['entities']
     
-    entity1 = Entity(x=100, y=100)
-    entity2 = Entity(x=110, y=110)
-    entity3 = Entity(x=500, y=500)
+    # Objects 0 and 1 are close together, object 2 is far away
+    layer.rebuild([100, 110, 500], [100, 110, 500])
     
-    # Insert entities
-    grid.insert(entity1, entity1.x, entity1.y)
-    grid.insert(entity2, entity2.x, entity2.y)
-    grid.insert(entity3, entity3.x, entity3.y)
+    # Get nearby objects from (100, 100)
+    nearby = set(layer.get_nearby(100, 100).tolist())
     
-    # Get nearby entities from (100, 100)
-    nearby = grid.get_nearby(100, 100)
-    
-    # Should find entity1 and entity2 (both in same area)
-    # but NOT entity3 (far away)
-    assert entity1 in nearby
-    assert entity2 in nearby
-    assert entity3 not in nearby
+    assert 0 in nearby
+    assert 1 in nearby
+    assert 2 not in nearby
 
 
 def test_clear_grid():
     """Test clearing the grid"""
     grid = SpatialGrid(cell_size=50)
     
-    entity = Entity(x=100, y=100)
-    grid.insert(entity, entity.x, entity.y)
+    grid['entities'].rebuild([100], [100])
     
-    assert len(grid.grid) > 0
+    assert len(grid['entities']) > 0
     
     grid.clear()
     
-    assert len(grid.grid) == 0
+    assert len(grid['entities']) == 0
+    assert grid['entities'].get_nearby(100, 100).size == 0
 
 
 def test_update_entities():
-    """Test rebuilding grid with entity list"""
+    """Test rebuilding grid from an entity store"""
     grid = SpatialGrid(cell_size=50)
     
-    entities = [
+    store = EntityStore.adopt([
         Entity(x=100, y=100),
         Entity(x=200, y=200),
         Entity(x=300, y=300),
-    ]
+    ])
     
-    grid.update_entities(entities)
+    grid.update_entities(store)
     
     # Grid should have entries
-    assert len(grid.grid) > 0
+    assert len(grid['entities']) == 3
     
     # Should be able to find nearby entities
-    nearby = grid.get_nearby(100, 100)
-    assert len(nearby) > 0
+    nearby = grid['entities'].get_nearby(100, 100)
+    assert nearby.tolist() == [0]
 
 
 def test_cell_boundaries():
     """Test that objects in different cells are separated"""
     grid = SpatialGrid(cell_size=50)
+    layer = grid['entities']
+    
+    # Cell (0, 0) and cell (4, 4)
+    layer.rebuild([25, 200], [25, 200])
     
-    # Create entities in different cells
-    entity1 = Entity(x=25, y=25)    # Cell (0, 0)
-    entity2 = Entity(x=200, y=200)  # Cell (4, 4)
+    # From cell (0, 0), should not find object in cell (4, 4)
+    nearby = layer.get_nearby(25, 25).tolist()
     
-    grid.insert(entity1, entity1.x, entity1.y)
-    grid.insert(entity2, entity2.x, entity2.y)
+    assert 0 in nearby
+    assert 1 not in nearby
+
+
+def test_layers_are_independent():
+    """Test foods and entities do not share cells"""
+    grid = SpatialGrid(cell_size=50)
+    
+    grid.update_entities(EntityStore.adopt([Entity(x=100, y=100)]))
+    grid.update_foods(FoodPool.adopt([Food(id="f1", x=105, y=105), Food(id="f2", x=110, y=100)]))
+    
+    assert grid['entities'].get_nearby(100, 100).tolist() == [0]
+    assert sorted(grid['foods'].get_nearby(100, 100).tolist()) == [0, 1]
+
+
+def test_batched_candidates_match_brute_force():
+    """Test batched neighborhood query against a direct cell comparison"""
+    rng = np.random.default_rng(3)
+    grid = SpatialGrid(cell_size=50, world_width=800, world_height=600)
+    layer = grid['foods']
+    
+    xs = rng.uniform(0, 800, 300)
+    ys = rng.uniform(0, 600, 300)
+    qx = rng.uniform(0, 800, 40)
+    qy = rng.uniform(0, 600, 40)
+    layer.rebuild(xs, ys)
+    
+    query_idx, items = layer.candidates(qx, qy)
+    
+    for q in range(40):
+        expected = {
+            i for i in range(300)
+            if abs(int(xs[i] // 50) - int(qx[q] // 50)) <= 1
+            and abs(int(ys[i] // 50) - int(qy[q] // 50)) <= 1
+        }
+        assert set(items[query_idx == q].tolist()) == expected
+
+
+def test_incremental_sync_relocates_only_moved():
+    """Test incremental layer only moves objects whose cell changed"""
+    grid = SpatialGrid(cell_size=50, incremental=True)
+    layer = grid['entities']
     
-    # From cell (0, 0), should not find entity in cell (4, 4)
-    nearby = grid.get_nearby(25, 25)
+    layer.sync([10, 60, 110], [10, 10, 10])
+    assert layer.stats['inserted'] == 3
     
-    assert entity1 in nearby
-    assert entity2 not in nearby
+    grid.reset_stats()
+    layer.sync([20, 60, 160], [10, 10, 10])
+    
+    assert layer.stats == {'relocated': 1, 'stationary': 2, 'inserted': 0, 'removed': 0}
+    assert sorted(layer.get_nearby(160, 10).tolist()) == [2]
+    
+    # Shrinking removes trailing objects
+    grid.reset_stats()
+    layer.sync([20], [10])
+    assert layer.stats['removed'] == 2
+    assert len(layer) == 1
+
+
+def test_incremental_matches_rebuild():
+    """Test incremental and rebuilt layers answer queries identically"""
+    rng = np.random.default_rng(11)
+    rebuilt = SpatialGrid(cell_size=50)['entities']
+    incremental = SpatialGrid(cell_size=50, incremental=True)['entities']
+    
+    xs = rng.uniform(0, 800, 200)
+    ys = rng.uniform(0, 600, 200)
+    for _ in range(5):
+        xs = np.clip(xs + rng.normal(0, 20, xs.size), 0, 800)
+        ys = np.clip(ys + rng.normal(0, 20, ys.size), 0, 600)
+        rebuilt.rebuild(xs, ys)
+        incremental.sync(xs, ys)
+        
+        q_a, i_a = rebuilt.candidates(xs, ys)
+        q_b, i_b = incremental.candidates(xs, ys)
+        assert sorted(zip(q_a.tolist(), i_a.tolist())) == sorted(zip(q_b.tolist(), i_b.tolist()))
+
+
+def test_incremental_food_insert_and_remove():
+    """Test foods are inserted once and removed by pool slot"""
+    grid = SpatialGrid(cell_size=50, incremental=True)
+    pool = FoodPool()
+    slot = pool.add(Food(id="f1", x=100, y=100))
+    
+    grid.update_foods(pool)
+    grid.update_foods(pool)
+    
+    assert grid['foods'].stats['inserted'] == 1
+    assert grid['foods'].get_nearby(100, 100).tolist() == [slot]
+    
+    grid.remove_foods([slot])
+    
+    assert len(grid['foods']) == 0
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_half_pairs_lists_each_pair_once(incremental):
+    """Test forward-cell broad phase yields every neighboring pair exactly once"""
+    rng = np.random.default_rng(5)
+    layer = SpatialGrid(cell_size=50, incremental=incremental)['entities']
+    xs = rng.uniform(0, 800, 250)
+    ys = rng.uniform(0, 600, 250)
+    layer.rebuild(xs, ys)
+    
+    i, j = layer.half_pairs()
+    
+    pairs = [tuple(sorted(p)) for p in zip(i.tolist(), j.tolist())]
+    assert len(pairs) == len(set(pairs))
+    assert all(a != b for a, b in pairs)
+    
+    cx, cy = (xs // 50).astype(int), (ys // 50).astype(int)
+    expected = {
+        (a, b) for a in range(250) for b in range(a + 1, 250)
+        if abs(cx[a] - cx[b]) <= 1 and abs(cy[a] - cy[b]) <= 1
+    }
+    assert set(pairs) == expected
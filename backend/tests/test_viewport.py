@@ -0,0 +1,83 @@
+"""
+Unit tests for viewport subscriptions (culling, incremental panning, tiles)
+"""
+import numpy as np
+import pytest
+
+from app.core import wire
+from app.core.viewport import Viewport, ViewStream, index_world
+from app.core.wire import apply_delta, decode_state
+from app.core.world import World
+
+
+def test_parse_validates():
+    """Test viewport parameters are checked before subscribing"""
+    viewport = Viewport.parse({'x': 0, 'y': '10', 'width': 200, 'height': 100, 'zoom': 1})
+    assert viewport == Viewport(0.0, 10.0, 200.0, 100.0, 1.0)
+    for params in ({'x': 0}, {'x': 0, 'y': 0, 'width': -1, 'height': 1, 'zoom': 1},
+                   {'x': 'nan', 'y': 0, 'width': 1, 'height': 1, 'zoom': 1}):
+        with pytest.raises(ValueError):
+            Viewport.parse(params)
+
+
+def test_query_rect_covers_rectangle():
+    """Test a rectangle query returns every object inside it"""
+    world = World()
+    index_world(world)
+    store = world.store
+    found = set(world.physics.spatial_grid['entities'].query_rect(100, 50, 400, 300).tolist())
+    x, y = store.x[:store.size], store.y[:store.size]
+    inside = np.flatnonzero((x >= 100) & (x <= 400) & (y >= 50) & (y <= 300))
+    assert set(inside.tolist()) <= found
+
+
+def test_cull_matches_brute_force():
+    """Test a view holds exactly the objects inside its bounds"""
+    world = World()
+    world.update()
+    index_world(world)
+    view = ViewStream(Viewport(100, 100, 300, 200, 1.0), margin=20)
+    entities, foods = view.cull(world)
+
+    x0, y0, x1, y1 = view.bounds()
+    store, pool = world.store, world.foods
+    x, y = store.x[:store.size], store.y[:store.size]
+    rows = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+    assert sorted(entities['id'].tolist()) == sorted(store.uid[rows].tolist())
+
+    slots = pool.active_slots()
+    inside = (pool.x[slots] >= x0) & (pool.x[slots] <= x1) & (pool.y[slots] >= y0) & (pool.y[slots] <= y1)
+    assert sorted(foods['id'].tolist()) == sorted(slots[inside].tolist())
+
+
+def test_panning_sends_delta():
+    """Test moving the viewport adds and removes objects instead of a new keyframe"""
+    world = World()
+    index_world(world)
+    view = ViewStream(Viewport(0, 0, 300, 300, 1.0), margin=0)
+    keyframe = decode_state(view.encode(world)[0])
+    assert keyframe['kind'] == 'keyframe'
+    assert keyframe['population'] == world.store.size
+
+    view.viewport = Viewport(250, 250, 300, 300, 1.0)
+    frame, base = view.encode(world)
+    delta = decode_state(frame)
+    assert delta['kind'] == 'delta' and frame is not base
+    assert delta['removed'].any() or delta['added']['id'].size
+
+    state = apply_delta(keyframe, delta)
+    expected, _ = view.cull(world)
+    assert sorted(state['entities']['id'].tolist()) == sorted(expected['id'].tolist())
+
+
+def test_zoomed_out_sends_tiles():
+    """Test a zoomed-out view gets density tiles covering its objects"""
+    world = World()
+    index_world(world)
+    view = ViewStream(Viewport(0, 0, world.width, world.height, 0.1), tile_zoom=0.25)
+    frame, base = view.encode(world)
+    tiles = decode_state(frame)
+    assert frame is base and tiles['kind'] == 'tiles'
+    assert tiles['tiles']['entities'].sum() == world.store.size
+    assert tiles['tiles']['foods'].sum() == len(world.foods)
+    assert len(frame) < len(wire.encode_state(world))
@@ -0,0 +1,206 @@
+"""
+Unit tests for the genome VM (interpreter and compiler)
+"""
+import random
+import pytest
+import numpy as np
+from app.core.entity import Entity
+from app.core.entity_store import EntityStore
+from app.core.sensors import SensorBuffer
+from app.core.vm.batch import BatchVM
+from app.core.vm.compiler import CompiledProgram, GenomeCompiler
+from app.core.vm.optimizer import basic_blocks
+from app.core.vm.genome import seed_turner, seed_wanderer
+from app.core.vm.instructions import REGISTER_COUNT, STACK_DEPTH, Instruction, Opcode
+from app.core.vm.interpreter import VMInterpreter
+from app.evolution.mutation import ALL_OPS
+
+
+def random_program(rng, length):
+    return [
+        Instruction(rng.choice(ALL_OPS), rng.choice([None, 0, 1, 2, 5, -3, 10, 45, rng.randint(-20, 20)]))
+        for _ in range(length)
+    ]
+
+
+def run_both(program, max_gas, energy=42.0):
+    """Run a program through the interpreter and the compiler on twin creatures"""
+    a = Entity(x=100, y=100, energy=energy, angle=0.5)
+    b = Entity(x=100, y=100, energy=energy, angle=0.5)
+    a.registers[3] = 1.5
+    b.registers[3] = 1.5
+    gas_a = VMInterpreter(max_gas=max_gas).execute(a, program)
+    gas_b = CompiledProgram(program).run(b, max_gas=max_gas)
+    return (gas_a, a), (gas_b, b)
+
+
+def test_seed_genomes_move():
+    """Test seed genomes drive velocity through the VM"""
+    entity = Entity(x=100, y=100, angle=0.0001)
+    VMInterpreter().execute(entity, seed_wanderer())
+    assert entity.vx == pytest.approx(30.0, rel=1e-3)
+    
+    turner = Entity(x=100, y=100, angle=0.0001)
+    CompiledProgram(seed_turner()).run(turner)
+    assert turner.angle == pytest.approx(0.0001 + 10 / 180 * 3.141592653589793)
+
+
+def test_basic_blocks_split_at_jumps():
+    """Test block boundaries at jump targets and after branches"""
+    program = [
+        Instruction(Opcode.PUSH, 1),
+        Instruction(Opcode.JUMP_IF, 3),
+        Instruction(Opcode.MOVE_BACK),
+        Instruction(Opcode.MOVE_FWD),
+        Instruction(Opcode.JUMP, 0),
+    ]
+    assert basic_blocks(program) == [(0, 2), (2, 3), (3, 5)]
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_compiled_matches_interpreter(seed):
+    """Test compiled programs behave exactly like the interpreter"""
+    rng = random.Random(seed)
+    program = random_program(rng, rng.randint(0, 30))
+    max_gas = rng.choice([0, 1, 3, 7, 50])
+    
+    (gas_a, a), (gas_b, b) = run_both(program, max_gas)
+    
+    assert gas_a == gas_b
+    assert (a.angle, a.vx, a.vy) == (b.angle, b.vx, b.vy)
+    assert a.registers.tolist() == b.registers.tolist()
+    assert a.__dict__.get("_vm_split") == b.__dict__.get("_vm_split")
+
+
+def test_loop_runs_out_of_gas_mid_block():
+    """Test an infinite loop stops exactly when gas is exhausted"""
+    program = [
+        Instruction(Opcode.ROTATE, 1),
+        Instruction(Opcode.ROTATE, 1),
+        Instruction(Opcode.ROTATE, 1),
+        Instruction(Opcode.JUMP, 0),
+    ]
+    (gas_a, a), (gas_b, b) = run_both(program, max_gas=10)
+    
+    assert gas_a == gas_b == 0
+    assert a.angle == b.angle
+
+
+def test_compiler_cache_counters():
+    """Test LRU cache hits, misses and evictions"""
+    compiler = GenomeCompiler(capacity=2)
+    p1, p2, p3 = seed_wanderer(), seed_turner(), [Instruction(Opcode.NOOP)]
+    
+    first = compiler.get(p1)
+    assert compiler.get(list(p1)) is first
+    compiler.get(p2)
+    compiler.get(p1)      # p1 becomes most recently used
+    compiler.get(p3)      # evicts p2
+    
+    assert compiler.stats() == {'size': 2, 'capacity': 2, 'hits': 2, 'misses': 3, 'evictions': 1}
+    compiler.get(p2)
+    assert compiler.misses == 4
+
+
+def twin_stores(lanes, seed):
+    """Two identical stores of creatures with varied energy and registers"""
+    stores = []
+    for _ in range(2):
+        rng = random.Random(seed)
+        entities = []
+        for i in range(lanes):
+            entity = Entity(x=100 + i, y=100, energy=rng.uniform(0, 100), angle=rng.uniform(0.1, 6.0))
+            entity.registers[3] = rng.choice([0.0, 1.5, -2.0])
+            entities.append(entity)
+        stores.append(EntityStore.adopt(entities))
+    return stores
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_batch_matches_interpreter(seed):
+    """Test lockstep execution matches running each creature alone"""
+    rng = random.Random(seed)
+    program = random_program(rng, rng.randint(0, 30))
+    max_gas = rng.choice([0, 1, 3, 7, 50])
+    single, batched = twin_stores(12, seed)
+    sensors = SensorBuffer()
+    sensors.food_dist = np.linspace(0, 200, 12)
+    sensors.food_bearing = np.linspace(-3, 3, 12)
+    sensors.wall_dist = np.linspace(50, 5, 12)
+    
+    vm = VMInterpreter(max_gas=max_gas, sensors=sensors)
+    expected = [vm.execute(entity, program) for entity in single.views]
+    gas = BatchVM(max_gas=max_gas).run_group(program, np.arange(12), batched, sensors)
+    
+    assert gas.tolist() == expected
+    for a, b in zip(single.views, batched.views):
+        assert a.angle == b.angle
+        assert (a.vx, a.vy) == pytest.approx((b.vx, b.vy), abs=1e-9)
+        assert a.registers.tolist() == b.registers.tolist()
+        assert a.__dict__.get("_vm_split") == b.__dict__.get("_vm_split")
+
+
+def test_batch_lanes_diverge_on_jump_if():
+    """Test lanes take different branches based on their own energy"""
+    program = [
+        Instruction(Opcode.MY_ENERGY),
+        Instruction(Opcode.PUSH, 50),
+        Instruction(Opcode.CMP),
+        Instruction(Opcode.PUSH, 1),
+        Instruction(Opcode.ADD),
+        Instruction(Opcode.JUMP_IF, 7),    # energy >= 50 -> forward
+        Instruction(Opcode.MOVE_BACK),
+        Instruction(Opcode.MOVE_FWD),
+    ]
+    store = EntityStore.adopt([Entity(x=100, y=100, energy=e, angle=0.0001) for e in (10, 90, 20, 80)])
+    BatchVM().run_group(program, np.arange(4), store)
+    
+    # Low-energy lanes fall through MOVE_BACK then MOVE_FWD, so every lane ends forward
+    assert np.all(store.vx[:4] > 0)
+    
+    program[7] = Instruction(Opcode.NOOP)
+    store.vx[:4] = 0.0
+    BatchVM().run_group(program, np.arange(4), store)
+    assert store.vx[:4].tolist() == pytest.approx([-30.0, 0.0, -30.0, 0.0], abs=1e-3)
+
+
+def test_batch_small_groups_use_fallback():
+    """Test genome groups below min_group run through the fallback"""
+    store = EntityStore.adopt(
+        [Entity(x=10, y=10, genome=seed_wanderer()) for _ in range(3)]
+        + [Entity(x=10, y=10, genome=seed_turner()) for _ in range(5)]
+    )
+    seen = []
+    BatchVM(min_group=4).run(store, fallback=seen.append)
+    
+    assert len(seen) == 3
+    assert all(e.genome_key == store.views[0].genome_key for e in seen)
+
+
+def test_registers_wrap_and_stack_is_bounded():
+    """Test register addresses wrap modulo the file size and full-stack pushes are dropped"""
+    program = [Instruction(Opcode.PUSH, 7), Instruction(Opcode.STORE, REGISTER_COUNT + 2)]
+    entity = Entity(x=0, y=0)
+    VMInterpreter().execute(entity, program)
+    assert entity.registers[2] == 7.0
+    
+    # Fill the stack past capacity, then pop everything into register 0
+    program = [Instruction(Opcode.PUSH, k) for k in range(STACK_DEPTH + 4)]
+    program += [Instruction(Opcode.ADD)] * (STACK_DEPTH - 1) + [Instruction(Opcode.STORE, 0)]
+    expected = float(sum(range(STACK_DEPTH)))
+    for runner in (VMInterpreter(max_gas=100).execute, lambda e, p: CompiledProgram(p).run(e, max_gas=100)):
+        entity = Entity(x=0, y=0)
+        runner(entity, program)
+        assert entity.registers[0] == expected
+
+
+def test_registers_live_in_store_rows():
+    """Test register files move with their rows and survive detaching"""
+    entities = [Entity(x=0, y=0) for _ in range(3)]
+    for k, entity in enumerate(entities):
+        entity.registers[1] = k + 1.0
+    store = EntityStore.adopt(entities)
+    
+    store.remove(0)
+    assert store.registers[:2, 1].tolist() == [3.0, 2.0]
+    assert entities[0].registers[1] == 1.0
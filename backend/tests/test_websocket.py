@@ -0,0 +1,217 @@
+"""
+Unit tests for per-client WebSocket fan-out and command handling
+"""
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.websocket import Client, ConnectionManager, RateLimiter, parse_command
+from app.core.runner import Frame, SimulationRunner
+from app.core.world import World
+
+
+class FakeSocket:
+    """Records sends; `gate` holds every send until it is set"""
+
+    def __init__(self):
+        self.sent = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.client = None
+        self.closed = None
+
+    async def accept(self):
+        pass
+
+    async def close(self, code=1000, reason=None):
+        self.closed = code
+
+    async def _send(self, data):
+        await self.gate.wait()
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        await self._send(data)
+
+    async def send_text(self, data):
+        await self._send(data)
+
+    async def send_json(self, data):
+        await self._send(data)
+
+
+def make_frame(tick, keyframe):
+    binary = keyframe if tick % 10 == 0 else f"delta{tick}".encode()
+    return Frame(tick, {'tick': tick}, {}, binary, keyframe)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_slow_client_gets_latest_frame():
+    """Test frames queued behind a blocked send are replaced, not buffered"""
+    socket = FakeSocket()
+    client = Client(socket, 'binary')
+    client.start()
+    socket.gate.clear()
+
+    key = b"key0"
+    for tick in range(1, 6):
+        assert client.offer(make_frame(tick, key))
+        await settle()
+    socket.gate.set()
+    await settle()
+    client.stop()
+
+    # Frame 1 (after its keyframe) was in flight; 2-4 were dropped for 5
+    assert socket.sent == [key, b"delta1", b"delta5"]
+    assert client.dropped == 3 and client.sent == 2
+
+
+@pytest.mark.asyncio
+async def test_control_messages_are_never_dropped():
+    """Test control messages all arrive, ahead of the pending frame"""
+    socket = FakeSocket()
+    client = Client(socket, 'json')
+    client.start()
+    client.offer(make_frame(1, b""), "frame")
+    client.send({'type': 'status', 'n': 1})
+    client.send({'type': 'status', 'n': 2})
+    await settle()
+    client.stop()
+    assert socket.sent == [{'type': 'status', 'n': 1}, {'type': 'status', 'n': 2}, "frame"]
+
+
+@pytest.mark.asyncio
+async def test_persistently_slow_client_is_evicted():
+    """Test a client that keeps missing frames is disconnected by policy"""
+    manager = ConnectionManager(max_dropped=3)
+    slow, fast = FakeSocket(), FakeSocket()
+    await manager.connect(slow, 'binary')
+    await manager.connect(fast, 'binary')
+    slow.gate.clear()
+
+    for tick in range(1, 7):
+        manager.broadcast_frame(make_frame(tick, b"key0"))
+        await settle()
+
+    assert slow not in manager.clients and fast in manager.clients
+    assert slow.closed == 1013 and manager.evicted == 1
+    assert fast.sent[-1] == b"delta6"
+    stats = manager.stats()
+    assert stats['connections'] == 1 and stats['clients'][0]['frames_dropped'] == 0
+    manager.disconnect(fast)
+
+
+@pytest.mark.asyncio
+async def test_json_serialized_once():
+    """Test every JSON client receives the same serialized text"""
+    manager = ConnectionManager()
+    sockets = [FakeSocket() for _ in range(3)]
+    for socket in sockets:
+        await manager.connect(socket, 'json')
+    frame = make_frame(1, b"")
+    frame.state.update(entities=[], foods=[])
+    manager.broadcast_frame(frame)
+    await settle()
+    texts = [socket.sent[0] for socket in sockets]
+    assert texts[0] == '{"type": "world_state", "tick": 1, "entities": [], "foods": []}'
+    assert all(text is texts[0] for text in texts)
+    for socket in sockets:
+        manager.disconnect(socket)
+
+
+@pytest.mark.asyncio
+async def test_json_client_skips_frames_without_objects():
+    """Test a JSON client joining after frames were published never gets an empty world"""
+    runner = SimulationRunner(World())
+    runner._publish()
+    manager = ConnectionManager()
+    viewer, binary = FakeSocket(), FakeSocket()
+    await manager.connect(viewer, 'json')
+    await manager.connect(binary, 'binary')
+    runner.json_clients += 1
+
+    manager.broadcast_frame(runner.frames.read())
+    await settle()
+    assert viewer.sent == [] and binary.sent == [runner.frames.read().keyframe]
+
+    runner._publish()
+    manager.broadcast_frame(runner.frames.read())
+    await settle()
+    state = json.loads(viewer.sent[0])
+    assert len(state['entities']) == runner.world.store.size and 'foods' in state
+    manager.disconnect(viewer)
+    manager.disconnect(binary)
+
+
+def test_parse_command_validates():
+    """Test malformed, unknown and over-specified commands are refused"""
+    assert parse_command('{"type": "command", "command": "pause"}') == ('pause', {})
+    assert parse_command(
+        '{"type": "command", "command": "set_speed", "params": {"mode": "turbo"}}'
+    ) == ('set_speed', {'mode': 'turbo'})
+    for text in ('not json', '[]', '{"type": "command", "command": "explode"}',
+                 '{"type": "command", "command": "pause", "params": {"x": 1}}',
+                 None, '{"type": "command", "command": "pause"}' + ' ' * 5000):
+        with pytest.raises(ValueError):
+            parse_command(text)
+
+
+def test_rate_limiter_allows_bursts():
+    """Test a client may send a burst, then is held to the sustained rate"""
+    limiter = RateLimiter(rate=1.0, burst=3)
+    assert [limiter.allow() for _ in range(4)] == [True, True, True, False]
+    limiter.updated -= 1.0
+    assert limiter.allow() and not limiter.allow()
+
+
+@pytest.mark.asyncio
+async def test_duplicate_controls_coalesce():
+    """Test concurrent identical controls run once and broadcast one status"""
+    runner = SimulationRunner(World())
+    manager = ConnectionManager()
+    socket = FakeSocket()
+    await manager.connect(socket, 'json')
+
+    requests = [asyncio.create_task(manager.control(runner, 'pause')) for _ in range(3)]
+    await settle()
+    assert runner._commands.qsize() == 1
+    runner._apply_commands()
+    assert await asyncio.gather(*requests) == [True, True, True]
+    await settle()
+    assert socket.sent == [{'type': 'status', 'message': 'Simulation paused', 'paused': True}]
+
+    # Pausing again changes nothing, so nothing is broadcast
+    request = asyncio.create_task(manager.control(runner, 'pause'))
+    await settle()
+    runner._apply_commands()
+    assert not await request
+    await settle()
+    assert len(socket.sent) == 1
+    manager.disconnect(socket)
+
+
+def test_invalid_command_keeps_connection():
+    """Test a bad message gets an error status and the client stays connected"""
+    from app.main import app
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws?format=binary") as ws:
+            assert ws.receive_json()['type'] == 'hello'
+            ws.send_text('not json')
+            while True:
+                message = ws.receive()
+                if 'text' in message and message['text']:
+                    assert 'Invalid command' in json.loads(message['text'])['message']
+                    break
+            ws.send_json({'type': 'command', 'command': 'get_statistics'})
+            while True:
+                message = ws.receive()
+                if 'text' in message and message['text']:
+                    assert json.loads(message['text'])['type'] == 'statistics'
+                    break
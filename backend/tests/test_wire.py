@@ -0,0 +1,145 @@
+"""
+Unit tests for the binary world state frames (keyframes and deltas)
+"""
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import wire
+from app.core.wire import DeltaEncoder, apply_delta, decode_state
+from app.core.entity_store import PALETTE
+from app.core.world import World
+
+
+def test_round_trip_matches_world():
+    """Test a decoded frame carries the world's columns and counters"""
+    world = World()
+    world.update()
+    world.pause()
+    frame = wire.decode_state(wire.encode_state(world, {'mode': 'turbo', 'multiplier': 4.0}))
+
+    n = world.store.size
+    assert frame['tick'] == world.tick and frame['paused']
+    assert frame['population'] == n and frame['food_count'] == len(world.foods)
+    assert frame['run']['mode'] == 'turbo' and frame['run']['multiplier'] == 4.0
+    assert frame['palette'] == PALETTE
+
+    entities = frame['entities']
+    assert entities['id'].tolist() == world.store.uid[:n].tolist()
+    np.testing.assert_allclose(entities['x'], world.store.x[:n], rtol=1e-6)
+    np.testing.assert_allclose(entities['energy'], world.store.energy[:n], rtol=1e-6)
+    assert entities['color'].tolist() == world.store.color[:n].tolist()
+
+    slots = world.foods.active_slots()
+    assert frame['foods']['id'].tolist() == slots.tolist()
+    np.testing.assert_allclose(frame['foods']['y'], world.foods.y[slots], rtol=1e-6)
+
+
+def test_columns_are_aligned():
+    """Test every column starts on a 4-byte boundary (zero-copy typed arrays)"""
+    world = World()
+    data = wire.encode_state(world)
+    frame = wire.decode_state(data)
+    base = np.frombuffer(data, 'u1').ctypes.data
+    for columns in (frame['entities'], frame['foods']):
+        for column in columns.values():
+            assert (column.ctypes.data - base) % 4 == 0
+    assert len(data) % 4 == 0
+
+
+def test_rejects_unknown_version():
+    """Test frames from a different protocol version are refused"""
+    data = bytearray(wire.encode_state(World()))
+    data[4] = wire.VERSION + 1
+    with pytest.raises(ValueError):
+        wire.decode_state(bytes(data))
+
+
+def reconstruct(world, state):
+    """Rows of a decoded state in the world's store order"""
+    n = world.store.size
+    rows = dict(zip(state['entities']['id'].tolist(), range(n)))
+    assert len(rows) == n
+    return [rows[uid] for uid in world.store.uid[:n].tolist()]
+
+
+def test_deltas_reconstruct_world():
+    """Test keyframe + delta matches the world within quantization error"""
+    world = World()
+    encoder = DeltaEncoder(keyframe_interval=1000)
+    world.update()
+    keyframe = decode_state(encoder.encode(world)[0])
+    assert keyframe['kind'] == 'keyframe'
+
+    eaten = world.foods.active_slots()[:1]
+    world.foods.remove_many(eaten)
+    for _ in range(30):
+        world.update()
+        frame, base = encoder.encode(world)
+    delta = decode_state(frame)
+    assert delta['kind'] == 'delta' and delta['keyframe'] == keyframe['sequence']
+    assert len(frame) < len(base)
+    assert delta['foods_removed'].sum() >= 1
+
+    state = apply_delta(keyframe, delta)
+    n = world.store.size
+    rows = reconstruct(world, state)
+    width, height = world.width, world.height
+    np.testing.assert_allclose(state['entities']['x'][rows], world.store.x[:n], atol=width / 65535)
+    np.testing.assert_allclose(state['entities']['y'][rows], world.store.y[:n], atol=height / 65535)
+    np.testing.assert_allclose(state['entities']['energy'][rows], world.store.energy[:n], atol=1 / 64)
+    assert sorted(state['foods']['id'].tolist()) == world.foods.active_slots().tolist()
+
+
+def test_skipped_deltas_still_apply():
+    """Test any delta applies to its keyframe alone, and keyframes recur"""
+    world = World()
+    encoder = DeltaEncoder(keyframe_interval=10)
+    keyframe = decode_state(encoder.encode(world)[0])
+    for _ in range(5):
+        world.update()
+        encoder.encode(world)
+    world.update()
+    state = apply_delta(keyframe, decode_state(encoder.encode(world)[0]))
+    assert state['entities']['id'].size == world.store.size
+
+    for _ in range(4):
+        world.update()
+        frame, base = encoder.encode(world)
+    assert world.tick == 10 and frame is base and decode_state(frame)['kind'] == 'keyframe'
+    with pytest.raises(ValueError):
+        apply_delta(keyframe, decode_state(encoder.encode(world)[0]))
+
+
+def test_reset_forces_keyframe():
+    """Test rewinding the tick (world reset) starts a new keyframe"""
+    world = World()
+    encoder = DeltaEncoder(keyframe_interval=100)
+    world.update()
+    encoder.encode(world)
+    world.reset()
+    frame, base = encoder.encode(world)
+    assert frame is base
+
+
+def test_websocket_negotiates_format():
+    """Test binary clients get wire frames and JSON clients get objects"""
+    from app.main import app
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws?format=binary") as ws:
+            assert ws.receive_json() == {'type': 'hello', 'format': 'binary', 'version': wire.VERSION}
+            frame = wire.decode_state(ws.receive_bytes())
+            assert frame['kind'] == 'keyframe' and frame['world_width'] > 0
+            
+            ws.send_json({'type': 'command', 'command': 'keyframe'})
+            while True:
+                data = ws.receive_bytes()
+                if wire.decode_state(data)['kind'] == 'keyframe':
+                    break
+
+        with client.websocket_connect("/ws") as ws:
+            assert ws.receive_json()['format'] == 'json'
+            state = ws.receive_json()
+            assert state['type'] == 'world_state'
+            assert len(state['entities']) == state['population']
@@ -4,6 +4,7 @@
 
 class Dashboard {
     constructor() {
+        this.turbo = false;
         this.initializeControls();
     }
 
@@ -29,6 +30,11 @@ class Dashboard {
                 vivariumWS.sendCommand('reset');
             }
         });
+
+        // Turbo toggle (as fast as the server can tick)
+        document.getElementById('btn-turbo').addEventListener('click', () => {
+            vivariumWS.sendCommand('set_speed', { mode: this.turbo ? 'realtime' : 'turbo' });
+        });
     }
 
     updateStatistics(data) {
@@ -53,13 +59,20 @@ class Dashboard {
         }
 
         // Update average energy
-        if (data.entities && data.entities.length > 0) {
-            const avgEnergy = data.entities.reduce((sum, e) => sum + e.energy, 0) / data.entities.length;
+        if (data.entities && data.entities.count > 0) {
+            const avgEnergy = data.entities.energy.reduce((sum, e) => sum + e, 0) / data.entities.count;
             document.getElementById('stat-energy').textContent = avgEnergy.toFixed(1);
-        } else {
+        } else if (data.entities) {
             document.getElementById('stat-energy').textContent = '0.0';
         }
 
+        // Update run mode and achieved speed
+        if (data.run !== undefined) {
+            this.turbo = data.run.mode === 'turbo';
+            document.getElementById('btn-turbo').textContent = this.turbo ? '⏵ Real Time' : '⏩ Turbo';
+            document.getElementById('stat-tps').textContent = Math.round(data.run.ticks_per_second);
+        }
+
         // Update status
         const statusEl = document.getElementById('stat-status');
         if (data.paused !== undefined) {
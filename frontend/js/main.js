@@ -15,6 +15,11 @@ vivariumWS.on('world_state', (data) => {
     dashboard.updateStatistics(data);
 });
 
+vivariumWS.on('hello', () => {
+    // Resume the viewport subscription after a reconnect
+    sendViewport(window.p5Instance);
+});
+
 vivariumWS.on('status', (data) => {
     console.log('Status update:', data.message);
     
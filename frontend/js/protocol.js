@@ -0,0 +1,265 @@
+/**
+ * World state decoding for VIVARIUM ZERO
+ * Binary frames (see backend/app/core/wire.py) are read into typed arrays
+ * without copying; JSON world states are converted to the same layout.
+ * Delta frames are applied on top of the keyframe they name; tile frames
+ * carry object counts per tile (zoomed-out viewports).
+ */
+
+const WIRE_MAGIC = 'VZST';
+const WIRE_VERSION = 3;
+const WIRE_HEADER_SIZE = 56;
+const RUN_MODES = ['realtime', 'turbo'];
+const FRAME_KINDS = ['keyframe', 'delta', 'tiles'];
+const ENERGY_SCALE = 64;
+
+const ENTITY_FIELDS = [
+    ['id', Uint32Array],
+    ['x', Float32Array],
+    ['y', Float32Array],
+    ['angle', Float32Array],
+    ['radius', Float32Array],
+    ['energy', Float32Array],
+    ['max_energy', Float32Array],
+    ['color', Uint8Array]
+];
+
+const FOOD_FIELDS = [
+    ['id', Uint32Array],
+    ['x', Float32Array],
+    ['y', Float32Array],
+    ['radius', Float32Array],
+    ['color', Uint8Array]
+];
+
+// Quantized fields of creatures changed since the keyframe
+const CHANGED_FIELDS = [
+    ['x', Uint16Array],
+    ['y', Uint16Array],
+    ['energy', Uint16Array],
+    ['angle', Uint8Array]
+];
+
+function align4(offset) {
+    return (offset + 3) & ~3;
+}
+
+function readColumns(buffer, offset, fields, count) {
+    const columns = { count: count };
+    for (const [name, ArrayType] of fields) {
+        columns[name] = new ArrayType(buffer, offset, count);
+        offset = align4(offset + count * ArrayType.BYTES_PER_ELEMENT);
+    }
+    return [columns, offset];
+}
+
+function readBits(buffer, offset, count) {
+    const bytes = new Uint8Array(buffer, offset, (count + 7) >> 3);
+    return [bytes, align4(offset + bytes.length)];
+}
+
+function bitSet(bits, i) {
+    return (bits[i >> 3] >> (i & 7)) & 1;
+}
+
+/**
+ * Decode a binary world state frame; returns null for unknown versions
+ * (keyframes carry `entities`/`foods`, deltas the changes, tile frames `tiles`)
+ */
+function decodeWorldState(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(
+        view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3)
+    );
+    const version = view.getUint16(4, true);
+    if (magic !== WIRE_MAGIC || version !== WIRE_VERSION) {
+        console.error(`Unsupported world state frame (${magic} v${version})`);
+        return null;
+    }
+
+    const flags = view.getUint16(6, true);
+    const entityCount = view.getUint32(28, true);
+    const foodCount = view.getUint32(32, true);
+    const paletteSize = view.getUint16(46, true);
+
+    let offset = WIRE_HEADER_SIZE;
+    const palette = [];
+    for (let i = 0; i < paletteSize; i++) {
+        const at = offset + i * 3;
+        palette.push([view.getUint8(at), view.getUint8(at + 1), view.getUint8(at + 2)]);
+    }
+    offset = align4(offset + paletteSize * 3);
+
+    const state = {
+        type: 'world_state',
+        kind: FRAME_KINDS[view.getUint8(45)],
+        sequence: view.getUint32(48, true),
+        keyframe: view.getUint32(52, true),
+        tick: Number(view.getBigUint64(8, true)),
+        generation: view.getUint32(16, true),
+        world_width: view.getUint32(20, true),
+        world_height: view.getUint32(24, true),
+        population: entityCount,
+        food_count: foodCount,
+        paused: (flags & 1) !== 0,
+        run: {
+            mode: RUN_MODES[view.getUint8(44)],
+            multiplier: view.getFloat32(40, true),
+            ticks_per_second: view.getFloat32(36, true)
+        },
+        palette: palette
+    };
+
+    if (state.kind === 'keyframe') {
+        const frameEntities = view.getUint32(offset, true);
+        const frameFoods = view.getUint32(offset + 4, true);
+        offset += 8;
+        [state.entities, offset] = readColumns(buffer, offset, ENTITY_FIELDS, frameEntities);
+        [state.foods, offset] = readColumns(buffer, offset, FOOD_FIELDS, frameFoods);
+        return state;
+    }
+
+    if (state.kind === 'tiles') {
+        const cols = view.getUint32(offset + 12, true);
+        const rows = view.getUint32(offset + 16, true);
+        const tiles = {
+            x: view.getFloat32(offset, true),
+            y: view.getFloat32(offset + 4, true),
+            size: view.getFloat32(offset + 8, true),
+            cols: cols,
+            rows: rows
+        };
+        offset += 20;
+        // Counts are column-major: tile (i, j) is at i * rows + j
+        tiles.entities = new Uint16Array(buffer, offset, cols * rows);
+        offset = align4(offset + cols * rows * 2);
+        tiles.foods = new Uint16Array(buffer, offset, cols * rows);
+        state.tiles = tiles;
+        return state;
+    }
+
+    const keyEntities = view.getUint32(offset, true);
+    const keyFoods = view.getUint32(offset + 4, true);
+    const changedCount = view.getUint32(offset + 8, true);
+    const addedCount = view.getUint32(offset + 12, true);
+    const addedFoodCount = view.getUint32(offset + 16, true);
+    offset += 20;
+    [state.removed, offset] = readBits(buffer, offset, keyEntities);
+    [state.changed, offset] = readBits(buffer, offset, keyEntities);
+    [state.values, offset] = readColumns(buffer, offset, CHANGED_FIELDS, changedCount);
+    [state.added, offset] = readColumns(buffer, offset, ENTITY_FIELDS, addedCount);
+    [state.foodsRemoved, offset] = readBits(buffer, offset, keyFoods);
+    [state.foodsAdded, offset] = readColumns(buffer, offset, FOOD_FIELDS, addedFoodCount);
+    return state;
+}
+
+/**
+ * Rebuild columns from a keyframe's, dropping `removed` rows and appending `added`
+ */
+function patchColumns(base, fields, removed, added, update) {
+    let kept = 0;
+    for (let i = 0; i < base.count; i++) {
+        if (!bitSet(removed, i)) kept++;
+    }
+    const count = kept + added.count;
+    const columns = { count: count };
+    for (const [name, ArrayType] of fields) {
+        columns[name] = new ArrayType(count);
+    }
+    let row = 0;
+    for (let i = 0; i < base.count; i++) {
+        if (bitSet(removed, i)) continue;
+        for (const [name] of fields) {
+            columns[name][row] = base[name][i];
+        }
+        if (update) update(columns, row, i);
+        row++;
+    }
+    for (const [name] of fields) {
+        columns[name].set(added[name], row);
+    }
+    return columns;
+}
+
+/**
+ * World state from a decoded keyframe and a delta based on it
+ */
+function applyDelta(keyframe, delta) {
+    const values = delta.values;
+    const xScale = delta.world_width / 65535;
+    const yScale = delta.world_height / 65535;
+    let next = 0;
+    const entities = patchColumns(keyframe.entities, ENTITY_FIELDS, delta.removed, delta.added,
+        (columns, row, i) => {
+            if (!bitSet(delta.changed, i)) return;
+            columns.x[row] = values.x[next] * xScale;
+            columns.y[row] = values.y[next] * yScale;
+            columns.energy[row] = values.energy[next] / ENERGY_SCALE;
+            columns.angle[row] = values.angle[next] / 256 * 2 * Math.PI;
+            next++;
+        });
+    const foods = patchColumns(keyframe.foods, FOOD_FIELDS, delta.foodsRemoved, delta.foodsAdded);
+
+    const state = { ...delta, entities: entities, foods: foods };
+    for (const name of ['removed', 'changed', 'values', 'added', 'foodsRemoved', 'foodsAdded']) {
+        delete state[name];
+    }
+    return state;
+}
+
+/**
+ * Convert a list of JSON objects to columns (colors interned into `palette`)
+ */
+function columnsFromObjects(objects, fields, palette, paletteIndex) {
+    const count = objects.length;
+    const columns = { count: count };
+    for (const [name, ArrayType] of fields) {
+        columns[name] = new ArrayType(count);
+    }
+    objects.forEach((obj, i) => {
+        for (const [name] of fields) {
+            if (name === 'id' || name === 'color') continue;
+            columns[name][i] = obj[name];
+        }
+        const key = obj.color.join(',');
+        if (!paletteIndex.has(key)) {
+            paletteIndex.set(key, palette.length);
+            palette.push(obj.color);
+        }
+        columns.color[i] = paletteIndex.get(key);
+    });
+    return columns;
+}
+
+// Compact IDs for JSON (string) IDs, kept while the object is present
+let jsonIds = new Map();
+let nextJsonId = 0;
+
+function compactIds(objects, column, present) {
+    objects.forEach((obj, i) => {
+        let id = jsonIds.get(obj.id);
+        if (id === undefined) {
+            id = nextJsonId++;
+        }
+        present.set(obj.id, id);
+        column[i] = id;
+    });
+}
+
+/**
+ * JSON fallback: give a JSON world state the same typed-array layout
+ */
+function columnsFromJson(data) {
+    if (!Array.isArray(data.entities)) {
+        return data;
+    }
+    const palette = [];
+    const paletteIndex = new Map();
+    const entities = columnsFromObjects(data.entities, ENTITY_FIELDS, palette, paletteIndex);
+    const foods = columnsFromObjects(data.foods || [], FOOD_FIELDS, palette, paletteIndex);
+    const present = new Map();
+    compactIds(data.entities, entities.id, present);
+    compactIds(data.foods || [], foods.id, present);
+    jsonIds = present;
+    return { ...data, palette: palette, entities: entities, foods: foods };
+}
@@ -1,25 +1,38 @@
 /**
  * p5.js visualizer for VIVARIUM ZERO
  * Renders creatures and food particles in real-time
+ * Drag to pan and scroll to zoom; the visible rectangle is sent to the
+ * server as a viewport so only what is on screen is streamed.
  */
 
+// Entities and foods are columns of typed arrays (see protocol.js)
 let worldState = {
-    entities: [],
-    foods: [],
+    entities: { count: 0 },
+    foods: { count: 0 },
+    palette: [],
     world_width: 800,
     world_height: 600,
     tick: 0,
     generation: 0,
     population: 0,
     food_count: 0,
-    paused: false
+    paused: false,
+    tiles: null
 };
 
+// Camera: world position of the canvas' top-left corner and zoom (pixels per world unit)
+const VIEW_WIDTH = 800;
+const VIEW_HEIGHT = 600;
+const MIN_ZOOM = 0.02;
+const MAX_ZOOM = 8;
+let camera = { x: 0, y: 0, zoom: 1, fitted: false, moved: false };
+let viewportTimer = null;
+
 // p5.js sketch
 const sketch = (p) => {
     
     p.setup = () => {
-        const canvas = p.createCanvas(800, 600);
+        const canvas = p.createCanvas(VIEW_WIDTH, VIEW_HEIGHT);
         canvas.parent('canvas-container');
         p.frameRate(60);
     };
@@ -28,103 +41,203 @@ const sketch = (p) => {
         // Background
         p.background(10, 10, 20);
         
+        p.push();
+        p.scale(camera.zoom);
+        p.translate(-camera.x, -camera.y);
+        
         // Draw grid (subtle)
         drawGrid(p);
         
-        // Draw foods
-        worldState.foods.forEach(food => {
-            drawFood(p, food);
-        });
-        
-        // Draw entities
-        worldState.entities.forEach(entity => {
-            drawEntity(p, entity);
-        });
+        if (worldState.tiles) {
+            // Zoomed out: object density per tile
+            drawTiles(p, worldState.tiles);
+        } else {
+            // Draw foods
+            const foods = worldState.foods;
+            for (let i = 0; i < foods.count; i++) {
+                drawFood(p, foods, i);
+            }
+            
+            // Draw entities
+            const entities = worldState.entities;
+            for (let i = 0; i < entities.count; i++) {
+                drawEntity(p, entities, i);
+            }
+        }
+        p.pop();
         
         // Draw info overlay
         drawOverlay(p);
     };
+    
+    p.mouseDragged = () => {
+        if (!insideCanvas(p)) return;
+        camera.x -= (p.mouseX - p.pmouseX) / camera.zoom;
+        camera.y -= (p.mouseY - p.pmouseY) / camera.zoom;
+        cameraMoved(p);
+    };
+    
+    p.mouseWheel = (event) => {
+        if (!insideCanvas(p)) return;
+        // Zoom around the point under the cursor
+        const worldX = camera.x + p.mouseX / camera.zoom;
+        const worldY = camera.y + p.mouseY / camera.zoom;
+        const factor = event.delta > 0 ? 0.9 : 1.1;
+        camera.zoom = Math.min(MAX_ZOOM, Math.max(MIN_ZOOM, camera.zoom * factor));
+        camera.x = worldX - p.mouseX / camera.zoom;
+        camera.y = worldY - p.mouseY / camera.zoom;
+        cameraMoved(p);
+        return false;
+    };
 };
 
+function insideCanvas(p) {
+    return p.mouseX >= 0 && p.mouseX <= p.width && p.mouseY >= 0 && p.mouseY <= p.height;
+}
+
+function cameraMoved(p) {
+    camera.moved = true;
+    // Throttle viewport updates while dragging or scrolling (within the command rate limit)
+    if (!viewportTimer) {
+        viewportTimer = setTimeout(() => {
+            viewportTimer = null;
+            sendViewport(p);
+        }, 150);
+    }
+}
+
+function sendViewport(p) {
+    if (!p || !camera.moved) return;
+    vivariumWS.sendCommand('viewport', {
+        x: camera.x,
+        y: camera.y,
+        width: p.width / camera.zoom,
+        height: p.height / camera.zoom,
+        zoom: camera.zoom
+    });
+}
+
+function fitCamera(p) {
+    // Whole world on screen
+    camera.zoom = Math.min(p.width / worldState.world_width, p.height / worldState.world_height);
+    camera.x = 0;
+    camera.y = 0;
+    camera.fitted = true;
+}
+
 function drawGrid(p) {
     p.stroke(30, 30, 40);
-    p.strokeWeight(1);
+    p.strokeWeight(1 / camera.zoom);
     
     const gridSize = 50;
+    if (gridSize * camera.zoom < 4) return;
+    
+    // Visible part of the world only
+    const left = Math.max(0, Math.floor(camera.x / gridSize) * gridSize);
+    const top = Math.max(0, Math.floor(camera.y / gridSize) * gridSize);
+    const right = Math.min(worldState.world_width, camera.x + VIEW_WIDTH / camera.zoom);
+    const bottom = Math.min(worldState.world_height, camera.y + VIEW_HEIGHT / camera.zoom);
     
     // Vertical lines
-    for (let x = 0; x < worldState.world_width; x += gridSize) {
-        p.line(x, 0, x, worldState.world_height);
+    for (let x = left; x < right; x += gridSize) {
+        p.line(x, Math.max(0, top), x, bottom);
     }
     
     // Horizontal lines
-    for (let y = 0; y < worldState.world_height; y += gridSize) {
-        p.line(0, y, worldState.world_width, y);
+    for (let y = top; y < bottom; y += gridSize) {
+        p.line(Math.max(0, left), y, right, y);
     }
 }
 
-function drawFood(p, food) {
-    const [r, g, b] = food.color;
+function drawTiles(p, tiles) {
+    p.noStroke();
+    for (let i = 0; i < tiles.cols; i++) {
+        for (let j = 0; j < tiles.rows; j++) {
+            const k = i * tiles.rows + j;
+            const x = tiles.x + i * tiles.size;
+            const y = tiles.y + j * tiles.size;
+            if (tiles.foods[k]) {
+                p.fill(50, 255, 50, Math.min(160, 30 + tiles.foods[k] * 10));
+                p.rect(x, y, tiles.size, tiles.size);
+            }
+            if (tiles.entities[k]) {
+                const inset = tiles.size * 0.15;
+                p.fill(255, 100, 100, Math.min(230, 60 + tiles.entities[k] * 15));
+                p.rect(x + inset, y + inset, tiles.size - 2 * inset, tiles.size - 2 * inset);
+            }
+        }
+    }
+}
+
+function drawFood(p, foods, i) {
+    const [r, g, b] = worldState.palette[foods.color[i]];
+    const x = foods.x[i];
+    const y = foods.y[i];
+    const radius = foods.radius[i];
     
     // Glow effect
     p.noStroke();
     p.fill(r, g, b, 30);
-    p.circle(food.x, food.y, food.radius * 4);
+    p.circle(x, y, radius * 4);
     
     // Main body
     p.fill(r, g, b);
-    p.circle(food.x, food.y, food.radius * 2);
+    p.circle(x, y, radius * 2);
     
     // Highlight
     p.fill(255, 255, 255, 150);
-    p.circle(food.x - food.radius * 0.3, food.y - food.radius * 0.3, food.radius * 0.6);
+    p.circle(x - radius * 0.3, y - radius * 0.3, radius * 0.6);
 }
 
-function drawEntity(p, entity) {
-    p.push();
-    p.translate(entity.x, entity.y);
-    p.rotate(entity.angle);
+function drawEntity(p, entities, i) {
+    const x = entities.x[i];
+    const y = entities.y[i];
+    const radius = entities.radius[i];
+    const trail = trails.get(entities.id[i]);
     
-    const [r, g, b] = entity.color;
-    
-    // Draw trail
-    if (entity.trail && entity.trail.length > 1) {
+    // Draw trail (in world space, before rotating)
+    const [r, g, b] = worldState.palette[entities.color[i]];
+    if (trail && trail.length > 1) {
         p.noFill();
         p.stroke(r, g, b, 50);
         p.strokeWeight(2);
         p.beginShape();
-        for (let point of entity.trail) {
-            p.vertex(point[0] - entity.x, point[1] - entity.y);
+        for (let point of trail) {
+            p.vertex(point[0], point[1]);
         }
         p.endShape();
     }
     
+    p.push();
+    p.translate(x, y);
+    p.rotate(entities.angle[i]);
+    
     // Energy glow (opacity based on energy level)
-    const energyRatio = entity.energy / entity.max_energy;
+    const energyRatio = entities.energy[i] / entities.max_energy[i];
     const glowAlpha = Math.max(20, energyRatio * 80);
     p.noStroke();
     p.fill(r, g, b, glowAlpha);
-    p.circle(0, 0, entity.radius * 3);
+    p.circle(0, 0, radius * 3);
     
     // Main body
     p.fill(r, g, b);
     p.stroke(255, 255, 255, 100);
     p.strokeWeight(1);
-    p.circle(0, 0, entity.radius * 2);
+    p.circle(0, 0, radius * 2);
     
     // Direction indicator (small triangle)
     p.fill(255, 255, 255, 200);
     p.noStroke();
     p.triangle(
-        entity.radius, 0,
-        -entity.radius * 0.5, entity.radius * 0.5,
-        -entity.radius * 0.5, -entity.radius * 0.5
+        radius, 0,
+        -radius * 0.5, radius * 0.5,
+        -radius * 0.5, -radius * 0.5
     );
     
     // Energy bar
-    const barWidth = entity.radius * 2.5;
+    const barWidth = radius * 2.5;
     const barHeight = 3;
-    const barY = -entity.radius - 8;
+    const barY = -radius - 8;
     
     // Background
     p.fill(50, 50, 50);
@@ -153,7 +266,7 @@ function drawOverlay(p) {
         p.noStroke();
         p.textSize(48);
         p.textAlign(p.CENTER, p.CENTER);
-        p.text('⏸ PAUSED', worldState.world_width / 2, worldState.world_height / 2);
+        p.text('⏸ PAUSED', p.width / 2, p.height / 2);
     }
     
     // FPS counter
@@ -164,19 +277,42 @@ function drawOverlay(p) {
     p.text(`FPS: ${Math.round(p.frameRate())}`, 10, 10);
 }
 
+// Recent positions per entity ID, oldest first
+const TRAIL_LENGTH = 5;
+let trails = new Map();
+
+function updateTrails(entities) {
+    const next = new Map();
+    for (let i = 0; i < entities.count; i++) {
+        const id = entities.id[i];
+        const trail = trails.get(id) || [];
+        trail.push([entities.x[i], entities.y[i]]);
+        if (trail.length > TRAIL_LENGTH) trail.shift();
+        next.set(id, trail);
+    }
+    trails = next;
+}
+
 // Update world state from WebSocket
 function updateWorldState(data) {
     worldState = {
         ...worldState,
         ...data
     };
+    if (data.tiles) {
+        worldState.entities = { count: 0 };
+        worldState.foods = { count: 0 };
+    } else {
+        worldState.tiles = null;
+    }
+    if (data.entities) {
+        updateTrails(data.entities);
+    }
     
-    // Update canvas size if needed
-    if (data.world_width && data.world_height) {
-        const p = window.p5Instance;
-        if (p && (p.width !== data.world_width || p.height !== data.world_height)) {
-            p.resizeCanvas(data.world_width, data.world_height);
-        }
+    // Fit the camera to the world once its size is known
+    const p = window.p5Instance;
+    if (p && !camera.fitted && data.world_width && data.world_height) {
+        fitCamera(p);
     }
 }
 
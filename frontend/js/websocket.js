@@ -9,17 +9,23 @@ class VivariumWebSocket {
         this.reconnectTimer = null;
         this.messageHandlers = new Map();
         this.isConnected = false;
+        // Last keyframe received and the newest frame sequence applied
+        this.keyframe = null;
+        this.sequence = 0;
+        this.keyframeRequested = false;
     }
 
     connect() {
         // Determine WebSocket URL
         const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-        const wsUrl = `${protocol}//${window.location.host}/ws`;
+        // Ask for binary world state frames (the server falls back to JSON)
+        const wsUrl = `${protocol}//${window.location.host}/ws?format=binary`;
         
         console.log('Connecting to WebSocket:', wsUrl);
         
         try {
             this.ws = new WebSocket(wsUrl);
+            this.ws.binaryType = 'arraybuffer';
             
             this.ws.onopen = () => {
                 console.log('✅ WebSocket connected');
@@ -35,8 +41,12 @@ class VivariumWebSocket {
             
             this.ws.onmessage = (event) => {
                 try {
+                    if (event.data instanceof ArrayBuffer) {
+                        this.handleFrame(event.data);
+                        return;
+                    }
                     const data = JSON.parse(event.data);
-                    this.handleMessage(data);
+                    this.handleMessage(data.type === 'world_state' ? columnsFromJson(data) : data);
                 } catch (error) {
                     console.error('Failed to parse message:', error);
                 }
@@ -49,6 +59,7 @@ class VivariumWebSocket {
             this.ws.onclose = () => {
                 console.log('🔌 WebSocket disconnected');
                 this.isConnected = false;
+                this.keyframe = null;
                 this.updateConnectionStatus(false);
                 this.scheduleReconnect();
             };
@@ -67,6 +78,33 @@ class VivariumWebSocket {
         }
     }
 
+    handleFrame(buffer) {
+        const frame = decodeWorldState(buffer);
+        if (!frame) return;
+
+        if (frame.kind === 'tiles') {
+            // Self-contained; the next objects frame brings its keyframe
+            this.keyframe = null;
+            this.keyframeRequested = false;
+        } else if (frame.kind === 'keyframe') {
+            this.keyframe = frame;
+            this.keyframeRequested = false;
+        } else if (frame.sequence <= this.sequence) {
+            // Older than what is on screen (sent before a resent keyframe)
+            return;
+        } else if (!this.keyframe || frame.keyframe !== this.keyframe.sequence) {
+            // Missed the keyframe this delta is based on: ask for it again
+            if (!this.keyframeRequested) {
+                this.keyframeRequested = true;
+                this.sendCommand('keyframe');
+            }
+            return;
+        }
+
+        this.sequence = frame.sequence;
+        this.handleMessage(frame.kind === 'delta' ? applyDelta(this.keyframe, frame) : frame);
+    }
+
     handleMessage(data) {
         const type = data.type;
         